@@ -5,7 +5,6 @@ from flask_limiter.util import get_remote_address
 from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 import sys
-import importlib.util
 import psutil
 import platform
 import socket
@@ -36,7 +35,12 @@ app.config.update(
     MAX_CONTENT_LENGTH=16 * 1024 * 1024,
     ALLOWED_ORIGINS="*",
     MAX_TERMINAL_OUTPUT=100000,
-    RATE_LIMIT_DEFAULT="100 per hour"
+    RATE_LIMIT_DEFAULT="100 per hour",
+    DIAGNOSTIC_CONCURRENCY=int(os.environ.get('DIAGNOSTIC_CONCURRENCY', 4)),  # Checks run in parallel by check_all
+    DIAGNOSTIC_CHECK_TIMEOUT=float(os.environ.get('DIAGNOSTIC_CHECK_TIMEOUT', 30)),  # Per check, unless it sets DEADLINE
+    DIAGNOSTIC_RUN_BUDGET=float(os.environ.get('DIAGNOSTIC_RUN_BUDGET', 100)),  # Whole run; the page gives up at 120s
+    DIAGNOSTIC_JOB_WORKERS=int(os.environ.get('DIAGNOSTIC_JOB_WORKERS', 2)),  # Diagnostics jobs running at once
+    DIAGNOSTIC_JOB_TTL=float(os.environ.get('DIAGNOSTIC_JOB_TTL', 600))  # Seconds a finished job stays retrievable
 )
 
 UPLOAD_FOLDER = 'uploads'
@@ -44,6 +48,13 @@ ALLOWED_EXTENSIONS = {'txt', 'log', 'json'}
 DIAGNOSTICS_DIR = Path(__file__).parent / 'diagnostics'
 STATIC_DIR = Path(__file__).parent / 'static'
 
+from utils.command_priority import background, interactive
+from utils.diagnostic_registry import get_diagnostic_registry
+diagnostic_registry = get_diagnostic_registry(DIAGNOSTICS_DIR)
+
+from utils.jobs import JobManager
+job_manager = JobManager(max_workers=app.config['DIAGNOSTIC_JOB_WORKERS'], ttl=app.config['DIAGNOSTIC_JOB_TTL'])
+
 limiter = Limiter(app=app, key_func=get_remote_address, default_limits=[app.config['RATE_LIMIT_DEFAULT']])
 socketio = SocketIO(app, cors_allowed_origins="*", max_http_buffer_size=1024 * 1024)
 
@@ -90,22 +101,9 @@ def capture_output():
         yield stdout
 
 def load_diagnostic_module(script_name):
-    try:
-        script_path = DIAGNOSTICS_DIR / f"{script_name}.py"
-        if not script_path.exists() or not script_path.is_file():
-            return None
-
-        spec = importlib.util.spec_from_file_location(script_name, str(script_path))
-        if not spec or not spec.loader:
-            return None
-
-        module = importlib.util.module_from_spec(spec)
-        sys.modules[script_name] = module
-        spec.loader.exec_module(module)
-        return module
-    except Exception as e:
-        logger.error(f"Error loading module {script_name}: {str(e)}")
-        return None
+    """Cached diagnostic module; only re-executed when its file changes."""
+    info = diagnostic_registry.get(script_name)
+    return info.module if info else None
 
 def get_primary_ip() -> str:
     try:
@@ -118,86 +116,101 @@ def get_primary_ip() -> str:
         return '127.0.0.1'
 
 # === UDP Camera Streaming Infrastructure ===
+def mjpeg_part(jpeg):
+    """One part of a multipart/x-mixed-replace MJPEG stream"""
+    return b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n'
+
 class UDPCameraReceiver:
     """Receives JPEG frames via UDP from GStreamer on remote device"""
 
-    def __init__(self, port, buffer_size=10):
+    def __init__(self, port, reactor, buffer_size=10):
         self.port = port
+        self.reactor = reactor  # Shared UDPReactor that reads the socket for us
         self.buffer = deque(maxlen=buffer_size)  # Store last N frames
         self.running = False
-        self.thread = None
         self.sock = None
+        self.assembler = None
         self.last_frame_time = time.time()
         self.lock = threading.Lock()
+        # Viewers wait on this for frame_seq to move past the last frame they sent
+        self.frame_ready = threading.Condition(self.lock)
+        self.frame_seq = 0
+        self.frame_part = None  # Latest frame as a ready-made MJPEG part, shared by every viewer
 
     def start(self):
-        """Start UDP receiver thread"""
+        """Bind the UDP socket and hand it to the reactor"""
+        from utils.jpeg_assembler import JpegAssembler
+
         if self.running:
             return
 
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 2 * 1024 * 1024)  # 2MB buffer
+            self.sock.bind(("0.0.0.0", self.port))
+        except Exception as e:
+            logger.error(f"Failed to start UDP receiver on port {self.port}: {e}")
+            self._close()
+            raise
+
+        # Datagrams land in one preallocated buffer; complete frames come back through _add_frame
+        self.assembler = JpegAssembler(self._add_frame)
         self.running = True
-        self.thread = threading.Thread(target=self._receive_loop, daemon=True)
-        self.thread.start()
+        self.reactor.register(self.sock, self._drain)
         logger.info(f"Started UDP receiver on port {self.port}")
 
     def stop(self):
-        """Stop UDP receiver thread"""
+        """Take the socket back from the reactor and close it"""
         self.running = False
+        if self.sock:
+            self.reactor.unregister(self.sock)
+        self._close()
+        with self.frame_ready:
+            self.frame_ready.notify_all()  # Let viewers see the stream ended
+        logger.info(f"Stopped UDP receiver on port {self.port}")
+
+    def _close(self):
         if self.sock:
             try:
                 self.sock.close()
             except:
                 pass
-        if self.thread and self.thread.is_alive():
-            self.thread.join(timeout=2)
-        logger.info(f"Stopped UDP receiver on port {self.port}")
-
-    def _receive_loop(self):
-        """Main UDP receiving loop - assembles JPEG frames from UDP packets"""
-        try:
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 2 * 1024 * 1024)  # 2MB buffer
-            self.sock.bind(("0.0.0.0", self.port))
-            self.sock.settimeout(0.1)  # 100ms timeout for clean shutdown
-
-            jpeg_buffer = bytearray()
-
-            while self.running:
-                try:
-                    data, addr = self.sock.recvfrom(65507)  # Max UDP packet size
-
-                    # Append data to buffer
-                    jpeg_buffer.extend(data)
-
-                    # Look for complete JPEG frame (starts with FFD8, ends with FFD9)
-                    start_idx = jpeg_buffer.find(b'\xff\xd8')
-                    end_idx = jpeg_buffer.find(b'\xff\xd9')
-
-                    if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                        # Extract complete JPEG frame
-                        frame = bytes(jpeg_buffer[start_idx:end_idx + 2])
-
-                        with self.lock:
-                            self.buffer.append(frame)
-                            self.last_frame_time = time.time()
-
-                        # Remove processed data from buffer
-                        jpeg_buffer = jpeg_buffer[end_idx + 2:]
+            self.sock = None
 
-                except socket.timeout:
-                    continue
-                except Exception as e:
-                    if self.running:
-                        logger.error(f"UDP receive error on port {self.port}: {e}")
+    def _drain(self):
+        """Read the datagrams waiting on the socket, a batch per wakeup (runs on the reactor thread)"""
+        from utils.udp_reactor import DRAIN_BATCH
 
-        except Exception as e:
-            logger.error(f"Failed to start UDP receiver on port {self.port}: {e}")
-        finally:
-            if self.sock:
-                try:
-                    self.sock.close()
-                except:
-                    pass
+        for _ in range(DRAIN_BATCH):
+            try:
+                self.assembler.recv_from(self.sock)
+            except (BlockingIOError, InterruptedError):
+                return
+            except Exception as e:
+                if self.running:
+                    logger.error(f"UDP receive error on port {self.port}: {e}")
+                return
+
+    def _add_frame(self, frame):
+        """Store a complete JPEG frame and wake its viewers (called by the assembler on the reactor thread)"""
+        part = mjpeg_part(frame)  # Built once here instead of once per viewer
+        with self.frame_ready:
+            self.buffer.append(frame)
+            self.last_frame_time = time.time()
+            self.frame_seq += 1
+            self.frame_part = part
+            self.frame_ready.notify_all()
+
+    def wait_for_frame(self, last_seq, timeout):
+        """
+        Block until a frame newer than last_seq arrives; returns (seq, mjpeg_part),
+        or None after timeout seconds or once the receiver is stopped.
+        """
+        with self.frame_ready:
+            self.frame_ready.wait_for(lambda: self.frame_seq > last_seq or not self.running, timeout)
+            if self.frame_seq > last_seq and self.running:
+                return self.frame_seq, self.frame_part
+            return None
 
     def get_latest_frame(self):
         """Get the most recent frame (thread-safe)"""
@@ -215,8 +228,11 @@ class CameraStreamManager:
     """Manages multiple UDP camera receivers"""
 
     def __init__(self):
+        from utils.udp_reactor import UDPReactor
+
         self.receivers = {}  # camera_port -> UDPCameraReceiver
         self.base_port = 5000
+        self.reactor = UDPReactor("camera-udp")  # One thread reads every camera's socket
         self.lock = threading.Lock()
 
     def start_receiver(self, camera_port):
@@ -226,7 +242,7 @@ class CameraStreamManager:
                 return  # Already running
 
             udp_port = self.base_port + camera_port
-            receiver = UDPCameraReceiver(udp_port)
+            receiver = UDPCameraReceiver(udp_port, self.reactor)
             receiver.start()
             self.receivers[camera_port] = receiver
             logger.info(f"Started UDP receiver for camera {camera_port} on port {udp_port}")
@@ -267,8 +283,9 @@ def handle_disconnect():
 
 @socketio.on('terminal_input')
 @limiter.limit("30 per minute")
+@interactive
 def handle_terminal_input(data):
-    from utils.ssh_interface import run_ssh_command
+    from utils.ssh_interface import stream_ssh_command
     try:
         command = data.get('command', '').strip()
         if not command:
@@ -277,25 +294,28 @@ def handle_terminal_input(data):
         # Use SSH to execute commands on the connected device
         logger.info(f"Terminal received command: {command}")
         try:
-            output = run_ssh_command(command, timeout=10)
-            logger.info(f"SSH command returned: {output[:100]}...")  # Log first 100 chars
+            # Stream output to the browser as it arrives, capped at MAX_TERMINAL_OUTPUT
+            stream = stream_ssh_command(command, timeout=10, max_bytes=app.config['MAX_TERMINAL_OUTPUT'])
+            for chunk in stream:
+                emit('terminal_output', {
+                    'output': chunk,
+                    'status': 'success',
+                    'partial': True
+                })
             
-            # Check if output indicates an error
-            if output.startswith("Error:") or "SSH connection failed" in output:
+            if stream.timed_out:
                 emit('terminal_output', {
-                    'output': output,
-                    'status': 'error'
+                    'output': 'Command timed out after 10 seconds',
+                    'status': 'error',
+                    'done': True
                 })
             else:
-                # Truncate if too long
-                if len(output) > app.config['MAX_TERMINAL_OUTPUT']:
-                    output = output[:app.config['MAX_TERMINAL_OUTPUT']] + '\n... (output truncated)'
-                
                 emit('terminal_output', {
-                    'output': output,
-                    'status': 'success'
+                    'output': '\n... (output truncated)' if stream.truncated else '',
+                    'status': 'success' if stream.truncated or stream.exit_status == 0 else 'error',
+                    'done': True
                 })
-                logger.info("Terminal output sent successfully")
+            logger.info(f"Terminal output sent successfully ({stream.bytes_read} bytes)")
         except Exception as e:
             logger.error(f"SSH command error: {str(e)}")
             emit('terminal_output', {
@@ -303,11 +323,6 @@ def handle_terminal_input(data):
                 'status': 'error'
             })
 
-    except subprocess.TimeoutExpired:
-        emit('terminal_output', {
-            'output': 'Command timed out after 10 seconds',
-            'status': 'error'
-        })
     except Exception as e:
         logger.error(f"Terminal command error: {str(e)}")
         emit('terminal_output', {
@@ -317,6 +332,7 @@ def handle_terminal_input(data):
 
 @socketio.on('terminal_tab_completion')
 @limiter.limit("60 per minute")
+@interactive
 def handle_tab_completion(data):
     from utils.ssh_interface import run_ssh_command
     try:
@@ -408,10 +424,9 @@ def handle_tab_completion(data):
 @limiter.limit("10 per minute")
 def quick_diagnostic():
     try:
-        results = {}
-        for script in ['check_system', 'check_memory', 'check_network']:
-            result = run_diagnostic_test(script)
-            results[script] = result
+        scripts = ['check_system', 'check_memory', 'check_network']
+        results = collect_diagnostics(scripts)
+        results = {script: results[script] for script in scripts}
 
         return jsonify({
             "status": "success",
@@ -428,39 +443,17 @@ def run_all_diagnostics():
     from flask import Response
     import json
     
+    # ?incremental=1 reuses results of hardware checks while the device is unchanged
+    incremental = request.args.get('incremental', '').lower() in ('1', 'true', 'yes')
+    
     def generate():
         try:
-            # Get list of all diagnostic scripts
-            scripts = sorted(DIAGNOSTICS_DIR.glob("check_*.py"))
-            total_scripts = len(scripts)
-            
-            # Send initial status with explicit flush
-            yield f"data: {json.dumps({'type': 'start', 'total': total_scripts})}\n\n"
-            
-            results = {}
-            for idx, script in enumerate(scripts):
-                script_name = script.stem
-                
-                # Send progress update with explicit flush
-                yield f"data: {json.dumps({'type': 'progress', 'current': idx + 1, 'total': total_scripts, 'test': script_name})}\n\n"
-                
-                # Log progress for debugging
-                logger.info(f"Running diagnostic {idx + 1}/{total_scripts}: {script_name}")
-                
-                try:
-                    # Run with shorter timeout to prevent hanging
-                    result = run_diagnostic_test(script_name)
-                except Exception as e:
-                    logger.error(f"Error running {script_name}: {e}")
-                    result = {'status': 'error', 'output': str(e)}
-                
-                results[script_name] = result
-                
-                # Send individual result with explicit flush
-                yield f"data: {json.dumps({'type': 'result', 'test': script_name, 'result': result})}\n\n"
-            
-            # Send completion with explicit flush
-            yield f"data: {json.dumps({'type': 'complete', 'data': results})}\n\n"
+            for event in diagnostic_run_events(incremental):
+                if event['type'] == 'heartbeat':
+                    # SSE comment: ignored by EventSource, but a gone client fails the write and ends the run
+                    yield ": heartbeat\n\n"
+                else:
+                    yield f"data: {json.dumps(event)}\n\n"
             
         except Exception as e:
             logger.exception("Error in check_all generator")
@@ -472,12 +465,169 @@ def run_all_diagnostics():
     response.headers['X-Accel-Buffering'] = 'no'
     return response
 
+def diagnostic_run_events(incremental=False, scope=None):
+    """
+    A full diagnostics run as check_all's stream of events: start, progress and result
+    per check, complete with every result, and heartbeat while nothing happens.
+    scope, when given, cancels the run (see run_diagnostics).
+    """
+    from utils.probe_context import ProbeContext
+    
+    # Get list of all diagnostic scripts
+    scripts = diagnostic_registry.names()
+    total_scripts = len(scripts)
+    
+    yield {'type': 'start', 'total': total_scripts, 'incremental': incremental}
+    
+    # Longest checks start first so short ones fill in around them
+    def expected_duration(name):
+        info = diagnostic_registry.get(name)
+        return (info.expected_duration or 0) if info else 0
+    order = sorted(scripts, key=expected_duration, reverse=True)
+    
+    # Probes shared between modules (mmcli, free, nmcli...) reach the device once per run
+    probe = ProbeContext()
+    
+    results = {}
+    started = 0
+    for event in run_diagnostics(order, probe, incremental=incremental, scope=scope):
+        if event[0] == 'heartbeat':
+            yield {'type': 'heartbeat'}
+        elif event[0] == 'started':
+            started += 1
+            script_name = event[1]
+            yield {'type': 'progress', 'current': started, 'total': total_scripts, 'test': script_name}
+            
+            # Log progress for debugging
+            logger.info(f"Running diagnostic {started}/{total_scripts}: {script_name}")
+        else:
+            _, script_name, result = event
+            results[script_name] = result
+            
+            # Send individual result as soon as it completes
+            yield {'type': 'result', 'test': script_name, 'result': result}
+    
+    stats = probe.stats()
+    logger.info(f"📋 Diagnostics finished: {stats['probes']} distinct probes, {stats['hits']} served from this run")
+    
+    # Completion lists the results in the usual name order
+    yield {'type': 'complete', 'data': {name: results[name] for name in scripts}}
+
+# Seconds between SSE heartbeats while a job watcher waits for events
+JOB_HEARTBEAT_INTERVAL = 5
+
+@app.route('/api/diagnostic/jobs', methods=['POST'])
+@limiter.limit("5 per minute")
+def start_diagnostic_job():
+    """
+    Start a full diagnostics run in the background, or attach to the one in progress.
+    Watch it with GET /api/diagnostic/jobs/<id>/events.
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        incremental = bool(body.get('incremental')) or \
+            request.args.get('incremental', '').lower() in ('1', 'true', 'yes')
+
+        def work(job):
+            result = None
+            try:
+                for event in diagnostic_run_events(incremental, scope=job.scope):
+                    if event['type'] == 'heartbeat':
+                        continue
+                    job.publish(event)
+                    if event['type'] == 'complete':
+                        result = event['data']
+            except Exception as e:
+                job.publish({'type': 'error', 'message': str(e)})
+                raise
+            return result
+
+        # One run at a time: a full and an incremental run would only compete for the
+        # device, so either kind of request attaches to whichever run is in progress
+        job, created = job_manager.submit('check_all', work, params={'incremental': incremental},
+                                          dedupe_key='check_all')
+        return jsonify({
+            "status": "success",
+            "data": job.to_dict(),
+            "message": "Diagnostics job started" if created else "Attached to running diagnostics job"
+        }), 202 if created else 200
+    except Exception as e:
+        logger.error(f"Error starting diagnostics job: {str(e)}")
+        return jsonify({"status": "error", "message": "Internal error occurred"}), 500
+
+@app.route('/api/diagnostic/jobs', methods=['GET'])
+@limiter.limit("30 per minute")
+def list_diagnostic_jobs():
+    return jsonify({"status": "success", "data": [job.to_dict() for job in job_manager.list()]})
+
+@app.route('/api/diagnostic/jobs/<job_id>', methods=['GET', 'DELETE'])
+@limiter.limit("30 per minute")
+def diagnostic_job(job_id):
+    """A job's state and, once finished, its results. DELETE cancels it."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    if request.method == 'DELETE':
+        job.cancel("Cancelled by user")
+    return jsonify({"status": "success", "data": job.to_dict()})
+
+@app.route('/api/diagnostic/jobs/<job_id>/events')
+@limiter.limit("60 per minute")
+def diagnostic_job_events(job_id):
+    """
+    SSE stream of a job's events, each with its id. Replays from the start, or after
+    the Last-Event-ID header (sent by EventSource on reconnect) or ?last_event_id=.
+    """
+    from flask import Response
+    import json
+
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0)
+    except ValueError:
+        last_event_id = 0
+
+    if job.finished and last_event_id >= job.last_event_id:
+        # Nothing left to send; 204 also stops EventSource from reconnecting
+        return Response(status=204)
+
+    def generate():
+        last_seen = last_event_id
+        while True:
+            events = job.events_after(last_seen, timeout=JOB_HEARTBEAT_INTERVAL)
+            for event_id, event in events:
+                last_seen = event_id
+                yield f"id: {event_id}\ndata: {json.dumps(event)}\n\n"
+            if not events:
+                if job.finished:
+                    return
+                # Detaching only ends this watcher; the job keeps running
+                yield ": heartbeat\n\n"
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/diagnostics', methods=['GET'])
+@limiter.limit("30 per minute")
+def list_diagnostics():
+    """Available diagnostic modules with their category, expected duration and sudo needs."""
+    try:
+        return jsonify({"status": "success", "data": diagnostic_registry.metadata()})
+    except Exception as e:
+        logger.error(f"Error listing diagnostics: {str(e)}")
+        return jsonify({"status": "error", "message": "Internal error occurred"}), 500
+
 @app.route('/api/diagnostic/<test_name>', methods=['POST'])
 @limiter.limit("10 per minute")
 def run_diagnostic(test_name):
     try:
         test_name = secure_filename(test_name.replace('-', '_').lower())
-        result = run_diagnostic_test(test_name)
+        result = collect_diagnostics([test_name])[test_name]
         return jsonify({"status": "success", "data": result, "message": "Test completed"})
     except Exception as e:
         logger.error(f"Error running diagnostic {test_name}: {str(e)}")
@@ -485,6 +635,7 @@ def run_diagnostic(test_name):
 
 @app.route('/api/system/status')
 @limiter.limit("60 per minute")
+@background
 def system_status():
     try:
         from utils.ssh_interface import check_ssh_connection
@@ -545,6 +696,7 @@ def system_status():
 
 @app.route('/api/ping')
 @limiter.limit("30 per minute")
+@background
 def ping():
     """Quick endpoint to check device connection status"""
     from utils.ssh_interface import check_ssh_connection
@@ -563,6 +715,27 @@ def ping():
             'timestamp': datetime.datetime.now().isoformat()
         })
 
+@app.route('/api/metrics/ssh')
+@limiter.limit("30 per minute")
+def ssh_metrics():
+    """Per-command SSH latency histograms, byte counts and exit codes. ?reset=1 clears them after reading."""
+    from utils.ssh_interface import channel_queue_stats
+    from utils.ssh_metrics import get_ssh_metrics
+    try:
+        snapshot = get_ssh_metrics().snapshot(reset=request.args.get('reset') == '1')
+        return jsonify({
+            'status': 'success',
+            **snapshot,
+            'queues': channel_queue_stats(),
+            'timestamp': datetime.datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Failed to collect SSH metrics: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
 @app.route('/api/terminal/start', methods=['POST'])
 @limiter.limit("10 per minute")
 def start_terminal():
@@ -621,6 +794,8 @@ def start_terminal():
                 'message': 'SSH password not configured in .env file'
             }), 500
         
+        from utils.ssh_control import control_options
+
         # Start ttyd with SSH connection with better keepalive settings
         cmd = [
             'ttyd', '-W', '-p', str(port), '-i', '0.0.0.0',
@@ -628,7 +803,8 @@ def start_terminal():
             '-t', 'theme={"background": "#1e1e1e", "foreground": "#ffffff", "cursor": "#00ff00"}',
             '--', 
             'sshpass', '-p', ssh_password,
-            'ssh', '-o', 'StrictHostKeyChecking=no', 
+            'ssh', *control_options(),         # New tabs reuse the device's control master
+            '-o', 'StrictHostKeyChecking=no', 
             '-o', 'UserKnownHostsFile=/dev/null',
             '-o', 'ServerAliveInterval=15',  # Send keepalive every 15 seconds
             '-o', 'ServerAliveCountMax=4',   # Allow 4 missed keepalives before disconnect
@@ -840,6 +1016,7 @@ def reset_connection():
 # === Camera API Routes ===
 @app.route('/api/camera/start', methods=['POST'])
 @limiter.limit("10 per minute")
+@interactive
 def start_camera_stream():
     """Start GStreamer UDP stream on device and Flask UDP receiver"""
     from utils.ssh_interface import run_ssh_command
@@ -908,6 +1085,7 @@ def start_camera_stream():
 
 @app.route('/api/camera/stop', methods=['POST'])
 @limiter.limit("10 per minute")
+@interactive
 def stop_camera_stream():
     """Stop GStreamer stream on device and UDP receiver"""
     try:
@@ -934,9 +1112,17 @@ def stop_camera_stream():
         logger.info("Step 3: Killing GStreamer process")
         try:
             import subprocess
-            # Use subprocess directly to avoid SSH module import blocking
-            ssh_cmd = f"sshpass -p '{os.getenv('SSH_PASSWORD')}' ssh -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null -o ConnectTimeout=2 {os.getenv('SSH_USER')}@{os.getenv('SSH_IP')} 'killall -9 gst-launch-1.0 2>/dev/null || true' &"
-            subprocess.Popen(ssh_cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            from utils.ssh_control import control_options
+            # Use subprocess directly to avoid SSH module import blocking; only reuse an
+            # already running control master so this never waits for a handshake
+            ssh_cmd = [
+                'sshpass', '-p', os.getenv('SSH_PASSWORD', ''),
+                'ssh', *control_options(start=False),
+                '-o', 'StrictHostKeyChecking=no', '-o', 'UserKnownHostsFile=/dev/null', '-o', 'ConnectTimeout=2',
+                f"{os.getenv('SSH_USER')}@{os.getenv('SSH_IP')}",
+                'killall -9 gst-launch-1.0 2>/dev/null || true'
+            ]
+            subprocess.Popen(ssh_cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             logger.info("Step 4: GStreamer kill command sent (background)")
         except Exception as e:
             logger.error(f"Error killing GStreamer: {e}")
@@ -956,6 +1142,9 @@ def stop_camera_stream():
             'message': f'Stream may already be stopped: {str(e)}'
         })
 
+# Seconds a viewer waits for a frame before the stream ends with an error frame
+STREAM_FRAME_TIMEOUT = 10
+
 @app.route('/api/camera/stream/<int:camera_port>')
 def stream_camera(camera_port):
     """Stream MJPEG from UDP receiver to browser"""
@@ -969,36 +1158,24 @@ def stream_camera(camera_port):
         if not receiver:
             # Return error frame if receiver not started
             logger.warning(f"Stream requested for camera {camera_port} but receiver not started")
-            error_frame = create_error_frame("Camera not started. Please start the stream first.")
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + error_frame + b'\r\n')
+            yield mjpeg_part(create_error_frame("Camera not started. Please start the stream first."))
             return
 
-        last_frame = None
-        no_frame_count = 0
-        max_wait_cycles = 100  # ~10 seconds at 100ms per cycle
-
+        last_seq = 0
         while True:
-            frame = receiver.get_latest_frame()
-
-            if frame and frame != last_frame:
-                # New frame available - send it
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-                last_frame = frame
-                no_frame_count = 0
-            else:
-                # No new frame - wait a bit
-                no_frame_count += 1
-                if no_frame_count > max_wait_cycles:
-                    # Stream timeout - no frames for too long
-                    logger.warning(f"Stream timeout for camera {camera_port} - no frames received")
-                    error_frame = create_error_frame("Stream timeout. No frames received.")
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + error_frame + b'\r\n')
+            latest = receiver.wait_for_frame(last_seq, timeout=STREAM_FRAME_TIMEOUT)
+            if latest is None:
+                if not receiver.running:
+                    yield mjpeg_part(create_error_frame("Camera stream stopped."))
                     break
+                # Stream timeout - no frames for too long
+                logger.warning(f"Stream timeout for camera {camera_port} - no frames received")
+                yield mjpeg_part(create_error_frame("Stream timeout. No frames received."))
+                break
 
-                time.sleep(0.033)  # ~30 FPS max
+            # Frames that arrived while this viewer was sending are skipped, not queued
+            last_seq, part = latest
+            yield part
 
     return Response(
         generate_mjpeg_stream(),
@@ -1023,15 +1200,17 @@ def create_error_frame(message):
 
 @app.route('/api/camera/detect', methods=['GET'])
 @limiter.limit("10 per minute")
+@interactive
 def detect_cameras():
     """Detect available cameras on the device using v4l2-ctl"""
-    from utils.ssh_interface import run_ssh_command
+    from utils.ssh_interface import run_ssh_command_cached
+    from diagnostics.diagnostic_utils import CAMERA_DETECT_TTL
 
     try:
         logger.info("Detecting cameras")
 
-        # Use v4l2-ctl to detect cameras (same method as check_camera.py)
-        v4l2_output = run_ssh_command("v4l2-ctl --list-devices 2>/dev/null")
+        # Use v4l2-ctl to detect cameras (same method and cache entry as check_camera.py)
+        v4l2_output = run_ssh_command_cached("v4l2-ctl --list-devices 2>/dev/null", ttl=CAMERA_DETECT_TTL)
 
         # Parse IMX462 and IMX662 devices
         cameras = []
@@ -1090,6 +1269,7 @@ def detect_cameras():
 
 @app.route('/api/camera/led/toggle', methods=['POST'])
 @limiter.limit("60 per minute")
+@interactive
 def toggle_detection_led():
     """Toggle detection LED for a specific camera port via hwman API"""
     from utils.ssh_interface import run_ssh_command
@@ -1151,6 +1331,7 @@ def toggle_detection_led():
 
 @app.route('/api/camera/ir-led/toggle', methods=['POST'])
 @limiter.limit("60 per minute")
+@interactive
 def toggle_ir_led():
     """Toggle IR LED for ANPR cameras via hwman API"""
     from utils.ssh_interface import run_ssh_command
@@ -1209,6 +1390,7 @@ def toggle_ir_led():
 
 @app.route('/api/hardware/power/toggle', methods=['POST'])
 @limiter.limit("60 per minute")
+@interactive
 def toggle_power_switch():
     """Toggle power output switch via hwman API"""
     from utils.ssh_interface import run_ssh_command
@@ -1266,16 +1448,84 @@ def internal_error(error):
     return jsonify({"status": "error", "message": "Internal server error occurred"}), 500
 
 # === Utility Functions ===
-def run_diagnostic_test(script_name):
-    module = load_diagnostic_module(script_name)
-    if not module or not hasattr(module, 'run'):
+def run_diagnostic_test(script_name, probe=None):
+    """Run one diagnostic; probe is the run's shared ProbeContext, passed to modules that take one."""
+    from utils.diagnostic_engine import run_check
+
+    info = diagnostic_registry.get(script_name)
+    module = info.module if info else None
+    if not module or not (info.declarative or hasattr(module, 'run')):
         return {'status': 'error', 'output': f'{script_name} not found or invalid'}
     try:
-        return module.run()
+        return run_check(module, probe, accepts_probe=info.accepts_probe)
     except Exception as e:
         logger.error(f"Error running {script_name}: {e}")
         return {'status': 'error', 'output': str(e)}
 
+def run_diagnostics(names, probe=None, incremental=False, scope=None):
+    """
+    Run several diagnostics concurrently through the gate-aware scheduler, sharing one ProbeContext.
+    Yields the runner's ('started', name), ('finished', name, result) and ('heartbeat',) events.
+
+    The run is bounded by DIAGNOSTIC_RUN_BUDGET and each check by its deadline; closing
+    the generator cancels whatever is still running on the device. With incremental=True,
+    checks whose device fingerprint is unchanged return their stored result instead of running.
+    Cancelling scope (e.g. a background job's) cancels the run like closing the generator.
+    """
+    from utils.cancellation import CancelScope
+    from utils.diagnostic_engine import prefetch_inputs
+    from utils.diagnostic_gates import GateSet
+    from utils.diagnostic_runner import DiagnosticRunner
+    from utils.probe_context import ProbeContext
+    from utils.result_store import fingerprint_checks, get_result_store
+
+    probe = probe or ProbeContext()
+    infos = {name: diagnostic_registry.get(name) for name in names}
+    scope = CancelScope(timeout=app.config['DIAGNOSTIC_RUN_BUDGET'], parent=scope)
+    store = get_result_store()
+
+    with scope.bound():
+        # Every run refreshes the stored results, so the next incremental one can reuse them
+        fingerprints = fingerprint_checks(infos.values(), probe)
+        reused = {}
+        if incremental:
+            for name, fingerprint in fingerprints.items():
+                result = store.get(name, fingerprint)
+                if result is not None:
+                    reused[name] = result
+            if reused:
+                logger.info(f"♻️ Reusing {len(reused)} unchanged results: {', '.join(sorted(reused))}")
+
+        # Inputs of declarative checks are fetched for the whole set in one batch per kind
+        prefetch_inputs([info.module for name, info in infos.items()
+                         if info and info.declarative and name not in reused], probe)
+
+    def run_one(name):
+        if name in reused:
+            return reused[name]
+        return run_diagnostic_test(name, probe)
+
+    def store_result(name, result):
+        # Called by the runner after cut-short checks became timeouts, so those are never reused
+        if name in fingerprints and name not in reused:
+            store.put(name, fingerprints[name], result)
+
+    runner = DiagnosticRunner(
+        run_one,
+        max_workers=app.config['DIAGNOSTIC_CONCURRENCY'],
+        gates=GateSet(probe),
+        gates_of=lambda name: infos[name].gates if infos.get(name) else (),
+        scope=scope,
+        check_timeout=app.config['DIAGNOSTIC_CHECK_TIMEOUT'],
+        deadline_of=lambda name: infos[name].deadline if infos.get(name) else None,
+        on_result=store_result
+    )
+    return runner.run(names)
+
+def collect_diagnostics(names, probe=None) -> dict:
+    """Run diagnostics like run_diagnostics and return {name: result} once all have finished."""
+    return {event[1]: event[2] for event in run_diagnostics(names, probe) if event[0] == 'finished'}
+
 def get_network_interfaces():
     interfaces = {}
     for iface in netifaces.interfaces():
@@ -1288,46 +1538,54 @@ def get_network_interfaces():
             interfaces[iface] = {'ip': 'N/A', 'mac': 'N/A'}
     return interfaces
 
-# Cache for system info to reduce SSH commands
-_system_info_cache = {
-    'data': None,
-    'timestamp': None,
-    'ttl': 10  # Cache TTL in seconds - increased to reduce SSH load
-}
+# Cache TTL in seconds for system info - shared by every polling client to reduce SSH load
+SYSTEM_INFO_TTL = 10
+
+# Kernel files read directly for the system info panel
+THERMAL_ZONE0_TEMP = "/sys/class/thermal/thermal_zone0/temp"
+DEVICE_TREE_MODEL = "/proc/device-tree/model"
 
 def get_system_info():
-    from utils.ssh_interface import run_ssh_command
-    import time
-    
-    # Check cache
-    if (_system_info_cache['timestamp'] and 
-        time.time() - _system_info_cache['timestamp'] < _system_info_cache['ttl'] and
-        _system_info_cache['data']):
-        logger.info("[CACHE HIT] Using cached system info")
-        return _system_info_cache['data']
+    from utils.command_cache import get_command_cache
+    from utils.ssh_interface import device_key
+
+    # Concurrent pollers share a single fetch; failures are not cached
+    return get_command_cache().get_or_compute(
+        (device_key(), "__system_info__"),
+        _fetch_system_info,
+        ttl=SYSTEM_INFO_TTL,
+        should_cache=lambda data: data is not None
+    )
+
+def _fetch_system_info():
+    from utils.ssh_interface import run_ssh_batch, read_remote_files
 
     try:
-        logger.info(f"[CACHE MISS] Fetching fresh system info (cache age: {time.time() - (_system_info_cache['timestamp'] or 0):.1f}s)")
+        logger.info("[CACHE MISS] Fetching fresh system info")
         
-        # Run all commands in a single SSH command for efficiency
-        combined_cmd = """
-        echo "UPTIME:$(uptime -p)"
-        echo "HOSTNAME:$(hostname)"
-        echo "OS_VERSION:$(grep PRETTY_NAME /etc/os-release | cut -d= -f2)"
-        echo "IP:$(ip addr show wlan0 2>/dev/null | grep 'inet ' | awk '{print $2}' | cut -d/ -f1 || echo 'N/A')"
-        echo "TEMP:$(cat /sys/class/thermal/thermal_zone0/temp 2>/dev/null || echo 0)"
-        echo "BATTERY:$(cd /home/freddy/V3-Diagnostics-Tool2 && python3 diagnostics/check_battery.py 2>/dev/null | grep -E '(Estimated Charge:|No battery)' | sed 's/.*Estimated Charge: //' | head -1 || echo 'No battery')"
-        echo "PROCESSOR:$(cat /proc/device-tree/model 2>/dev/null | tr -d '\\0' || echo 'Unknown')"
-        """
+        # Run all commands in a single SSH round trip for efficiency
+        commands = {
+            'UPTIME': "uptime -p",
+            'HOSTNAME': "hostname",
+            'OS_VERSION': "grep PRETTY_NAME /etc/os-release | cut -d= -f2",
+            'IP': "ip addr show wlan0 2>/dev/null | grep 'inet ' | awk '{print $2}' | cut -d/ -f1 || echo 'N/A'",
+            'BATTERY': "cd /home/freddy/V3-Diagnostics-Tool2 && python3 diagnostics/check_battery.py 2>/dev/null | grep -E '(Estimated Charge:|No battery)' | sed 's/.*Estimated Charge: //' | head -1 || echo 'No battery'",
+        }
         
-        result = run_ssh_command(combined_cmd.strip())
+        results = run_ssh_batch(list(commands.values()))
         
-        # Parse the combined output
+        # Only keep values from commands that actually succeeded
         data = {}
-        for line in result.split('\n'):
-            if ':' in line:
-                key, value = line.split(':', 1)
-                data[key] = value.strip()
+        for key, result in zip(commands, results):
+            if result['exit_code'] == 0:
+                data[key] = result['stdout'].strip()
+
+        # Plain kernel files are read directly rather than through `cat`
+        files = read_remote_files([THERMAL_ZONE0_TEMP, DEVICE_TREE_MODEL])
+        if THERMAL_ZONE0_TEMP in files:
+            data['TEMP'] = files[THERMAL_ZONE0_TEMP].decode('utf-8', errors='ignore').strip()
+        if DEVICE_TREE_MODEL in files:
+            data['PROCESSOR'] = files[DEVICE_TREE_MODEL].decode('utf-8', errors='ignore').replace('\0', '').strip()
         
         uptime = data.get('UPTIME', '--')
         hostname = data.get('HOSTNAME', '--')
@@ -1358,10 +1616,6 @@ def get_system_info():
             "processor": processor.strip()
         }
         
-        # Update cache
-        _system_info_cache['data'] = result
-        _system_info_cache['timestamp'] = time.time()
-        
         return result
 
     except Exception as e:
@@ -1383,6 +1637,9 @@ if __name__ == '__main__':
     
     logger.info(f"Starting V3 Diagnostics Tool on {host}:{port}")
 
+    # Discover and load every diagnostic module once up front
+    logger.info(f"Loaded {len(diagnostic_registry.metadata())} diagnostic modules")
+
     # Use threading mode for better stability with long-running requests
     # Run Flask directly instead of socketio to get proper threading for MJPEG streams
     app.run(host=host, port=port, debug=True, threaded=True, use_reloader=False)
\ No newline at end of file
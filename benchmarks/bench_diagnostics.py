@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark every diagnostic against the simulated device (utils/fake_device.py).
+
+Each diagnostics/check_* module is run on its own, with a fresh ProbeContext
+and an empty command cache, then the whole suite runs as check_all does. For
+each we report the median wall time and what went over the transport:
+
+    round trips  - calls to the transport (a batch or a multi-file read is one)
+    commands     - commands answered, counting each command inside a batch
+    bytes        - sent / received
+
+No device is needed, and latency is simulated, so the numbers compare changes
+to how checks talk to the device rather than the device itself.
+
+Usage:
+    python benchmarks/bench_diagnostics.py [--iterations 3] [--latency-ms 20] [--jitter-ms 5]
+                                           [--command-latency-ms smartctl=800,mmcli=150]
+                                           [--check check_modem ...] [--skip-check-all]
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.command_cache import get_command_cache
+from utils.fake_device import DEFAULT_COMMAND_LATENCY_MS, FakeDeviceTransport, parse_command_latencies
+from utils.transport import set_transport
+
+def measure(transport, iterations, run):
+    """Run run() iterations times from a cold cache; (wall ms samples, last stats, last result)."""
+    samples = []
+    stats = result = None
+    for _ in range(iterations):
+        get_command_cache().invalidate()
+        transport.stats.snapshot(reset=True)
+        start = time.perf_counter()
+        result = run()
+        samples.append((time.perf_counter() - start) * 1000)
+        stats = transport.stats.snapshot(reset=True)
+    return samples, stats, result
+
+def report(label, status, samples, stats):
+    print(f"{label:<24} {status:<8} {statistics.median(samples):9.1f} ms  "
+          f"{stats['round_trips']:5d} rt  {stats['commands']:5d} cmd  "
+          f"{stats['bytes_out']:8d} B out  {stats['bytes_in']:8d} B in")
+
+def main():
+    parser = argparse.ArgumentParser(description='Diagnostics benchmark against a simulated device')
+    parser.add_argument('--iterations', type=int, default=3)
+    parser.add_argument('--latency-ms', type=float, default=20, help='Simulated round trip latency')
+    parser.add_argument('--jitter-ms', type=float, default=5, help='Up to this much extra latency per round trip')
+    parser.add_argument('--command-latency-ms', default='',
+                        help='Extra device-side time per command prefix, e.g. smartctl=800,mmcli=150')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the jitter')
+    parser.add_argument('--check', action='append', help='Only run these checks (repeatable)')
+    parser.add_argument('--skip-check-all', action='store_true', help='Only run the checks one by one')
+    args = parser.parse_args()
+
+    command_latency = dict(DEFAULT_COMMAND_LATENCY_MS)
+    command_latency.update(parse_command_latencies(args.command_latency_ms))
+    transport = FakeDeviceTransport(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                    command_latency_ms=command_latency, seed=args.seed)
+    set_transport(transport)
+
+    logging.disable(logging.INFO)
+    import app  # Imported once the transport is in place
+    from utils.probe_context import ProbeContext
+
+    names = args.check or app.diagnostic_registry.names()
+    print(f"fake device: {args.latency_ms:g} ms latency, {args.jitter_ms:g} ms jitter, "
+          f"median of {args.iterations} run(s)")
+
+    total_ms = 0.0
+    for name in names:
+        samples, stats, result = measure(transport, args.iterations,
+                                         lambda: app.run_diagnostic_test(name, ProbeContext()))
+        report(name, result.get('status', '?'), samples, stats)
+        total_ms += statistics.median(samples)
+
+    if not args.skip_check_all:
+        print(f"{'sum of checks':<24} {'':<8} {total_ms:9.1f} ms")
+        samples, stats, results = measure(transport, args.iterations, lambda: app.collect_diagnostics(names))
+        failed = sum(1 for result in results.values() if result.get('status') not in ('success', 'warning'))
+        report("check_all", f"{failed} bad" if failed else 'ok', samples, stats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark JPEG frame reassembly from UDP datagrams.
+
+Compares the camera receiver's old loop with utils/jpeg_assembler.py on the
+same synthetic stream: JPEG-sized frames (random entropy data with no markers
+inside, as encoders byte-stuff FF) split into datagrams.
+
+    legacy     - bytearray.extend per datagram, find() for both markers over the
+                 whole buffer, bytes() copy out, slice to keep the remainder
+    assembler  - recv_into a preallocated buffer, marker scan over new bytes only
+
+For each we report frames/s and the memory allocated per frame, measured with
+tracemalloc as the allocation high-water mark above the live heap while each
+datagram is handled, summed over the frame's datagrams (a lower bound: two
+allocations freed within the same datagram count once). The frame handed to
+the receiver is the one allocation both have to make.
+
+Usage:
+    python benchmarks/bench_jpeg_reassembly.py [--frames 300] [--frame-kb 100] [--datagram 8192] [--socket]
+
+--socket sends every datagram through a local datagram socket pair and receives
+it with recvfrom() / recv_into(), as the receiver does, instead of passing bytes in.
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.jpeg_assembler import MAX_DATAGRAM, JpegAssembler
+
+def synthetic_frame(size):
+    body = os.urandom(size).replace(b'\xff', b'\xfe')
+    return b'\xff\xd8' + body + b'\xff\xd9'
+
+def split(stream, datagram):
+    return [stream[i:i + datagram] for i in range(0, len(stream), datagram)]
+
+class LegacyReceiver:
+    """The original UDPCameraReceiver._receive_loop body."""
+
+    def __init__(self, on_frame):
+        self.on_frame = on_frame
+        self.jpeg_buffer = bytearray()
+
+    def handle(self, data):
+        self.jpeg_buffer.extend(data)
+        start_idx = self.jpeg_buffer.find(b'\xff\xd8')
+        end_idx = self.jpeg_buffer.find(b'\xff\xd9')
+        if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
+            self.on_frame(bytes(self.jpeg_buffer[start_idx:end_idx + 2]))
+            self.jpeg_buffer = self.jpeg_buffer[end_idx + 2:]
+
+def make_steps(kind, on_frame, use_socket):
+    """A function handling one datagram, for the given implementation."""
+    if kind == 'legacy':
+        receiver = LegacyReceiver(on_frame)
+        if not use_socket:
+            return receiver.handle, None
+        sender, receiving = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+        def step(data):
+            sender.send(data)
+            receiver.handle(receiving.recvfrom(MAX_DATAGRAM)[0])
+        return step, (sender, receiving)
+
+    assembler = JpegAssembler(on_frame)
+    if not use_socket:
+        return assembler.feed, None
+    sender, receiving = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    def step(data):
+        sender.send(data)
+        assembler.recv_from(receiving)
+    return step, (sender, receiving)
+
+def run(kind, datagrams, use_socket, trace):
+    received = []
+    latest = [None]
+
+    def on_frame(frame):
+        latest[0] = frame  # Like the receiver's deque, only recent frames stay alive
+        received.append(len(frame))
+
+    step, sockets = make_steps(kind, on_frame, use_socket)
+    allocated = 0
+    try:
+        if trace:
+            tracemalloc.start()
+            for data in datagrams:
+                live = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                step(data)
+                allocated += tracemalloc.get_traced_memory()[1] - live
+            tracemalloc.stop()
+            elapsed = None
+        else:
+            start = time.perf_counter()
+            for data in datagrams:
+                step(data)
+            elapsed = time.perf_counter() - start
+    finally:
+        for sock in sockets or ():
+            sock.close()
+    return received, elapsed, allocated
+
+def main():
+    parser = argparse.ArgumentParser(description='JPEG reassembly benchmark')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--frame-kb', type=int, default=100, help='Approximate JPEG size')
+    parser.add_argument('--datagram', type=int, default=8192, help=f'Datagram size (max {MAX_DATAGRAM})')
+    parser.add_argument('--socket', action='store_true', help='Go through a local datagram socket pair')
+    args = parser.parse_args()
+
+    datagram = max(1, min(args.datagram, MAX_DATAGRAM))
+    frames = [synthetic_frame(args.frame_kb * 1024) for _ in range(args.frames)]
+    datagrams = split(b''.join(frames), datagram)
+    print(f"{len(frames)} frames of ~{args.frame_kb} KB in {len(datagrams)} datagrams of {datagram} bytes"
+          f"{' over a socket pair' if args.socket else ''}")
+
+    for kind in ('legacy', 'assembler'):
+        received, elapsed, _ = run(kind, datagrams, args.socket, trace=False)
+        if received != [len(frame) for frame in frames]:
+            raise SystemExit(f"❌ {kind} reassembled {len(received)} of {len(frames)} frames incorrectly")
+        _, _, allocated = run(kind, datagrams, args.socket, trace=True)
+        print(f"{kind:<10} {len(frames) / elapsed:10.1f} frames/s  "
+              f"{allocated / len(frames) / 1024:9.1f} KiB allocated/frame")
+
+if __name__ == "__main__":
+    main()
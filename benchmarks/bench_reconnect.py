@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark SSH reconnect latency with and without the legacy host key clearing.
+
+Before the in-process HostKeyManager, every (re)connect went through
+disconnect(), which forked `ssh-keygen -R <host>`. This script times
+disconnect + connect cycles against the configured device (.env) in both modes:
+
+    legacy   - disconnect + `ssh-keygen -R` fork + connect (old behaviour)
+    current  - disconnect + connect, host key remembered in-process
+
+Usage:
+    python benchmarks/bench_reconnect.py [--iterations 20] [--teardown-only]
+
+--teardown-only skips the connect and only measures the disconnect path,
+which works without a device attached.
+"""
+import argparse
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.ssh_persistent import PersistentSSHConnection
+
+def legacy_clear_host_keys(host):
+    """What disconnect() used to do on every call."""
+    subprocess.run(["ssh-keygen", "-R", host], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+def measure(conn, iterations, legacy, teardown_only):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        conn.disconnect(silent=True)
+        if legacy:
+            legacy_clear_host_keys(conn.ssh_host)
+        if not teardown_only and not conn.connect():
+            raise SystemExit("❌ Could not connect to the device - use --teardown-only without a device")
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<8} mean={statistics.mean(samples):8.2f} ms  "
+          f"p50={statistics.median(samples):8.2f} ms  p95={p95:8.2f} ms  (n={len(samples)})")
+
+def main():
+    parser = argparse.ArgumentParser(description='SSH reconnect latency benchmark')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--teardown-only', action='store_true', help='Measure disconnect only (no device needed)')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    conn = PersistentSSHConnection()
+    if not args.teardown_only and not conn.connect():
+        raise SystemExit("❌ Could not connect to the device - use --teardown-only without a device")
+
+    mode = "disconnect" if args.teardown_only else "reconnect"
+    print(f"{mode} latency to {conn.ssh_user}@{conn.ssh_host}:{conn.ssh_port}")
+    report("legacy", measure(conn, args.iterations, legacy=True, teardown_only=args.teardown_only))
+    report("current", measure(conn, args.iterations, legacy=False, teardown_only=args.teardown_only))
+    conn.disconnect(silent=True)
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,14 @@
 import sys, os
 import json
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.ssh_interface import run_ssh_command
+from utils.probe_context import ProbeContext
+from diagnostics.diagnostic_utils import battery_charger_command
+
+# Registry metadata
+CATEGORY = "power"
+EXPECTED_DURATION = 2  # seconds
+NEEDS_SUDO = False
+GATES = ["ssh"]
 
 def parse_voltage_field(response, field_name):
     """Parse voltage field from JSON response"""
@@ -30,17 +37,16 @@ def battery_bar(percent):
     """Generate battery charge visual bar"""
     return "▮" * (percent // 10) + "▯" * (10 - percent // 10)
 
-def run():
+def run(probe=None):
+    probe = probe or ProbeContext()
     try:
         output = []
         
-        # Get voltage readings via API calls
-        vbat_response = run_ssh_command(
-            "curl -s http://localhost:2000/battery_charger_field/BATTERY_CHARGER_FIELD_VBAT_ADC"
-        )
-        vac1_response = run_ssh_command(
-            "curl -s http://localhost:2000/battery_charger_field/BATTERY_CHARGER_FIELD_VAC1_ADC"
-        )
+        # Get voltage readings via API calls (issued in parallel)
+        vbat_future = probe.submit_ssh_command(battery_charger_command("BATTERY_CHARGER_FIELD_VBAT_ADC"))
+        vac1_future = probe.submit_ssh_command(battery_charger_command("BATTERY_CHARGER_FIELD_VAC1_ADC"))
+        vbat_response = vbat_future.result()
+        vac1_response = vac1_future.result()
         
         # Check if commands failed or returned errors
         if not vbat_response or vbat_response.startswith('Error:') or not vac1_response or vac1_response.startswith('Error:'):
@@ -1,6 +1,14 @@
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.ssh_interface import run_ssh_command
+from utils.ssh_interface import run_ssh_batch
+from diagnostics.diagnostic_utils import CAMERA_DETECT_TTL
+
+# Registry metadata
+CATEGORY = "camera"
+EXPECTED_DURATION = 2  # seconds
+NEEDS_SUDO = False
+GATES = ["ssh"]
+FINGERPRINT = ["boot_id", "dev", "usb"]
 
 def run():
     try:
@@ -13,10 +21,15 @@ def run():
             'IMX662': 'PGM'
         }
 
-        # Detect all video and media devices
-        video_devices = run_ssh_command("ls /dev/video* 2>/dev/null")
-        media_devices = run_ssh_command("ls /dev/media* 2>/dev/null")
-        v4l2_output = run_ssh_command("v4l2-ctl --list-devices 2>/dev/null")
+        # Detect all video and media devices in a single round trip
+        video_result, media_result, v4l2_result = run_ssh_batch([
+            "ls /dev/video* 2>/dev/null",
+            "ls /dev/media* 2>/dev/null",
+            "v4l2-ctl --list-devices 2>/dev/null"
+        ], cache_ttl=CAMERA_DETECT_TTL)
+        video_devices = video_result['stdout']
+        media_devices = media_result['stdout']
+        v4l2_output = v4l2_result['stdout']
 
         # Initialize status variables
         camera_checked = 0
@@ -1,14 +1,23 @@
 import sys, os, re
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.ssh_interface import run_ssh_command, run_sudo_command
+from utils.probe_context import ProbeContext
 
-def run():
+# Registry metadata
+CATEGORY = "storage"
+EXPECTED_DURATION = 10  # seconds
+DEADLINE = 45  # smartctl on every disk can be slow
+NEEDS_SUDO = True
+GATES = ["ssh", "block_devices"]
+FINGERPRINT = ["boot_id", "block"]
+
+def run(probe=None):
+    probe = probe or ProbeContext()
     try:
         output = []
         output.append("SMART Disk Health:\n")
         
-        # Get all disk devices
-        lsblk_output = run_ssh_command("lsblk -dno NAME")
+        # Get all disk devices (shared with the block_devices gate)
+        lsblk_output = probe.run_ssh_command("lsblk -dno NAME")
         if lsblk_output.startswith('Error:'):
             return {
                 'status': 'error',
@@ -27,7 +36,7 @@ def run():
                 
             output.append(f"Device: {device}")
             # Use sudo with password
-            result = run_sudo_command(f"smartctl -H {device}", timeout=10)
+            result = probe.run_sudo_command(f"smartctl -H {device}", timeout=10)
             if "PASSED" in result:
                 output.append("✅ Health: PASSED\n")
             elif "FAILED" in result:
@@ -1,25 +1,26 @@
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.ssh_interface import run_ssh_command, run_sudo_command
+from utils.diagnostic_engine import evaluate_check
 
-def run():
-    try:
-        output = []
-        output.append("Critical Kernel Logs:")
-        # Use sudo with password
-        result = run_sudo_command("dmesg | grep -iE 'fail|error|critical' | tail -n 30", timeout=10)
-        output.append(result)
-        
-        return {
-            'status': 'success' if not result.startswith('Error:') else 'error',
-            'output': '\n'.join(output)
-        }
-    except Exception as e:
-        return {
-            'status': 'error',
-            'output': f'Error checking dmesg: {str(e)}'
-        }
+# Registry metadata
+CATEGORY = "logs"
+EXPECTED_DURATION = 3  # seconds
+NEEDS_SUDO = True
+GATES = ["ssh"]
+
+SUDO_COMMANDS = {"dmesg": "dmesg | grep -iE 'fail|error|critical' | tail -n 30"}
+
+def evaluate(inputs):
+    output = []
+    output.append("Critical Kernel Logs:")
+    result = inputs['dmesg']
+    output.append(result)
+    
+    return {
+        'status': 'success' if not result.startswith('Error:') else 'error',
+        'output': '\n'.join(output)
+    }
 
 if __name__ == "__main__":
-    result = run()
+    result = evaluate_check(sys.modules[__name__])
     print(result['output'])
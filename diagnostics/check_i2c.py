@@ -1,24 +1,27 @@
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.ssh_interface import run_ssh_command
+from utils.diagnostic_engine import evaluate_check
 
-def run():
-    try:
-        output = []
-        output.append("I2C Devices:")
-        result = run_ssh_command("i2cdetect -y 1")
-        output.append(result)
-        
-        return {
-            'status': 'success' if not result.startswith('Error:') else 'error',
-            'output': '\n'.join(output)
-        }
-    except Exception as e:
-        return {
-            'status': 'error',
-            'output': f'Error checking I2C devices: {str(e)}'
-        }
+# Registry metadata
+CATEGORY = "hardware"
+EXPECTED_DURATION = 1  # seconds
+NEEDS_SUDO = False
+GATES = ["ssh"]
+FINGERPRINT = ["boot_id", "dev"]
+
+COMMANDS = {"i2cdetect": "i2cdetect -y 1"}
+
+def evaluate(inputs):
+    output = []
+    output.append("I2C Devices:")
+    result = inputs['i2cdetect']
+    output.append(result)
+    
+    return {
+        'status': 'success' if not result.startswith('Error:') else 'error',
+        'output': '\n'.join(output)
+    }
 
 if __name__ == "__main__":
-    result = run()
+    result = evaluate_check(sys.modules[__name__])
     print(result['output'])
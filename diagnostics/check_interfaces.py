@@ -1,24 +1,30 @@
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.ssh_interface import run_ssh_command
+from utils.diagnostic_engine import evaluate_check
 
-def run():
-    try:
-        output = []
-        output.append("Network Interfaces:")
-        result = run_ssh_command("ip a && nmcli device")
-        output.append(result)
-        
-        return {
-            'status': 'success' if not result.startswith('Error:') else 'error',
-            'output': '\n'.join(output)
-        }
-    except Exception as e:
-        return {
-            'status': 'error',
-            'output': f'Error checking interfaces: {str(e)}'
-        }
+# Registry metadata
+CATEGORY = "network"
+EXPECTED_DURATION = 1  # seconds
+NEEDS_SUDO = False
+GATES = ["ssh"]
+
+# Separate commands so `nmcli device` is shared with check_network within a run
+COMMANDS = {"ip": "ip a", "nmcli": "nmcli device"}
+
+def evaluate(inputs):
+    output = []
+    output.append("Network Interfaces:")
+    result = inputs['ip']
+    if not result.startswith('Error:'):
+        result = result.rstrip('\n') + '\n' + inputs['nmcli']
+    output.append(result)
+    failed = inputs['ip'].startswith('Error:') or inputs['nmcli'].startswith('Error:')
+    
+    return {
+        'status': 'error' if failed else 'success',
+        'output': '\n'.join(output)
+    }
 
 if __name__ == "__main__":
-    result = run()
+    result = evaluate_check(sys.modules[__name__])
     print(result['output'])
@@ -2,6 +2,12 @@ import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from utils.ssh_interface import run_ssh_command, run_sudo_command
 
+# Registry metadata
+CATEGORY = "logs"
+EXPECTED_DURATION = 5  # seconds
+NEEDS_SUDO = True
+GATES = ["ssh"]
+
 def run():
     try:
         output = []
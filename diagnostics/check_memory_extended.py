@@ -1,29 +1,38 @@
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.ssh_interface import run_ssh_command
+from utils.diagnostic_engine import evaluate_check
 
-def run():
-    try:
-        output = []
-        output.append("Memory Summary:")
-        result1 = run_ssh_command("free -h")
-        output.append(result1)
-        
-        output.append("\nDetailed Memory Info:")
-        result2 = run_ssh_command("cat /proc/meminfo | head -n 20")
-        output.append(result2)
-        
-        has_error = result1.startswith('Error:') or result2.startswith('Error:')
-        return {
-            'status': 'error' if has_error else 'success',
-            'output': '\n'.join(output)
-        }
-    except Exception as e:
-        return {
-            'status': 'error',
-            'output': f'Error checking extended memory: {str(e)}'
-        }
+# Registry metadata
+CATEGORY = "system"
+EXPECTED_DURATION = 1  # seconds
+NEEDS_SUDO = False
+GATES = ["ssh"]
+
+MEMINFO_PATH = "/proc/meminfo"
+
+COMMANDS = {"free": "free -h"}
+FILES = {"meminfo": MEMINFO_PATH}
+
+def evaluate(inputs):
+    output = []
+    free_output = inputs['free']
+    meminfo = inputs['meminfo'].get(MEMINFO_PATH)
+
+    output.append("Memory Summary:")
+    output.append(free_output.strip())
+    
+    output.append("\nDetailed Memory Info:")
+    if meminfo is not None:
+        output.append('\n'.join(meminfo.decode('utf-8', errors='ignore').splitlines()[:20]))
+    else:
+        output.append(f"Error: Could not read {MEMINFO_PATH}")
+    
+    has_error = free_output.startswith("Error:") or meminfo is None
+    return {
+        'status': 'error' if has_error else 'success',
+        'output': '\n'.join(output)
+    }
 
 if __name__ == "__main__":
-    result = run()
+    result = evaluate_check(sys.modules[__name__])
     print(result['output'])
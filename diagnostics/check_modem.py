@@ -1,14 +1,21 @@
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.ssh_interface import run_ssh_command, run_sudo_command
+from utils.probe_context import ProbeContext
 
-def run():
+# Registry metadata
+CATEGORY = "cellular"
+EXPECTED_DURATION = 8  # seconds
+NEEDS_SUDO = True
+GATES = ["ssh"]
+
+def run(probe=None):
+    probe = probe or ProbeContext()
     try:
         output = []
         output.append("🔌 Modem Status:")
         
         # First check if modem exists
-        modem_list = run_sudo_command("mmcli -L", timeout=10)
+        modem_list = probe.run_sudo_command("mmcli -L", timeout=10)
         
         if "No modems were found" in modem_list:
             output.append("❌ No modem detected")
@@ -46,7 +53,7 @@ def run():
         
         for cmd, description in commands:
             output.append(f"\n--- {description} ---")
-            result = run_sudo_command(cmd, timeout=10)
+            result = probe.run_sudo_command(cmd, timeout=10)
             
             # Don't fail if these commands have issues, just report them
             if "error" in result.lower() and "no actions specified" not in result.lower():
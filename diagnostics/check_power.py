@@ -4,7 +4,14 @@
 import sys, os
 import json
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.ssh_interface import run_ssh_command, check_ssh_connection
+from utils.probe_context import ProbeContext
+from diagnostics.diagnostic_utils import battery_charger_command
+
+# Registry metadata
+CATEGORY = "power"
+EXPECTED_DURATION = 3  # seconds
+NEEDS_SUDO = True
+GATES = ["ssh"]
 
 def parse_voltage_reading(response):
     """Parse voltage reading from various sources"""
@@ -16,7 +23,7 @@ def parse_voltage_reading(response):
     except:
         return None
 
-def check_voltage_rail(rail_name, expected_voltage, tolerance=0.3):
+def check_voltage_rail(probe, rail_name, expected_voltage, tolerance=0.3):
     """Check if a voltage rail is within expected range"""
     # Dictionary of possible voltage monitoring paths
     voltage_sources = {
@@ -35,7 +42,7 @@ def check_voltage_rail(rail_name, expected_voltage, tolerance=0.3):
     # Try to read voltage from various sources
     voltage = None
     for cmd in voltage_sources.get(rail_name, []):
-        response = run_ssh_command(cmd)
+        response = probe.run_ssh_command(cmd)
         if response and not response.startswith("Error:"):
             raw_value = parse_voltage_reading(response)
             if raw_value is not None:
@@ -49,7 +56,7 @@ def check_voltage_rail(rail_name, expected_voltage, tolerance=0.3):
     # If we couldn't read from system sources, try the power management API
     if voltage is None and rail_name == "3.3V":
         # Try to read 3.3V rail via power management API or GPIO
-        response = run_ssh_command("cat /sys/class/gpio/gpio*/value 2>/dev/null | head -1")
+        response = probe.run_ssh_command("cat /sys/class/gpio/gpio*/value 2>/dev/null | head -1")
         if response and response.strip() in ["0", "1"]:
             # GPIO high means rail is probably OK
             voltage = 3.3 if response.strip() == "1" else 0
@@ -65,8 +72,8 @@ def check_voltage_rail(rail_name, expected_voltage, tolerance=0.3):
     else:
         # If we can't read the voltage, check if the rail is at least enabled
         # This is a fallback - we'll check regulator status
-        cmd = f"echo 'C1tyIsLif3' | sudo -S grep -E '(VDD_{rail_name.replace('.', '')}|{rail_name.replace('.', '')}V)' /sys/kernel/debug/regulator/regulator_summary 2>/dev/null | head -1"
-        response = run_ssh_command(cmd)
+        cmd = f"grep -E '(VDD_{rail_name.replace('.', '')}|{rail_name.replace('.', '')}V)' /sys/kernel/debug/regulator/regulator_summary 2>/dev/null | head -1"
+        response = probe.run_sudo_command(cmd)
         if response and "enabled" in response.lower():
             return f"⚠️  {rail_name}: Enabled (voltage reading unavailable)"
         elif response and "disabled" in response.lower():
@@ -75,16 +82,9 @@ def check_voltage_rail(rail_name, expected_voltage, tolerance=0.3):
             # Final fallback - status unknown
             return f"⚠️  {rail_name}: Status unknown"
 
-def run():
+def run(probe=None):
+    probe = probe or ProbeContext()
     try:
-        # Check if device is connected first
-        connected, message = check_ssh_connection()
-        if not connected:
-            return {
-                'status': 'error',
-                'output': f'❌ No device connected\n{message}\n\nPlease connect a V3 sensor module via USB to run diagnostics.'
-            }
-        
         output = []
         output.append("🔌 Power Rail Status:")
         output.append("-" * 30)
@@ -98,7 +98,7 @@ def run():
         all_ok = True
         unknown_count = 0
         for rail_name, expected_voltage in rails_to_check:
-            result = check_voltage_rail(rail_name, expected_voltage)
+            result = check_voltage_rail(probe, rail_name, expected_voltage)
             output.append(result)
             if "❌" in result:
                 all_ok = False
@@ -110,9 +110,7 @@ def run():
         output.append("📊 Additional Power Info:")
         
         # Check battery/input voltage if available
-        vbat_response = run_ssh_command(
-            "curl -s http://localhost:2000/battery_charger_field/BATTERY_CHARGER_FIELD_VBAT_ADC 2>/dev/null"
-        )
+        vbat_response = probe.run_ssh_command(battery_charger_command("BATTERY_CHARGER_FIELD_VBAT_ADC"))
         if vbat_response and not vbat_response.startswith("Error:"):
             try:
                 data = json.loads(vbat_response)
@@ -124,9 +122,7 @@ def run():
             except:
                 pass
         
-        vac_response = run_ssh_command(
-            "curl -s http://localhost:2000/battery_charger_field/BATTERY_CHARGER_FIELD_VAC1_ADC 2>/dev/null"
-        )
+        vac_response = probe.run_ssh_command(battery_charger_command("BATTERY_CHARGER_FIELD_VAC1_ADC"))
         if vac_response and not vac_response.startswith("Error:"):
             try:
                 data = json.loads(vac_response)
@@ -139,10 +135,9 @@ def run():
                 pass
         
         # Check current consumption if available
-        current_response = run_ssh_command(
-            "cat /sys/class/power_supply/*/current_now 2>/dev/null | head -1"
-        )
-        if current_response and current_response.strip().isdigit():
+        current_files = probe.read_remote_files(["/sys/class/power_supply/*/current_now"])
+        current_response = next(iter(current_files.values()), b"").decode('utf-8', errors='ignore')
+        if current_response.strip().isdigit():
             current_ma = int(current_response.strip()) / 1000  # Convert from uA to mA
             output.append(f"📈 Current Draw: {current_ma:.1f}mA")
         
@@ -1,7 +1,13 @@
 import sys, os
 import re
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.ssh_interface import run_ssh_command, run_sudo_command
+from utils.probe_context import ProbeContext
+
+# Registry metadata
+CATEGORY = "cellular"
+EXPECTED_DURATION = 8  # seconds
+NEEDS_SUDO = True
+GATES = ["ssh", "modem"]
 
 def extract_sim_details(modem_output):
     """Extract key SIM details from modem output"""
@@ -54,35 +60,14 @@ def extract_sim_details(modem_output):
     
     return details
 
-def run():
+def run(probe=None):
+    probe = probe or ProbeContext()
     try:
         output = []
         output.append("📱 SIM Card Status:")
         
-        # Step 1: Check for modems
-        modem_list = run_sudo_command("mmcli -L", timeout=10)
-        
-        if "No modems were found" in modem_list:
-            output.append("❌ No modem found - cannot check SIM")
-            return {
-                'status': 'error',
-                'output': '\n'.join(output)
-            }
-        elif "ModemManager is not running" in modem_list:
-            output.append("❌ ModemManager service is not active")
-            return {
-                'status': 'error',
-                'output': '\n'.join(output)
-            }
-        elif "/Modem/" not in modem_list:
-            output.append("❌ Could not detect modem")
-            return {
-                'status': 'error',
-                'output': '\n'.join(output)
-            }
-        
-        # Step 2: Get full modem information
-        modem_info = run_sudo_command("mmcli -m 0", timeout=10)
+        # The modem gate has already confirmed a modem; get its full information
+        modem_info = probe.run_sudo_command("mmcli -m 0", timeout=10)
         
         # Check if SIM is present
         if "sim: none" in modem_info.lower() or "no sim" in modem_info.lower():
@@ -106,7 +91,7 @@ def run():
         output.append("")
         
         # Get SIM specific information
-        sim_info = run_sudo_command("mmcli -i 0", timeout=10)
+        sim_info = probe.run_sudo_command("mmcli -i 0", timeout=10)
         
         # Extract and display key details
         details = extract_sim_details(modem_info + "\n" + sim_info)
@@ -141,7 +126,7 @@ def run():
                 output.append(bands)
         
         # Get signal strength
-        signal_info = run_sudo_command("mmcli -m 0 --signal", timeout=10)
+        signal_info = probe.run_sudo_command("mmcli -m 0 --signal", timeout=10)
         if signal_info and "error" not in signal_info.lower():
             output.append("")
             output.append("--- Signal Information ---")
@@ -1,24 +1,26 @@
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.ssh_interface import run_ssh_command
+from utils.diagnostic_engine import evaluate_check
 
-def run():
-    try:
-        output = []
-        output.append("Disk Usage:")
-        result = run_ssh_command("df -h")
-        output.append(result)
-        
-        return {
-            'status': 'success' if not result.startswith('Error:') else 'error',
-            'output': '\n'.join(output)
-        }
-    except Exception as e:
-        return {
-            'status': 'error',
-            'output': f'Error checking storage: {str(e)}'
-        }
+# Registry metadata
+CATEGORY = "storage"
+EXPECTED_DURATION = 1  # seconds
+NEEDS_SUDO = False
+GATES = ["ssh"]
+
+COMMANDS = {"df": "df -h"}
+
+def evaluate(inputs):
+    output = []
+    output.append("Disk Usage:")
+    result = inputs['df']
+    output.append(result)
+    
+    return {
+        'status': 'success' if not result.startswith('Error:') else 'error',
+        'output': '\n'.join(output)
+    }
 
 if __name__ == "__main__":
-    result = run()
+    result = evaluate_check(sys.modules[__name__])
     print(result['output'])
@@ -1,48 +1,48 @@
 import sys, os
+import posixpath
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.ssh_interface import run_ssh_command
+from utils.diagnostic_engine import evaluate_check
 
-def run():
-    try:
-        output = []
-        output.append("Thermal Sensors:")
-        
-        # Build shell command to fetch and label thermal zones
-        command = r"""
-for zone in /sys/class/thermal/thermal_zone*; do
-  label=$(cat "$zone/type" 2>/dev/null)
-  temp=$(cat "$zone/temp" 2>/dev/null)
-  if [[ "$temp" =~ ^[0-9]+$ ]]; then
-    celsius=$(echo "scale=1; $temp / 1000" | bc)
-    alert=""
-    if (( $(echo "$celsius > 75.0" | bc -l) )); then alert=" 🔥"; fi
-    echo "$label: ${celsius}°C$alert"
-  else
-    echo "$label: Invalid temperature format"
-  fi
-done
-"""
-        
-        result = run_ssh_command(command)
-        
-        # Format the result
-        if "Error" not in result:
-            output.append(result.strip())
-            status = 'success'
-        else:
-            output.append(f"❌ Error retrieving thermal zones:\n{result}")
-            status = 'error'
-        
-        return {
-            'status': status,
-            'output': '\n'.join(output)
-        }
-    except Exception as e:
-        return {
-            'status': 'error',
-            'output': f'Error checking thermals: {str(e)}'
-        }
+# Registry metadata
+CATEGORY = "hardware"
+EXPECTED_DURATION = 1  # seconds
+NEEDS_SUDO = False
+GATES = ["ssh"]
+
+THERMAL_ZONE_FILES = ["/sys/class/thermal/thermal_zone*/type", "/sys/class/thermal/thermal_zone*/temp"]
+ALERT_CELSIUS = 75.0
+
+FILES = {"zones": THERMAL_ZONE_FILES}
+
+def evaluate(inputs):
+    output = []
+    output.append("Thermal Sensors:")
+    
+    # Every zone's label and temperature arrive in one read instead of a shell loop
+    files = inputs['zones']
+    zones = sorted({posixpath.dirname(path) for path in files})
+    
+    # Format the result
+    if zones:
+        for zone in zones:
+            label = files.get(f"{zone}/type", b"").decode('utf-8', errors='ignore').strip()
+            temp = files.get(f"{zone}/temp", b"").decode('utf-8', errors='ignore').strip()
+            if temp.isdigit():
+                celsius = int(temp) // 100 / 10  # Truncated to one decimal, like `bc scale=1`
+                alert = " 🔥" if celsius > ALERT_CELSIUS else ""
+                output.append(f"{label}: {celsius:.1f}°C{alert}")
+            else:
+                output.append(f"{label}: Invalid temperature format")
+        status = 'success'
+    else:
+        output.append("❌ Error retrieving thermal zones:\nNo thermal zones could be read")
+        status = 'error'
+    
+    return {
+        'status': status,
+        'output': '\n'.join(output)
+    }
 
 if __name__ == "__main__":
-    result = run()
+    result = evaluate_check(sys.modules[__name__])
     print(result['output'])
@@ -1,24 +1,27 @@
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.ssh_interface import run_ssh_command
+from utils.diagnostic_engine import evaluate_check
 
-def run():
-    try:
-        output = []
-        output.append("USB Devices:")
-        result = run_ssh_command("lsusb")
-        output.append(result)
-        
-        return {
-            'status': 'success' if not result.startswith('Error:') else 'error',
-            'output': '\n'.join(output)
-        }
-    except Exception as e:
-        return {
-            'status': 'error',
-            'output': f'Error checking USB devices: {str(e)}'
-        }
+# Registry metadata
+CATEGORY = "hardware"
+EXPECTED_DURATION = 1  # seconds
+NEEDS_SUDO = False
+GATES = ["ssh"]
+FINGERPRINT = ["boot_id", "usb"]
+
+COMMANDS = {"lsusb": "lsusb"}
+
+def evaluate(inputs):
+    output = []
+    output.append("USB Devices:")
+    result = inputs['lsusb']
+    output.append(result)
+    
+    return {
+        'status': 'success' if not result.startswith('Error:') else 'error',
+        'output': '\n'.join(output)
+    }
 
 if __name__ == "__main__":
-    result = run()
+    result = evaluate_check(sys.modules[__name__])
     print(result['output'])
@@ -14,4 +14,18 @@ def run_diagnostic_command(command: str, timeout: int = 30) -> str:
     return _run_ssh_command(command, timeout=timeout)
 
 # Alias for backward compatibility
-run_ssh_command = run_diagnostic_command
\ No newline at end of file
+run_ssh_command = run_diagnostic_command
+
+# Local power management API on the device
+BATTERY_CHARGER_API = "http://localhost:2000/battery_charger_field"
+
+def battery_charger_command(field: str) -> str:
+    """
+    Command reading one BATTERY_CHARGER_FIELD_* value.
+    check_battery and check_power share it so a run's ProbeContext sees one probe per field.
+    """
+    return f"curl -s {BATTERY_CHARGER_API}/{field} 2>/dev/null"
+
+# Camera enumeration rarely changes: check_camera and /api/camera/detect cache
+# v4l2 listings for this many seconds and share the cache entry
+CAMERA_DETECT_TTL = 10
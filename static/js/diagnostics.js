@@ -113,136 +113,163 @@
 
         // Handle check_all with Server-Sent Events for progress
         if (testName === 'check_all') {
-            // For SSE, we need to make a GET request
-            const eventSource = new EventSource(route);
-            let allResults = {};
+            // check_all runs as a job on the server: a reload or another tab attaches to the
+            // same run instead of starting over, and a dropped stream resumes where it left off
+            const watchJob = (jobId) => {
+                const eventSource = new EventSource(`/api/diagnostic/jobs/${jobId}/events`);
+                let allResults = {};
             
-            eventSource.onmessage = (event) => {
-                const data = JSON.parse(event.data);
+                eventSource.onmessage = (event) => {
+                    const data = JSON.parse(event.data);
                 
-                switch(data.type) {
-                    case 'start':
-                        elements.output.textContent = `Starting all diagnostics (0/${data.total} tests)...`;
-                        break;
+                    switch(data.type) {
+                        case 'start':
+                            elements.output.textContent = `Starting all diagnostics (0/${data.total} tests)...`;
+                            break;
                         
-                    case 'progress':
-                        elements.output.textContent = `Running diagnostics (${data.current}/${data.total}): ${data.test}...`;
-                        break;
+                        case 'progress':
+                            elements.output.textContent = `Running diagnostics (${data.current}/${data.total}): ${data.test}...`;
+                            break;
                         
-                    case 'result':
-                        allResults[data.test] = data.result;
-                        // Update output with partial results
-                        const outputText = Object.entries(allResults)
-                            .map(([k, v]) => `\n[${k}]\n${v.output || v}`)
-                            .join('\n');
-                        elements.output.textContent = `Running diagnostics... (${Object.keys(allResults).length} completed)\n${outputText}`;
-                        break;
+                        case 'result':
+                            allResults[data.test] = data.result;
+                            // Update output with partial results
+                            const outputText = Object.entries(allResults)
+                                .map(([k, v]) => `\n[${k}]\n${v.output || v}`)
+                                .join('\n');
+                            elements.output.textContent = `Running diagnostics... (${Object.keys(allResults).length} completed)\n${outputText}`;
+                            break;
                         
-                    case 'complete':
-                        eventSource.close();
-                        clearTimeout(timeoutId);
+                        case 'complete':
+                            eventSource.close();
+                            clearTimeout(timeoutId);
                         
-                        // Format results for dashboard
-                        if (isDashboard && window.updateDiagnosticResults) {
-                            // Convert raw output to structured format for dashboard
-                            const formattedResults = {};
-                            for (const [test, result] of Object.entries(data.data)) {
-                                const output = result.output || result;
-                                // Determine status based on output content
-                                let status = 'passed';
-                                let message = '';
-
-                                // Check if the result already has a message field, use it
-                                if (result.message) {
-                                    message = result.message;
-                                    // Determine status from the message
-                                    if (message.includes('❌')) {
-                                        status = 'failed';
-                                    } else if (message.includes('⚠️')) {
-                                        status = 'warning';
-                                    } else if (message.includes('✅')) {
-                                        status = 'passed';
-                                    }
-                                } else {
-                                    // Fall back to extracting from output
-                                    // Check for success indicators first
-                                    if (output.includes('✅')) {
-                                        status = 'passed';
-                                        // Find the line with ✅ for the message
-                                        const lines = output.split('\n');
-                                        const successLine = lines.find(line => line.includes('✅'));
-                                        message = successLine || lines[0];
-                                    } else if (output.includes('❌') || (output.includes('Error') && !output.includes('Error running') && !output.includes('Error:'))) {
-                                        status = 'failed';
-                                        // Find the line with ❌ for the message
-                                        const lines = output.split('\n');
-                                        const errorLine = lines.find(line => line.includes('❌'));
-                                        message = errorLine || lines[0];
-                                    } else if (output.includes('⚠️') || output.includes('Warning')) {
-                                        status = 'warning';
-                                        const lines = output.split('\n');
-                                        const warningLine = lines.find(line => line.includes('⚠️'));
-                                        message = warningLine || lines[0];
+                            // Format results for dashboard
+                            if (isDashboard && window.updateDiagnosticResults) {
+                                // Convert raw output to structured format for dashboard
+                                const formattedResults = {};
+                                for (const [test, result] of Object.entries(data.data)) {
+                                    const output = result.output || result;
+                                    // Determine status based on output content
+                                    let status = 'passed';
+                                    let message = '';
+
+                                    // Check if the result already has a message field, use it
+                                    if (result.message) {
+                                        message = result.message;
+                                        // Determine status from the message
+                                        if (message.includes('❌')) {
+                                            status = 'failed';
+                                        } else if (message.includes('⚠️')) {
+                                            status = 'warning';
+                                        } else if (message.includes('✅')) {
+                                            status = 'passed';
+                                        }
                                     } else {
-                                        message = 'Test completed';
+                                        // Fall back to extracting from output
+                                        // Check for success indicators first
+                                        if (output.includes('✅')) {
+                                            status = 'passed';
+                                            // Find the line with ✅ for the message
+                                            const lines = output.split('\n');
+                                            const successLine = lines.find(line => line.includes('✅'));
+                                            message = successLine || lines[0];
+                                        } else if (output.includes('❌') || (output.includes('Error') && !output.includes('Error running') && !output.includes('Error:'))) {
+                                            status = 'failed';
+                                            // Find the line with ❌ for the message
+                                            const lines = output.split('\n');
+                                            const errorLine = lines.find(line => line.includes('❌'));
+                                            message = errorLine || lines[0];
+                                        } else if (output.includes('⚠️') || output.includes('Warning')) {
+                                            status = 'warning';
+                                            const lines = output.split('\n');
+                                            const warningLine = lines.find(line => line.includes('⚠️'));
+                                            message = warningLine || lines[0];
+                                        } else {
+                                            message = 'Test completed';
+                                        }
                                     }
-                                }
 
-                                formattedResults[test] = {
-                                    status: status,
-                                    message: message,
-                                    output: output
-                                };
+                                    formattedResults[test] = {
+                                        status: status,
+                                        message: message,
+                                        output: output
+                                    };
+                                }
+                                window.updateDiagnosticResults(formattedResults);
+                            } else {
+                                // Format final output for non-dashboard pages
+                                const finalOutput = Object.entries(data.data)
+                                    .map(([k, v]) => `\n[${k}]\n${v.output || v}`)
+                                    .join('\n');
+                                elements.output.textContent = finalOutput;
                             }
-                            window.updateDiagnosticResults(formattedResults);
-                        } else {
-                            // Format final output for non-dashboard pages
+                        
+                            // Ensure the output log is visible
+                            const outputLog = document.getElementById('outputLog');
+                            if (outputLog && outputLog.classList.contains('collapse')) {
+                                outputLog.classList.add('show');
+                            }
+                            updateStatusBanner?.("success");
+                        
                             const finalOutput = Object.entries(data.data)
                                 .map(([k, v]) => `\n[${k}]\n${v.output || v}`)
                                 .join('\n');
-                            elements.output.textContent = finalOutput;
-                        }
-                        
-                        // Ensure the output log is visible
-                        const outputLog = document.getElementById('outputLog');
-                        if (outputLog && outputLog.classList.contains('collapse')) {
-                            outputLog.classList.add('show');
-                        }
-                        updateStatusBanner?.("success");
-                        
-                        const finalOutput = Object.entries(data.data)
-                            .map(([k, v]) => `\n[${k}]\n${v.output || v}`)
-                            .join('\n');
-                        analyzeOutputForIssues({ output: finalOutput });
-                        updateBatteryFromOutput(finalOutput);
-                        persistDiagnosticsOutput();
-                        window.diagnosticsRunning = false;  // Reset flag
-                        break;
+                            analyzeOutputForIssues({ output: finalOutput });
+                            updateBatteryFromOutput(finalOutput);
+                            persistDiagnosticsOutput();
+                            window.diagnosticsRunning = false;  // Reset flag
+                            break;
                         
-                    case 'error':
-                        eventSource.close();
-                        clearTimeout(timeoutId);
-                        elements.output.textContent = `❌ Error: ${data.message}`;
-                        updateStatusBanner?.("error");
-                        window.diagnosticsRunning = false;  // Reset flag
-                        break;
-                }
-            };
+                        case 'error':
+                            eventSource.close();
+                            clearTimeout(timeoutId);
+                            elements.output.textContent = `❌ Error: ${data.message}`;
+                            updateStatusBanner?.("error");
+                            window.diagnosticsRunning = false;  // Reset flag
+                            break;
+                    }
+                };
             
-            eventSource.onerror = (err) => {
-                eventSource.close();
-                clearTimeout(timeoutId);
-                console.error("❌ SSE connection failed:", err);
-                elements.output.textContent = `❌ Connection lost during diagnostics`;
-                updateStatusBanner?.("error");
-                window.diagnosticsRunning = false;  // Reset flag
-            };
+                eventSource.onerror = (err) => {
+                    if (eventSource.readyState === EventSource.CONNECTING) {
+                        // The browser reconnects by itself and the job resumes after the last event seen
+                        console.warn("⚠️ Diagnostics stream interrupted, reconnecting...");
+                        return;
+                    }
+                    eventSource.close();
+                    clearTimeout(timeoutId);
+                    console.error("❌ SSE connection failed:", err);
+                    elements.output.textContent = `❌ Connection lost during diagnostics`;
+                    updateStatusBanner?.("error");
+                    window.diagnosticsRunning = false;  // Reset flag
+                };
             
-            // Handle abort
-            signal.addEventListener('abort', () => {
-                eventSource.close();
-            });
+                // Handle abort
+                signal.addEventListener('abort', () => {
+                    eventSource.close();
+                });
             
+            };
+
+            fetch('/api/diagnostic/jobs', {
+                method: 'POST',
+                signal,
+                headers: getAuthHeaders()
+            })
+                .then(res => {
+                    if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
+                    return res.json();
+                })
+                .then(response => watchJob(response.data.id))
+                .catch(err => {
+                    clearTimeout(timeoutId);
+                    console.error("❌ Could not start diagnostics job:", err);
+                    elements.output.textContent = `❌ ${err.message || "Could not start diagnostics"}`;
+                    updateStatusBanner?.("error");
+                    window.diagnosticsRunning = false;  // Reset flag
+                });
+
             return; // Exit early for SSE handling
         }
 
@@ -0,0 +1,51 @@
+"""Incremental check_all must never reuse the result of a check that was cut short."""
+import os
+import sys
+import time
+import types
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import app
+from utils import result_store
+from utils.cancellation import current_scope
+
+CHECK = 'check_slow'
+DEADLINE = 0.2
+
+class StubRegistry:
+    def get(self, name):
+        return types.SimpleNamespace(name=name, gates=(), deadline=DEADLINE, declarative=False,
+                                     module=None, fingerprint=['boot_id'], mtime=0.0)
+
+def run_all(incremental):
+    return {event[1]: event[2] for event in app.run_diagnostics([CHECK], incremental=incremental)
+            if event[0] == 'finished'}
+
+def test_overrunning_check_is_not_reused(monkeypatch):
+    store = result_store.ResultStore()
+    monkeypatch.setattr(app, 'diagnostic_registry', StubRegistry())
+    monkeypatch.setattr(result_store, 'get_result_store', lambda: store)
+    monkeypatch.setattr(result_store, 'fingerprint_checks', lambda infos, probe: {CHECK: 'unchanged'})
+
+    def overrun(name, probe=None):
+        # Like check_disk_health after its smartctl was cancelled: still reports success
+        scope = current_scope()
+        while not (scope.cancelled or scope.expired):
+            time.sleep(0.01)
+        return {'status': 'success', 'output': 'SMART data unavailable'}
+
+    monkeypatch.setattr(app, 'run_diagnostic_test', overrun)
+    assert run_all(incremental=False)[CHECK]['status'] == 'timeout'
+    assert store.get(CHECK, 'unchanged') is None
+
+    calls = []
+    monkeypatch.setattr(app, 'run_diagnostic_test',
+                        lambda name, probe=None: calls.append(name) or {'status': 'success', 'output': 'ok'})
+    result = run_all(incremental=True)[CHECK]
+    assert calls == [CHECK]
+    assert result['status'] == 'success' and not result.get('reused')
+
+    # A result that finished in time is reused by the next incremental run
+    result = run_all(incremental=True)[CHECK]
+    assert calls == [CHECK]
+    assert result.get('reused')
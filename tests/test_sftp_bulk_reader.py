@@ -0,0 +1,89 @@
+"""SFTPBulkReader drives paramiko's private request API; check it against the installed paramiko."""
+import os
+import socket
+import sys
+import threading
+
+import paramiko
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.ssh_persistent import SFTPBulkReader
+
+class Server(paramiko.ServerInterface):
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED
+
+class Handle(paramiko.SFTPHandle):
+    def __init__(self, data, short_reads):
+        super().__init__()
+        self.data = data
+        self.short_reads = short_reads
+
+    def read(self, offset, length):
+        if offset >= len(self.data):
+            return paramiko.SFTP_EOF
+        # Kernel files hand back at most a page per read
+        return self.data[offset:offset + min(length, 4096 if self.short_reads else length)]
+
+class Files(paramiko.SFTPServerInterface):
+    """Serves a dict of {path: bytes}; paths under /sys answer like sysfs."""
+    files = {}
+
+    def open(self, path, flags, attr):
+        if path not in self.files:
+            return paramiko.SFTP_NO_SUCH_FILE
+        return Handle(self.files[path], path.startswith('/sys/'))
+
+    def list_folder(self, path):
+        prefix = path.rstrip('/') + '/'
+        names = {p[len(prefix):].split('/')[0] for p in self.files if p.startswith(prefix)}
+        attrs = []
+        for name in sorted(names):
+            attr = paramiko.SFTPAttributes()
+            attr.filename = name
+            attrs.append(attr)
+        return attrs
+
+@pytest.fixture
+def sftp():
+    server_sock, client_sock = socket.socketpair()
+    server = paramiko.Transport(server_sock)
+    server.add_server_key(paramiko.RSAKey.generate(1024))
+    server.set_subsystem_handler('sftp', paramiko.SFTPServer, Files)
+    threading.Thread(target=server.start_server, kwargs={'server': Server()}, daemon=True).start()
+
+    client = paramiko.Transport(client_sock)
+    client.connect(username='u', password='pw')
+    sftp = paramiko.SFTPClient.from_transport(client)
+    yield sftp
+    sftp.close()
+    client.close()
+    server.close()
+
+def test_reads_files_and_globs(sftp, monkeypatch):
+    big = os.urandom(100000)
+    monkeypatch.setattr(Files, 'files', {
+        '/proc/meminfo': b'MemTotal: 1024 kB\n',
+        '/sys/class/thermal/thermal_zone0/temp': b'45000\n',
+        '/sys/class/thermal/thermal_zone1/temp': b'47000\n',
+        '/sys/class/thermal/.hidden/temp': b'0\n',
+        '/var/log/big': big,
+    })
+
+    reader = SFTPBulkReader(sftp, max_bytes=65536)
+    files = reader.read(['/proc/meminfo', '/sys/class/thermal/*/temp', '/var/log/big', '/missing'])
+
+    assert files == {
+        '/proc/meminfo': b'MemTotal: 1024 kB\n',
+        '/sys/class/thermal/thermal_zone0/temp': b'45000\n',
+        '/sys/class/thermal/thermal_zone1/temp': b'47000\n',
+        '/var/log/big': big[:65536],
+    }
+    # Every response was consumed and every handle closed
+    assert not reader._responses
+    sftp.listdir('/sys/class/thermal')
+    assert not sftp._expecting
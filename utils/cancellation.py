@@ -0,0 +1,156 @@
+"""
+Deadlines and cancellation for work that holds device channels.
+
+A CancelScope carries an optional deadline and can be cancelled explicitly
+(a diagnostic ran out of time, the SSE client went away). Code that opens a
+channel or process registers a callback to close it with cancel_callback(),
+and clamps its own timeout to the scope's deadline with clamp_timeout(); so
+cancelling a scope tears down the channels doing its work instead of leaving
+them running on the device.
+
+The active scope is bound per thread with `with scope.bound():`. Work handed
+to another thread (channel pool workers, prefetch threads) re-binds the scope
+it was submitted under. Child scopes are cancelled with their parent.
+"""
+import threading
+import time
+from concurrent.futures import CancelledError, Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+_local = threading.local()
+
+class CancelScope:
+    """A deadline plus callbacks that run when the scope is cancelled."""
+
+    def __init__(self, timeout: Optional[float] = None, parent: Optional['CancelScope'] = None):
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        if parent is not None and parent.deadline is not None:
+            self.deadline = parent.deadline if self.deadline is None else min(self.deadline, parent.deadline)
+        self.reason = None
+        self._cancelled = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        if parent is not None:
+            parent.on_cancel(lambda: self.cancel(parent.reason))
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (0 once cancelled), or None without a deadline."""
+        if self.cancelled:
+            return 0.0
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason: str = "Cancelled"):
+        """Mark the scope cancelled and run every registered callback once."""
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self.reason = reason
+            self._cancelled.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Run callback when the scope is cancelled (now, if it already is)."""
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._callbacks.append(callback)
+                return callback
+        callback()
+        return callback
+
+    def remove_callback(self, callback: Callable[[], None]):
+        with self._lock:
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+
+    def bound(self):
+        """Make this the current thread's scope for the duration of a with block."""
+        return bind_scope(self)
+
+def current_scope() -> Optional[CancelScope]:
+    """The scope bound to the calling thread, if any."""
+    return getattr(_local, 'scope', None)
+
+@contextmanager
+def bind_scope(scope: Optional[CancelScope]):
+    """Bind scope (possibly None) in a worker thread that runs work submitted under it."""
+    previous = getattr(_local, 'scope', None)
+    _local.scope = scope
+    try:
+        yield scope
+    finally:
+        _local.scope = previous
+
+def is_cancelled() -> bool:
+    """Whether the current scope was cancelled or ran past its deadline."""
+    scope = current_scope()
+    return scope is not None and (scope.cancelled or scope.expired)
+
+def cancel_reason() -> str:
+    scope = current_scope()
+    if scope is not None and scope.reason:
+        return scope.reason
+    return "Deadline exceeded"
+
+# Floor for clamped timeouts: 0 means "non-blocking" or "no timeout" to some APIs
+MIN_TIMEOUT = 0.001
+
+def clamp_timeout(timeout: Optional[float]) -> Optional[float]:
+    """timeout, shortened to the current scope's remaining time."""
+    scope = current_scope()
+    remaining = scope.remaining() if scope is not None else None
+    if remaining is None:
+        return timeout
+    if timeout is not None:
+        remaining = min(timeout, remaining)
+    return max(MIN_TIMEOUT, remaining)
+
+@contextmanager
+def cancel_callback(callback: Callable[[], None]):
+    """Run callback if the current scope is cancelled while the block runs."""
+    scope = current_scope()
+    if scope is None:
+        yield
+        return
+    scope.on_cancel(callback)
+    try:
+        yield
+    finally:
+        scope.remove_callback(callback)
+
+def wait_result(future: Future):
+    """
+    future.result(), bounded by the current scope: queued work is cancelled
+    with the scope, and waiting stops at its deadline.
+
+    Raises concurrent.futures.CancelledError or TimeoutError when the scope ends first.
+    """
+    scope = current_scope()
+    if scope is None:
+        return future.result()
+
+    with cancel_callback(future.cancel):
+        try:
+            return future.result(timeout=scope.remaining())
+        except FutureTimeout:
+            if future.cancel():
+                raise CancelledError()
+            raise
@@ -0,0 +1,134 @@
+"""
+Shared TTL result cache for remote command output with LRU eviction and single-flight.
+
+Entries are keyed by (device, command). Concurrent callers asking for the same
+missing key wait for a single computation instead of each issuing their own
+SSH round trip.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class _Flight:
+    """An in-progress computation that followers wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class CommandCache:
+    """Thread-safe TTL cache with LRU eviction, explicit invalidation and single-flight."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}            # key -> _Flight
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (hit, value) for a key, ignoring expired entries."""
+        with self._lock:
+            return self._get_locked(key)
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        """Store a value for ttl seconds, evicting the least recently used entries if full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], ttl: float,
+                       should_cache: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Return the cached value for key, or compute it once for all concurrent callers.
+
+        Args:
+            key: Cache key, normally (device, command)
+            compute: Called without arguments to produce the value on a miss
+            ttl: Seconds the computed value stays valid
+            should_cache: Optional predicate; values it rejects (e.g. errors) are
+                returned to every waiting caller but not stored
+        """
+        with self._lock:
+            hit, value = self._get_locked(key)
+            if hit:
+                return value
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+            if should_cache is None or should_cache(flight.value):
+                self.set(key, flight.value, ttl)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def invalidate(self, device: Optional[str] = None, key: Optional[Hashable] = None):
+        """
+        Drop cached entries.
+
+        Args:
+            device: Only drop entries whose key is a (device, ...) tuple for this device
+            key: Only drop this exact key
+            With neither argument, the whole cache is cleared.
+        """
+        with self._lock:
+            if key is not None:
+                self._entries.pop(key, None)
+            elif device is not None:
+                for cached_key in [k for k in self._entries if isinstance(k, tuple) and k and k[0] == device]:
+                    del self._entries[cached_key]
+            else:
+                self._entries.clear()
+        logger.info(f"🧹 Command cache invalidated ({'key' if key is not None else device or 'all'})")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'inflight': len(self._inflight),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def _get_locked(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if time.monotonic() < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self._entries[key]
+        self.misses += 1
+        return False, None
+
+# Global cache instance shared by the whole app
+_command_cache = CommandCache()
+
+def get_command_cache() -> CommandCache:
+    """Get the global command cache."""
+    return _command_cache
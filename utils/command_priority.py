@@ -0,0 +1,58 @@
+"""
+Priority classes for commands sent to the device.
+
+Every command queued on a connection's channel pool carries the priority of
+the thread that submitted it. Interactive actions (LED and power toggles,
+terminal commands, tab completion) are served before diagnostics, which are
+served before background telemetry such as dashboard polling, and the pool
+keeps a channel free for interactive work so a button press never waits
+behind a long `smartctl` scan.
+
+Unmarked work runs as DIAGNOSTICS. Routes opt in with a decorator:
+
+    @app.route('/api/camera/led/toggle', methods=['POST'])
+    @interactive
+    def toggle_detection_led():
+        ...
+"""
+import functools
+import threading
+from contextlib import contextmanager
+
+INTERACTIVE = 0
+DIAGNOSTICS = 1
+BACKGROUND = 2
+
+PRIORITIES = (INTERACTIVE, DIAGNOSTICS, BACKGROUND)
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', DIAGNOSTICS: 'diagnostics', BACKGROUND: 'background'}
+
+DEFAULT_PRIORITY = DIAGNOSTICS
+
+_local = threading.local()
+
+def current_priority() -> int:
+    """Priority of commands submitted from the calling thread."""
+    return getattr(_local, 'priority', DEFAULT_PRIORITY)
+
+@contextmanager
+def command_priority(priority: int):
+    """Submit commands from this thread with the given priority for the duration of a with block."""
+    previous = getattr(_local, 'priority', DEFAULT_PRIORITY)
+    _local.priority = priority
+    try:
+        yield priority
+    finally:
+        _local.priority = previous
+
+def with_priority(priority: int):
+    """Decorator running a function (e.g. a route handler) under command_priority(priority)."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with command_priority(priority):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+interactive = with_priority(INTERACTIVE)
+background = with_priority(BACKGROUND)
@@ -0,0 +1,99 @@
+"""
+Evaluation of declarative diagnostics.
+
+A declarative check_*.py module states what it needs from the device instead
+of fetching it itself:
+
+    COMMANDS      = {"free": "free -h"}            # name -> command run as the SSH user
+    SUDO_COMMANDS = {"dmesg": "dmesg | tail"}      # name -> command run as root
+    FILES         = {"meminfo": "/proc/meminfo"}   # name -> path/glob, or a list of them
+
+    def evaluate(inputs):
+        ...  # pure: build and return {'status': ..., 'output': ...}
+
+inputs maps each command name to its output, formatted like run_ssh_command
+("Error: ..." on failure), and each file name to a {path: bytes} dict of the
+files that could be read. Because the inputs are known before anything runs,
+prefetch_inputs() can fetch those of a whole suite in one batch per kind.
+
+Modules that only define run() keep working: run_check() is the adapter
+that calls whichever entry point a module has.
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .diagnostic_registry import is_declarative
+from .probe_context import ProbeContext
+
+logger = logging.getLogger(__name__)
+
+def _file_patterns(spec) -> List[str]:
+    return [spec] if isinstance(spec, str) else list(spec)
+
+def declared_inputs(module) -> Tuple[Dict[str, str], Dict[str, str], Dict[str, List[str]]]:
+    """(commands, sudo_commands, files) declared by a module, each keyed by input name."""
+    commands = dict(getattr(module, 'COMMANDS', None) or {})
+    sudo_commands = dict(getattr(module, 'SUDO_COMMANDS', None) or {})
+    files = {name: _file_patterns(spec) for name, spec in (getattr(module, 'FILES', None) or {}).items()}
+    return commands, sudo_commands, files
+
+def prefetch_inputs(modules: Iterable, probe: ProbeContext):
+    """Start fetching the inputs of every declarative module in one batch per kind."""
+    commands, sudo_commands, patterns = [], [], []
+    for module in modules:
+        if not is_declarative(module):
+            continue
+        module_commands, module_sudo, module_files = declared_inputs(module)
+        commands.extend(module_commands.values())
+        sudo_commands.extend(module_sudo.values())
+        for file_patterns in module_files.values():
+            patterns.extend(file_patterns)
+
+    # dict.fromkeys drops duplicates but keeps the order
+    probe.prefetch(
+        commands=list(dict.fromkeys(commands)),
+        sudo_commands=list(dict.fromkeys(sudo_commands)),
+        files=list(dict.fromkeys(patterns))
+    )
+
+def collect_inputs(module, probe: ProbeContext) -> dict:
+    """Gather a declarative module's inputs through the run's probe context."""
+    # Anything not prefetched for the suite is fetched here, still one batch per kind
+    prefetch_inputs([module], probe)
+
+    commands, sudo_commands, files = declared_inputs(module)
+    inputs = {}
+    for name, command in commands.items():
+        inputs[name] = probe.run_ssh_command(command)
+    for name, command in sudo_commands.items():
+        inputs[name] = probe.run_sudo_command(command)
+    for name, file_patterns in files.items():
+        inputs[name] = probe.read_remote_files(file_patterns)
+    return inputs
+
+def evaluate_check(module, probe: Optional[ProbeContext] = None) -> dict:
+    """Run a declarative module: fetch its inputs, then evaluate them locally."""
+    probe = probe or ProbeContext()
+    name = getattr(module, '__name__', 'diagnostic').rpartition('.')[2]
+    try:
+        inputs = collect_inputs(module, probe)
+    except Exception as e:
+        logger.error(f"Error collecting inputs for {name}: {e}")
+        return {'status': 'error', 'output': f'Error collecting inputs for {name}: {str(e)}'}
+
+    try:
+        return module.evaluate(inputs)
+    except Exception as e:
+        logger.error(f"Error evaluating {name}: {e}")
+        return {'status': 'error', 'output': f'Error evaluating {name}: {str(e)}'}
+
+def run_check(module, probe: Optional[ProbeContext] = None, accepts_probe: bool = False) -> dict:
+    """
+    Run any diagnostic module: declarative ones through evaluate_check, legacy
+    ones through run(), passing the probe context to run(probe=...) when accepted.
+    """
+    if is_declarative(module):
+        return evaluate_check(module, probe)
+    if probe is not None and accepts_probe:
+        return module.run(probe=probe)
+    return module.run()
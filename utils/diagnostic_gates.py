@@ -0,0 +1,115 @@
+"""
+Shared gate probes for diagnostics.
+
+A gate is a cheap probe that several checks depend on: whether the device is
+reachable at all, whether ModemManager sees a modem, whether lsblk lists any
+disks. Checks name the gates they need in a GATES list, e.g.
+
+    GATES = ["ssh", "modem"]
+
+The scheduler evaluates each gate once per run, before any check that needs
+it, and checks behind a failed gate are reported as skipped straight away
+instead of each one probing (and timing out) on its own. Gates probe through
+the run's ProbeContext, so checks asking the same question afterwards get the
+gate's answer for free.
+"""
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from .probe_context import ProbeContext
+from .ssh_interface import check_ssh_connection
+
+logger = logging.getLogger(__name__)
+
+class Gate:
+    """A named probe returning (ok, message), evaluated after the gates it requires."""
+
+    def __init__(self, check: Callable[[ProbeContext], Tuple[bool, str]], requires: Iterable[str] = ()):
+        self.check = check
+        self.requires = tuple(requires)
+
+def _ssh_gate(probe: ProbeContext) -> Tuple[bool, str]:
+    connected, message = check_ssh_connection()
+    if connected:
+        return True, message
+    return False, f"No device connected\n{message}\n\nPlease connect a V3 sensor module via USB to run diagnostics."
+
+def _modem_gate(probe: ProbeContext) -> Tuple[bool, str]:
+    modem_list = probe.run_sudo_command("mmcli -L", timeout=10)
+    if "No modems were found" in modem_list:
+        return False, "No modem detected"
+    if "ModemManager is not running" in modem_list:
+        return False, "ModemManager service is not running"
+    if "/Modem/" not in modem_list:
+        return False, "Could not detect modem"
+    return True, "Modem detected"
+
+def _block_devices_gate(probe: ProbeContext) -> Tuple[bool, str]:
+    lsblk_output = probe.run_ssh_command("lsblk -dno NAME")
+    if lsblk_output.startswith('Error:'):
+        return False, f"Error getting disk devices: {lsblk_output}"
+    if not lsblk_output.strip():
+        return False, "No block devices found"
+    return True, "Block devices found"
+
+GATES: Dict[str, Gate] = {
+    'ssh': Gate(_ssh_gate),
+    'modem': Gate(_modem_gate, requires=['ssh']),
+    'block_devices': Gate(_block_devices_gate, requires=['ssh'])
+}
+
+class GateSet:
+    """The gates of one run; each is evaluated at most once and shared by every check."""
+
+    def __init__(self, probe: ProbeContext, gates: Dict[str, Gate] = GATES):
+        self.probe = probe
+        self.gates = gates
+        self._results: Dict[str, Tuple[bool, str]] = {}
+        self._lock = threading.Lock()
+
+    def requires(self, name: str) -> Tuple[str, ...]:
+        gate = self.gates.get(name)
+        return gate.requires if gate else ()
+
+    def closure(self, names: Iterable[str]) -> List[str]:
+        """names plus every gate they require, each listed after its own requirements."""
+        ordered = []
+        def visit(name, path=()):
+            if name in ordered:
+                return
+            if name in path:
+                raise ValueError(f"Gate dependency cycle: {' -> '.join(path + (name,))}")
+            for required in self.requires(name):
+                visit(required, path + (name,))
+            ordered.append(name)
+        for name in names:
+            visit(name)
+        return ordered
+
+    def evaluate(self, name: str) -> Tuple[bool, str]:
+        """(ok, message) for a gate, probing the device the first time only."""
+        with self._lock:
+            if name in self._results:
+                return self._results[name]
+
+        gate = self.gates.get(name)
+        if gate is None:
+            result = (False, f"Unknown gate '{name}'")
+        else:
+            try:
+                result = gate.check(self.probe)
+            except Exception as e:
+                result = (False, f"Error evaluating {name} gate: {str(e)}")
+
+        logger.info(f"🚦 Gate {name}: {'open' if result[0] else 'closed'}")
+        with self._lock:
+            return self._results.setdefault(name, result)
+
+def skipped_result(gate: str, message: str) -> dict:
+    """Result reported for a check whose gate failed."""
+    return {
+        'status': 'error',
+        'output': f"❌ {message}\n⏭️ Skipped: requires {gate}",
+        'skipped': True
+    }
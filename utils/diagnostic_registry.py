@@ -0,0 +1,172 @@
+"""
+Registry of diagnostic modules (diagnostics/check_*.py).
+
+Modules are discovered and executed once, then served from cache. A module is
+re-executed only when its file's mtime changes, and the directory is rescanned
+only when its own mtime changes (a check was added or removed), so editing a
+check on a running server still takes effect on the next run.
+
+Each module may declare metadata as module-level constants:
+    CATEGORY           - grouping for the UI, e.g. "network" (default "general")
+    EXPECTED_DURATION  - typical run time in seconds (default None)
+    DEADLINE           - seconds after which the check is cancelled and reported
+                         as timed out (default: the app's DIAGNOSTIC_CHECK_TIMEOUT)
+    NEEDS_SUDO         - whether the check runs privileged commands (default False)
+    GATES              - shared gate probes the check needs, e.g. ["ssh", "modem"]
+                         (see utils/diagnostic_gates.py; default none)
+    FINGERPRINT        - device probes the result depends on, e.g. ["boot_id", "usb"];
+                         incremental runs reuse the result while they are unchanged
+                         (see utils/result_store.py; default none: always rerun)
+
+Modules either define run() or use the declarative format (COMMANDS,
+SUDO_COMMANDS, FILES and evaluate(); see utils/diagnostic_engine.py), which
+the engine runs itself, so declarative modules need no run().
+"""
+import importlib.util
+import inspect
+import logging
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+def is_declarative(module) -> bool:
+    """Whether a diagnostic module uses the declarative format."""
+    return callable(getattr(module, 'evaluate', None)) and any(
+        getattr(module, attr, None) for attr in ('COMMANDS', 'SUDO_COMMANDS', 'FILES')
+    )
+
+class DiagnosticInfo:
+    """A loaded diagnostic module and its metadata."""
+
+    def __init__(self, name: str, path: Path, module, mtime: float):
+        self.name = name
+        self.path = path
+        self.module = module
+        self.mtime = mtime
+        self.category = getattr(module, 'CATEGORY', 'general')
+        self.expected_duration = getattr(module, 'EXPECTED_DURATION', None)
+        self.deadline = getattr(module, 'DEADLINE', None)
+        self.needs_sudo = bool(getattr(module, 'NEEDS_SUDO', False))
+        self.accepts_probe = self._accepts_probe(module)
+        self.declarative = is_declarative(module)
+        self.gates = tuple(getattr(module, 'GATES', None) or ())
+        self.fingerprint = tuple(getattr(module, 'FINGERPRINT', None) or ())
+        doc = (module.__doc__ or '').strip()
+        self.description = doc.splitlines()[0] if doc else ''
+
+    @staticmethod
+    def _accepts_probe(module) -> bool:
+        """Whether run() takes the shared ProbeContext of a run (run(probe=None))."""
+        try:
+            return 'probe' in inspect.signature(module.run).parameters
+        except (AttributeError, TypeError, ValueError):
+            return False
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'category': self.category,
+            'expected_duration': self.expected_duration,
+            'deadline': self.deadline,
+            'needs_sudo': self.needs_sudo,
+            'declarative': self.declarative,
+            'gates': list(self.gates),
+            'fingerprint': list(self.fingerprint),
+            'description': self.description
+        }
+
+class DiagnosticRegistry:
+    """Discovers, caches and hot-reloads diagnostic modules from one directory."""
+
+    def __init__(self, directory: Path, pattern: str = "check_*.py"):
+        self.directory = Path(directory)
+        self.pattern = pattern
+        self._paths = {}          # name -> Path
+        self._listing_mtime = None
+        self._loaded = {}         # name -> DiagnosticInfo
+        self._failed = {}         # name -> mtime of a version that failed to load
+        self._lock = threading.RLock()
+
+    def names(self) -> List[str]:
+        """Sorted names of every diagnostic module currently on disk."""
+        with self._lock:
+            self._refresh_listing()
+            return sorted(self._paths)
+
+    def get(self, name: str) -> Optional[DiagnosticInfo]:
+        """Loaded module info for name, reloading it if the file changed. None if missing or broken."""
+        with self._lock:
+            self._refresh_listing()
+            path = self._paths.get(name)
+            if path is None:
+                self._loaded.pop(name, None)
+                return None
+
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                return None
+
+            info = self._loaded.get(name)
+            if (info is None or info.mtime != mtime) and self._failed.get(name) != mtime:
+                info = self._load(name, path, mtime)
+            return info
+
+    def metadata(self) -> List[dict]:
+        """Metadata of every loadable module, sorted by name."""
+        infos = (self.get(name) for name in self.names())
+        return [info.to_dict() for info in infos if info is not None]
+
+    def _refresh_listing(self):
+        try:
+            mtime = self.directory.stat().st_mtime
+        except OSError:
+            self._paths = {}
+            return
+        if mtime == self._listing_mtime:
+            return
+
+        self._paths = {path.stem: path for path in self.directory.glob(self.pattern) if path.is_file()}
+        self._listing_mtime = mtime
+        for name in list(self._loaded):
+            if name not in self._paths:
+                del self._loaded[name]
+                self._failed.pop(name, None)
+
+    def _load(self, name: str, path: Path, mtime: float) -> Optional[DiagnosticInfo]:
+        qualified_name = f"{self.directory.name}.{name}"
+        try:
+            spec = importlib.util.spec_from_file_location(qualified_name, str(path))
+            if not spec or not spec.loader:
+                return None
+
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        except Exception as e:
+            logger.error(f"Error loading module {name}: {str(e)}")
+            # Keep serving the previous version if an edit broke the file; retry on the next edit
+            self._failed[name] = mtime
+            return self._loaded.get(name)
+
+        self._failed.pop(name, None)
+        sys.modules[qualified_name] = module
+        action = "Reloaded" if name in self._loaded else "Loaded"
+        logger.info(f"📦 {action} diagnostic module {name}")
+        info = self._loaded[name] = DiagnosticInfo(name, path, module, mtime)
+        return info
+
+_registries: Dict[str, DiagnosticRegistry] = {}
+_registries_lock = threading.Lock()
+
+def get_diagnostic_registry(directory: Path) -> DiagnosticRegistry:
+    """Shared registry for a diagnostics directory."""
+    key = os.path.abspath(str(directory))
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = _registries[key] = DiagnosticRegistry(Path(directory))
+        return registry
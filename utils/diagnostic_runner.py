@@ -0,0 +1,280 @@
+"""
+Parallel, gate-aware runner for diagnostic checks.
+
+Checks run on a bounded thread pool and report back through a queue, so the
+caller (the check_all SSE generator) sees 'started' and 'finished' events in
+the order they actually happen. A full run is then bounded by the slowest
+check instead of the sum of all of them.
+
+Checks may depend on shared gates (see utils/diagnostic_gates.py). The runner
+schedules the run as a DAG: a gate runs once before the checks and gates that
+need it, independent branches run concurrently, and when a gate fails every
+check behind it finishes at once as skipped.
+
+Every check runs in its own CancelScope (utils/cancellation.py) under the
+run's scope: when a check passes its deadline, the run passes its budget, or
+the generator is closed because the SSE client went away, the scope is
+cancelled and the SSH channels and processes the check holds are closed. A
+cancelled check gets a short grace period to return what it gathered so far;
+either way it is reported with status 'timeout'.
+"""
+import logging
+import queue
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .cancellation import CancelScope, bind_scope
+from .diagnostic_gates import GateSet, skipped_result
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+
+# Seconds a cancelled check has to return its partial output before it is reported without it
+CANCEL_GRACE = 2
+
+# Seconds without events after which run() yields a heartbeat, so a streaming
+# caller writes something and notices a client that went away
+HEARTBEAT_INTERVAL = 5
+
+RUN_BUDGET_EXCEEDED = "Diagnostics run exceeded its time budget"
+
+def timeout_result(reason: str, partial: Optional[dict] = None) -> dict:
+    """Result reported for a check that was cancelled, keeping any output it returned."""
+    output = f"❌ {reason}"
+    partial_output = str((partial or {}).get('output') or '').strip()
+    if partial_output:
+        output = f"{output}\n\nPartial output:\n{partial_output}"
+    return {'status': 'timeout', 'message': f"❌ {reason}", 'output': output, 'timeout': True}
+
+class DiagnosticRunner:
+    """
+    Runs named checks through run_one with at most max_workers at a time.
+
+    Args:
+        run_one: Runs one check by name and returns its result dict
+        max_workers: Concurrency limit shared by checks and gates
+        gates: The run's GateSet; without one, gates are ignored
+        gates_of: Names of the gates a check needs
+        scope: The run's CancelScope; its deadline is the budget for the whole run
+        check_timeout: Seconds each check may run (None for no limit)
+        deadline_of: Per-check override of check_timeout; None keeps the default
+        on_result: Called with (name, result) for every check that ran, once a
+            cancelled or expired check's result has become a timeout result
+    """
+
+    def __init__(self, run_one: Callable[[str], dict], max_workers: int = DEFAULT_CONCURRENCY,
+                 gates: Optional[GateSet] = None, gates_of: Optional[Callable[[str], Iterable[str]]] = None,
+                 scope: Optional[CancelScope] = None, check_timeout: Optional[float] = None,
+                 deadline_of: Optional[Callable[[str], Optional[float]]] = None,
+                 on_result: Optional[Callable[[str, dict], None]] = None):
+        self.run_one = run_one
+        self.max_workers = max(1, int(max_workers))
+        self.gates = gates
+        self.gates_of = gates_of
+        self.scope = scope or CancelScope()
+        self.check_timeout = check_timeout
+        self.deadline_of = deadline_of
+        self.on_result = on_result
+
+    def run(self, names: Iterable[str]) -> Iterator[Tuple]:
+        """
+        Start every check (in the given order, as its gates open and workers
+        free up) and yield ('started', name) and ('finished', name, result)
+        events as they happen. Skipped and timed-out checks that never started
+        get both events back to back, and ('heartbeat',) is yielded when
+        nothing happened for HEARTBEAT_INTERVAL seconds.
+
+        Closing the generator early (e.g. the client went away) cancels the
+        run scope: checks that have not started never will, and running ones
+        have their channels closed.
+        """
+        names = list(names)
+        run_scope = self.scope
+        check_gates = self._check_gates(names)
+        gate_names = self.gates.closure(set().union(*check_gates.values())) if self.gates else []
+
+        # Everything waiting on a node, and what each node still waits for
+        waiting: Dict[Tuple[str, str], Set[Tuple[str, str]]] = {}
+        dependents: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+        for gate in gate_names:
+            waiting[('gate', gate)] = {('gate', required) for required in self.gates.requires(gate)}
+        for name in names:
+            waiting[('check', name)] = {('gate', gate) for gate in check_gates[name]}
+        for node, requirements in waiting.items():
+            for required in requirements:
+                dependents.setdefault(required, []).append(node)
+
+        events = queue.Queue()
+
+        def run_check(name):
+            deadline = self._deadline(name)
+            scope = CancelScope(timeout=deadline, parent=run_scope)
+            events.put(('started', name, scope, deadline))
+            if run_scope.cancelled:
+                events.put(('finished', name, timeout_result(f"Not started: {run_scope.reason}")))
+                return
+            with bind_scope(scope):
+                try:
+                    result = self.run_one(name)
+                except Exception as e:
+                    logger.error(f"Error running {name}: {e}")
+                    result = {'status': 'error', 'output': str(e)}
+            # Whether it was cut short is decided here, not when the main loop gets to the event
+            if scope.cancelled or scope.expired:
+                result = timeout_result(expiry_reason(scope), result)
+            if self.on_result:
+                try:
+                    self.on_result(name, result)
+                except Exception as e:
+                    logger.error(f"Error recording result of {name}: {e}")
+            events.put(('finished', name, result))
+
+        def expiry_reason(scope):
+            if scope.reason:
+                return scope.reason
+            if run_scope.expired:
+                return RUN_BUDGET_EXCEEDED
+            return f"Timed out after {scope.timeout:g}s"
+
+        def run_gate(gate):
+            with bind_scope(run_scope):
+                events.put(('gate', gate, self.gates.evaluate(gate)))
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="diagnostic")
+        submitted = set()
+        futures: Dict[str, Future] = {}
+
+        def submit_ready():
+            if run_scope.cancelled:
+                return
+            # Gates first: they unblock whole branches of checks
+            for node in sorted(waiting, key=lambda node: node[0] != 'gate'):
+                if node not in submitted and not waiting[node]:
+                    submitted.add(node)
+                    kind, name = node
+                    future = executor.submit(run_gate if kind == 'gate' else run_check, name)
+                    if kind == 'check':
+                        futures[name] = future
+
+        def fail(node, gate, message):
+            """Close everything behind a failed gate; returns the checks that were skipped."""
+            skipped = []
+            for dependent in dependents.get(node, []):
+                if dependent in submitted or dependent not in waiting:
+                    continue
+                del waiting[dependent]
+                if dependent[0] == 'check':
+                    skipped.append(dependent[1])
+                else:
+                    skipped.extend(fail(dependent, gate, message))
+            return skipped
+
+        # Checks that are running: their scope, and when it was seen cancelled
+        running: Dict[str, CancelScope] = {}
+        cancelled_at: Dict[str, float] = {}
+        done: Set[str] = set()
+
+        def finish(name, result, started=False):
+            """Events reporting a check as finished; started=True for checks that never ran."""
+            done.add(name)
+            waiting.pop(('check', name), None)
+            running.pop(name, None)
+            cancelled_at.pop(name, None)
+            return ([('started', name)] if started else []) + [('finished', name, result)]
+
+        def expire(now):
+            """Cancel what ran out of time; report checks that did not return within the grace period."""
+            expired = []
+            if run_scope.expired and not run_scope.cancelled:
+                run_scope.cancel(RUN_BUDGET_EXCEEDED)
+            if run_scope.cancelled:
+                # Nothing new starts: report checks still waiting for a gate or a worker
+                for name in names:
+                    if name in done or name in running:
+                        continue
+                    if ('check', name) not in submitted or futures[name].cancel():
+                        expired.extend(finish(name, timeout_result(f"Not started: {run_scope.reason}"), started=True))
+            for name, scope in list(running.items()):
+                if scope.expired and not scope.cancelled:
+                    scope.cancel(expiry_reason(scope))
+                if scope.cancelled:
+                    cancelled_at.setdefault(name, now)
+                    if now - cancelled_at[name] >= CANCEL_GRACE:
+                        logger.warning(f"⏹️ {name} did not stop within {CANCEL_GRACE}s of being cancelled")
+                        expired.extend(finish(name, timeout_result(scope.reason)))
+            return expired
+
+        def next_wakeup(now, last_event):
+            wakeups = [last_event + HEARTBEAT_INTERVAL]
+            if run_scope.deadline is not None and not run_scope.cancelled:
+                wakeups.append(run_scope.deadline)
+            for name, scope in running.items():
+                if name in cancelled_at:
+                    wakeups.append(cancelled_at[name] + CANCEL_GRACE)
+                elif scope.deadline is not None:
+                    wakeups.append(scope.deadline)
+            return max(0.0, min(wakeups) - now)
+
+        # Wake the loop when the run is cancelled from outside (e.g. a background job's scope)
+        wake = run_scope.on_cancel(lambda: events.put(('cancelled',)))
+
+        try:
+            submit_ready()
+            last_event = time.monotonic()
+            while len(done) < len(names):
+                try:
+                    event = events.get(timeout=next_wakeup(time.monotonic(), last_event))
+                except queue.Empty:
+                    event = None
+
+                now = time.monotonic()
+                out = expire(now)
+                if event is None or event[0] == 'cancelled':
+                    if not out and now - last_event >= HEARTBEAT_INTERVAL:
+                        out.append(('heartbeat',))
+                elif event[0] == 'gate':
+                    _, gate, (ok, message) = event
+                    node = ('gate', gate)
+                    waiting.pop(node, None)
+                    if ok:
+                        for dependent in dependents.get(node, []):
+                            if dependent in waiting:
+                                waiting[dependent].discard(node)
+                    else:
+                        for name in fail(node, gate, message):
+                            out.extend(finish(name, skipped_result(gate, message), started=True))
+                    submit_ready()
+                elif event[0] == 'started':
+                    _, name, scope, _ = event
+                    if name not in done:
+                        running[name] = scope
+                        out.append(('started', name))
+                else:
+                    _, name, result = event
+                    # A check already reported as timed out may still return late; drop it
+                    if name not in done:
+                        out.extend(finish(name, result))
+
+                for item in out:
+                    yield item
+                if out:
+                    last_event = now
+        except GeneratorExit:
+            run_scope.cancel("Diagnostics run abandoned")
+            raise
+        finally:
+            # Anything still running past this point has nobody waiting for it
+            run_scope.remove_callback(wake)
+            run_scope.cancel("Diagnostics run ended")
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _deadline(self, name: str) -> Optional[float]:
+        deadline = self.deadline_of(name) if self.deadline_of else None
+        return deadline if deadline is not None else self.check_timeout
+
+    def _check_gates(self, names: List[str]) -> Dict[str, Tuple[str, ...]]:
+        if not (self.gates and self.gates_of):
+            return {name: () for name in names}
+        return {name: tuple(self.gates_of(name) or ()) for name in names}
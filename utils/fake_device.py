@@ -0,0 +1,463 @@
+"""
+Simulated V3 device for the pluggable transport (SSH_TRANSPORT=fake).
+
+FakeDeviceTransport answers the commands the diagnostics send (mmcli,
+v4l2-ctl, smartctl, the hwman API via curl, lsblk, lsusb, ...) and the sysfs
+and procfs files they read with canned outputs from a healthy unit: three
+cameras, an LTE modem with a SIM, an NVMe disk and a charged battery. Nothing
+is executed locally.
+
+Every round trip sleeps for the configured latency plus up to the configured
+jitter; commands that take noticeable time on the device (smartctl, mmcli)
+add their own cost on top, once per command even inside a batch. Configure it
+through the environment:
+
+    FAKE_DEVICE_LATENCY_MS=20         # per round trip
+    FAKE_DEVICE_JITTER_MS=5           # uniform 0..jitter added per round trip
+    FAKE_DEVICE_COMMAND_LATENCY_MS="smartctl=800,mmcli=150"   # per command, on top
+
+Commands without a canned answer fail like a missing binary (exit 127) and
+are logged once, so gaps in the fixture show up when a check changes.
+"""
+import fnmatch
+import json
+import logging
+import os
+import random
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .cancellation import cancel_callback, cancel_reason
+from .transport import Transport
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LATENCY_MS = 20
+DEFAULT_JITTER_MS = 5
+
+# Device-side cost of slow commands, matched as a prefix of the command
+DEFAULT_COMMAND_LATENCY_MS = {
+    'smartctl': 300,
+    'mmcli': 120,
+    'curl': 15,
+    'v4l2-ctl': 40,
+    'i2cdetect': 60,
+    'journalctl': 80,
+    'dmesg': 20,
+    'top': 150
+}
+
+BOOT_ID = "3f9a2c4e-5b1d-4e8f-9a7c-2d6b8e1f0a35"
+
+FILES: Dict[str, bytes] = {
+    "/proc/sys/kernel/random/boot_id": f"{BOOT_ID}\n".encode(),
+    "/proc/cpuinfo": b"".join(
+        f"processor\t: {n}\nmodel name\t: ARMv8 Processor rev 1 (v8l)\nBogoMIPS\t: 62.50\n"
+        f"CPU implementer\t: 0x41\nCPU part\t: 0xd42\n\n".encode() for n in range(6)
+    ),
+    "/proc/meminfo": (
+        b"MemTotal:        7859452 kB\nMemFree:         5120340 kB\nMemAvailable:    6402116 kB\n"
+        b"Buffers:           60288 kB\nCached:          1204556 kB\nSwapCached:            0 kB\n"
+        b"SwapTotal:       3929712 kB\nSwapFree:        3929712 kB\n"
+    ),
+    "/sys/class/power_supply/bq25792-charger/current_now": b"412000\n",
+    "/sys/class/hwmon/hwmon0/in0_input": b"3312\n",
+    "/sys/class/hwmon/hwmon0/in1_input": b"5064\n",
+    "/sys/class/gpio/gpio446/value": b"1\n",
+    "/sys/kernel/debug/regulator/regulator_summary": (
+        b" regulator                      use open bypass  opmode voltage current     min     max\n"
+        b"-------------------------------------------------------------------------------------\n"
+        b" VDD_3V3_SYS                      5    6      0 normal  3300mV     0mA  3300mV  3300mV enabled\n"
+        b" VDD_5V_SYS                       3    3      0 normal  5000mV     0mA  5000mV  5000mV enabled\n"
+        b" VDD_1V8_AO                       2    2      0 normal  1800mV     0mA  1800mV  1800mV enabled\n"
+    ),
+    **{
+        f"/sys/class/thermal/thermal_zone{n}/{field}": value.encode()
+        for n, (zone, temp) in enumerate([("cpu-thermal", 41500), ("gpu-thermal", 39800),
+                                           ("cv0-thermal", 38900), ("soc0-thermal", 40250),
+                                           ("tj-thermal", 41500)])
+        for field, value in (("type", f"{zone}\n"), ("temp", f"{temp}\n"))
+    }
+}
+
+USB_DEVICES = ["1-0:1.0", "1-2", "1-2:1.0", "1-2:1.1", "1-2:1.2", "1-2:1.3", "2-0:1.0", "2-1", "2-1:1.0"]
+
+BATTERY_CHARGER_FIELDS = {
+    "BATTERY_CHARGER_FIELD_VBAT_ADC": 7812,
+    "BATTERY_CHARGER_FIELD_VAC1_ADC": 12104
+}
+
+MMCLI_LIST = "    /org/freedesktop/ModemManager1/Modem/0 [Quectel] EG25-G\n"
+
+MMCLI_MODEM = """\
+  -----------------------------------
+  General  |                  path: /org/freedesktop/ModemManager1/Modem/0
+           |             device id: 7d1e1a9c8e5d2b3f4a6c0e9d8b7a6f5e4d3c2b1a
+  -----------------------------------
+  Hardware |          manufacturer: QUALCOMM INCORPORATED
+           |                 model: EG25GGB
+           |     firmware revision: EG25GGBR07A08M2G
+           |             supported: gsm-umts, lte
+           |               current: gsm-umts, lte
+           |          equipment id: 867698041234567
+  -----------------------------------
+  System   |                device: /sys/devices/platform/3610000.usb/usb1/1-2
+           |               drivers: option, qmi_wwan
+           |                plugin: quectel
+           |          primary port: cdc-wdm0
+  -----------------------------------
+  Status   |                  lock: sim-pin2
+           |        unlock retries: sim-pin (3), sim-puk (10), sim-pin2 (3), sim-puk2 (10)
+           |                 state: connected
+           |           power state: on
+           |           access tech: lte
+           |        signal quality: 71% (recent)
+  -----------------------------------
+  Modes    |             supported: allowed: 3g, 4g; preferred: none
+           |               current: allowed: 3g, 4g; preferred: 4g
+  -----------------------------------
+  Bands    |             supported: utran-1, utran-8, eutran-1, eutran-3, eutran-7, eutran-8, eutran-20
+           |               current: utran-1, utran-8, eutran-1, eutran-3, eutran-7, eutran-8, eutran-20
+  -----------------------------------
+  IP       |             supported: ipv4, ipv6, ipv4v6
+  -----------------------------------
+  3GPP     |                  imei: 867698041234567
+           |         enabled locks: fixed-dialing
+           |           operator id: 23415
+           |         operator name: Vodafone UK
+           |          registration: home
+  -----------------------------------
+  SIM      |      primary sim path: /org/freedesktop/ModemManager1/SIM/0
+"""
+
+MMCLI_SIM = """\
+  -------------------------
+  General    |          path: /org/freedesktop/ModemManager1/SIM/0
+  -------------------------
+  Properties |        active: yes
+             |          imsi: 234159012345678
+             |         iccid: 8944110068123456789
+             |   operator id: 23415
+             | operator name: Vodafone UK
+"""
+
+MMCLI_SIGNAL = """\
+  --------------------------------
+  Signal | refresh rate: 0 seconds
+  --------------------------------
+  LTE    |         rssi: -67.00 dBm
+         |         rsrq: -9.00 dB
+         |         rsrp: -96.00 dBm
+         |          s/n: 12.40 dB
+"""
+
+V4L2_DEVICES = """\
+NVIDIA Tegra Video Input Device (platform:tegra-camrtc-ca):
+\t/dev/media0
+
+vi-output, imx462 9-001a (platform:tegra-capture-vi:0):
+\t/dev/video0
+
+vi-output, imx462 10-001a (platform:tegra-capture-vi:1):
+\t/dev/video1
+
+vi-output, imx662 11-001a (platform:tegra-capture-vi:2):
+\t/dev/video2
+"""
+
+SMARTCTL_HEALTH = """\
+smartctl 7.2 2020-12-30 r5155 [aarch64-linux-5.15.136-tegra] (local build)
+Copyright (C) 2002-20, Bruce Allen, Christian Franke, www.smartmontools.org
+
+=== START OF SMART DATA SECTION ===
+SMART overall-health self-assessment test result: PASSED
+"""
+
+SMARTCTL_UNSUPPORTED = """\
+smartctl 7.2 2020-12-30 r5155 [aarch64-linux-5.15.136-tegra] (local build)
+Copyright (C) 2002-20, Bruce Allen, Christian Franke, www.smartmontools.org
+
+/dev/mmcblk0: Unable to detect device type
+Please specify device type with the -d option.
+"""
+
+I2CDETECT = """\
+     0  1  2  3  4  5  6  7  8  9  a  b  c  d  e  f
+00:                         -- -- -- -- -- -- -- --
+10: -- -- -- -- -- -- -- -- -- -- 1a -- -- -- -- --
+20: -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- --
+30: -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- --
+40: 40 -- -- -- -- -- -- -- -- -- -- -- -- -- -- --
+50: 50 -- -- -- -- -- -- 57 -- -- -- -- -- -- -- --
+60: -- -- -- -- -- -- -- -- 68 -- 6a -- -- -- -- --
+70: -- -- -- -- -- -- -- --
+"""
+
+LSUSB = """\
+Bus 002 Device 002: ID 0bda:0489 Realtek Semiconductor Corp. 4-Port USB 3.0 Hub
+Bus 002 Device 001: ID 1d6b:0003 Linux Foundation 3.0 root hub
+Bus 001 Device 003: ID 2c7c:0125 Quectel Wireless Solutions Co., Ltd. EC25 LTE modem
+Bus 001 Device 002: ID 0bda:5489 Realtek Semiconductor Corp. 4-Port USB 2.0 Hub
+Bus 001 Device 001: ID 1d6b:0002 Linux Foundation 2.0 root hub
+"""
+
+IP_ADDR = """\
+1: lo: <LOOPBACK,UP,LOWER_UP> mtu 65536 qdisc noqueue state UNKNOWN group default qlen 1000
+    link/loopback 00:00:00:00:00:00 brd 00:00:00:00:00:00
+    inet 127.0.0.1/8 scope host lo
+2: eth0: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc mq state UP group default qlen 1000
+    link/ether 48:b0:2d:5e:71:a2 brd ff:ff:ff:ff:ff:ff
+    inet 10.0.4.17/24 brd 10.0.4.255 scope global dynamic noprefixroute eth0
+3: l4tbr0: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc noqueue state UP group default qlen 1000
+    link/ether 2a:3c:91:0e:44:b5 brd ff:ff:ff:ff:ff:ff
+    inet 192.168.55.1/24 brd 192.168.55.255 scope global l4tbr0
+4: wwan0: <POINTOPOINT,NOARP,UP,LOWER_UP> mtu 1500 qdisc fq_codel state UNKNOWN group default qlen 1000
+    link/none
+    inet 10.148.22.93/30 brd 10.148.22.95 scope global noprefixroute wwan0
+"""
+
+NMCLI_DEVICE = """\
+DEVICE    TYPE      STATE                   CONNECTION
+eth0      ethernet  connected               Wired connection 1
+cdc-wdm0  gsm       connected               lte
+l4tbr0    bridge    connected (externally)  l4tbr0
+lo        loopback  unmanaged               --
+"""
+
+FREE = """\
+               total        used        free      shared  buff/cache   available
+Mem:           7.5Gi       1.3Gi       4.9Gi        38Mi       1.3Gi       6.1Gi
+Swap:          3.7Gi          0B       3.7Gi
+"""
+
+DF = """\
+Filesystem      Size  Used Avail Use% Mounted on
+/dev/nvme0n1p1  234G   18G  204G   9% /
+tmpfs           3.8G  4.0K  3.8G   1% /dev/shm
+tmpfs           1.5G   19M  1.5G   2% /run
+/dev/mmcblk0p1   29G  6.2G   22G  23% /media/sd
+"""
+
+TOP = """\
+top - 10:42:17 up 3 days,  2:11,  1 user,  load average: 0.42, 0.37, 0.31
+Tasks: 312 total,   1 running, 311 sleeping,   0 stopped,   0 zombie
+%Cpu(s):  3.1 us,  1.0 sy,  0.0 ni, 95.8 id,  0.0 wa,  0.1 hi,  0.0 si,  0.0 st
+MiB Mem :   7675.2 total,   5000.3 free,   1349.8 used,   1325.1 buff/cache
+MiB Swap:   3837.6 total,   3837.6 free,      0.0 used.   6121.0 avail Mem
+
+    PID USER      PR  NI    VIRT    RES    SHR S  %CPU  %MEM     TIME+ COMMAND
+   1412 root      20   0 2113340 182044  61232 S   6.2   2.3  52:10.44 hwman
+   1098 root      20   0  303512  14420  11872 S   0.0   0.2   1:02.19 NetworkManager
+      1 root      20   0  167452  12880   8316 S   0.0   0.2   0:09.71 systemd
+"""
+
+SYSTEM = """\
+Linux v3-sensor 5.15.136-tegra #1 SMP PREEMPT Mon May 6 09:56:39 PDT 2024 aarch64 aarch64 aarch64 GNU/Linux
+ 10:42:17 up 3 days,  2:11,  1 user,  load average: 0.42, 0.37, 0.31
+ Static hostname: v3-sensor
+       Icon name: computer
+      Machine ID: 5f1b8e2c9d0a4e6b8c7f3a2d1e0b9c8a
+         Boot ID: 3f9a2c4e5b1d4e8f9a7c2d6b8e1f0a35
+Operating System: Ubuntu 22.04.4 LTS
+          Kernel: Linux 5.15.136-tegra
+    Architecture: arm64
+"""
+
+DMESG = """\
+[    2.114021] tegra-xudc 3550000.usb: failed to get usbphy-0: -517
+[    4.903117] nvme nvme0: missing or invalid SUBNQN field.
+"""
+
+JOURNALCTL = "-- No entries --\n"
+
+def _battery_charger(match: re.Match) -> str:
+    field = match.group(1)
+    return json.dumps({"battery_charger_field": field, "payload_int": BATTERY_CHARGER_FIELDS.get(field, 0)})
+
+def _smartctl(match: re.Match) -> Tuple[int, str, str]:
+    if match.group(1).startswith("/dev/nvme"):
+        return 0, SMARTCTL_HEALTH, ""
+    return 1, SMARTCTL_UNSUPPORTED, ""
+
+# (pattern, answer) in match order; an answer is stdout, or a function of the match
+# returning stdout or (exit_code, stdout, stderr)
+COMMANDS = [
+    (r"echo ok", "ok\n"),
+    (r"stat -c %Y /dev", "1760000123\n"),
+    (r"lsblk -bdnro NAME,SIZE,MODEL,SERIAL \| md5sum", "4b6f0a7e2c1d9e8f3a5b7c9d1e2f3a4b  -\n"),
+    (r"ls /sys/bus/usb/devices \| md5sum", "9c2e4f6a8b0d1c3e5f7a9b1d3c5e7f9a  -\n"),
+    (r"ls /sys/bus/usb/devices", "\n".join(USB_DEVICES) + "\n"),
+    (r"lsblk -dno NAME", "mmcblk0\nnvme0n1\nzram0\n"),
+    (r"smartctl -H (\S+)", _smartctl),
+    (r"mmcli -L", MMCLI_LIST),
+    (r"mmcli -m 0 --signal", MMCLI_SIGNAL),
+    (r"mmcli -m 0", MMCLI_MODEM),
+    (r"mmcli -i 0", MMCLI_SIM),
+    (r"ls /dev/video\* 2>/dev/null", "/dev/video0\n/dev/video1\n/dev/video2\n"),
+    (r"ls /dev/media\* 2>/dev/null", "/dev/media0\n"),
+    (r"v4l2-ctl --list-devices( 2>/dev/null)?", V4L2_DEVICES),
+    (r"curl -s http://localhost:2000/battery_charger_field/(\w+) 2>/dev/null", _battery_charger),
+    (r"curl -s -X POST http://localhost:2000/switch/\S+/\S+", '{"success": true}\n'),
+    (r"i2cdetect -y 1", I2CDETECT),
+    (r"lsusb", LSUSB),
+    (r"ip a", IP_ADDR),
+    (r"nmcli device", NMCLI_DEVICE),
+    (r"free -h", FREE),
+    (r"df -h", DF),
+    (r"top -bn1 \| head -n 15", TOP),
+    (r"uname -a && uptime && hostnamectl", SYSTEM),
+    (r"dmesg \| grep .*", DMESG),
+    (r"journalctl .*", JOURNALCTL),
+]
+
+# `cat <paths> [2>/dev/null] [| head -N]` is answered from FILES
+_CAT = re.compile(r"cat ((?:\S+ ?)+?)(?: 2>/dev/null)?(?: \| head -(?:n )?(\d+))?")
+
+def parse_command_latencies(spec: str) -> Dict[str, float]:
+    latencies = {}
+    for item in spec.split(','):
+        prefix, sep, value = item.partition('=')
+        if sep and prefix.strip():
+            try:
+                latencies[prefix.strip()] = float(value)
+            except ValueError:
+                logger.warning(f"⚠️ Ignoring fake device latency '{item}'")
+    return latencies
+
+class FakeDeviceTransport(Transport):
+    """
+    Transport answering from the canned outputs above, after a simulated delay.
+
+    Args:
+        latency_ms: Simulated network round trip, per call
+        jitter_ms: Up to this much extra delay, uniformly distributed, per call
+        command_latency_ms: Extra device-side time per command, keyed by command prefix
+        files: Overrides or additions to the simulated file system
+        seed: Seed for the jitter, for repeatable runs
+    """
+
+    name = "fake"
+
+    def __init__(self, latency_ms: float = DEFAULT_LATENCY_MS, jitter_ms: float = DEFAULT_JITTER_MS,
+                 command_latency_ms: Optional[Dict[str, float]] = None,
+                 files: Optional[Dict[str, bytes]] = None, seed: Optional[int] = None):
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.command_latency_ms = dict(DEFAULT_COMMAND_LATENCY_MS if command_latency_ms is None else command_latency_ms)
+        self.files = {**FILES, **(files or {})}
+        self._commands = [(re.compile(pattern), answer) for pattern, answer in COMMANDS]
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._unknown = set()
+
+    @classmethod
+    def from_env(cls) -> 'FakeDeviceTransport':
+        command_latency = dict(DEFAULT_COMMAND_LATENCY_MS)
+        command_latency.update(parse_command_latencies(os.getenv("FAKE_DEVICE_COMMAND_LATENCY_MS", "")))
+        return cls(
+            latency_ms=float(os.getenv("FAKE_DEVICE_LATENCY_MS", DEFAULT_LATENCY_MS)),
+            jitter_ms=float(os.getenv("FAKE_DEVICE_JITTER_MS", DEFAULT_JITTER_MS)),
+            command_latency_ms=command_latency
+        )
+
+    def execute(self, command: str, timeout: float) -> Tuple[int, bytes, bytes]:
+        return self._round_trip([command], timeout)[0][:3]
+
+    def execute_sudo(self, command: str, timeout: float) -> Tuple[int, bytes, bytes]:
+        return self.execute(command, timeout)
+
+    def execute_batch(self, commands: List[str], timeout: float,
+                      sudo: bool = False) -> List[Tuple[int, bytes, bytes, float]]:
+        return self._round_trip(commands, timeout)
+
+    def read_files(self, patterns: Iterable[str], max_bytes: int = 65536) -> Dict[str, bytes]:
+        patterns = list(patterns)
+        files = {path: data[:max_bytes] for path, data in self._glob(patterns)}
+        self._delay(self._jittered(self.latency_ms), timeout=None)
+        self.stats.record(sum(len(pattern) for pattern in patterns),
+                          sum(len(path) + len(data) for path, data in files.items()))
+        return files
+
+    def check_connection(self) -> Tuple[bool, str]:
+        exit_code, stdout, stderr = self.execute("echo ok", timeout=5)
+        if exit_code == 0:
+            return True, "SSH connection successful"
+        return False, f"SSH connection failed: {stderr.decode('utf-8', errors='ignore')}"
+
+    def answer(self, command: str) -> Tuple[int, bytes, bytes]:
+        """The canned (exit_code, stdout, stderr) for command, without any delay."""
+        command = command.strip()
+        for pattern, answer in self._commands:
+            match = pattern.fullmatch(command)
+            if match is None:
+                continue
+            if callable(answer):
+                answer = answer(match)
+            if isinstance(answer, tuple):
+                exit_code, stdout, stderr = answer
+                return exit_code, stdout.encode(), stderr.encode()
+            return 0, answer.encode(), b""
+
+        match = _CAT.fullmatch(command)
+        if match is not None:
+            return self._cat(match)
+
+        program = command.split()[0] if command else ""
+        if command not in self._unknown:
+            self._unknown.add(command)
+            logger.warning(f"⚠️ Fake device has no answer for: {command}")
+        return 127, b"", f"bash: {program}: command not found\n".encode()
+
+    def _cat(self, match: re.Match) -> Tuple[int, bytes, bytes]:
+        patterns = match.group(1).split()
+        data = b"".join(contents for _, contents in self._glob(patterns))
+        if match.group(2):
+            data = b"".join(data.splitlines(keepends=True)[:int(match.group(2))])
+        if not data and "2>/dev/null" not in match.group(0):
+            return 1, b"", f"cat: {patterns[0]}: No such file or directory\n".encode()
+        return 0, data, b""
+
+    def _glob(self, patterns: List[str]):
+        for pattern in patterns:
+            for path in sorted(self.files):
+                if fnmatch.fnmatchcase(path, pattern):
+                    yield path, self.files[path]
+
+    def _command_latency(self, command: str) -> float:
+        return next((ms for prefix, ms in self.command_latency_ms.items() if command.startswith(prefix)), 0.0)
+
+    def _jittered(self, ms: float) -> float:
+        with self._random_lock:
+            return ms + self._random.uniform(0, self.jitter_ms) if self.jitter_ms > 0 else ms
+
+    def _round_trip(self, commands: List[str], timeout: float) -> List[Tuple[int, bytes, bytes, float]]:
+        """Answer commands as one round trip; each tuple ends with its simulated device-side duration."""
+        device_ms = [self._command_latency(command) for command in commands]
+        error = self._delay(self._jittered(self.latency_ms) + sum(device_ms), timeout)
+
+        results = []
+        for command, ms in zip(commands, device_ms):
+            if error is None:
+                exit_code, stdout, stderr = self.answer(command)
+            else:
+                exit_code, stdout, stderr = -1, b"", error.encode()
+            results.append((exit_code, stdout, stderr, ms / 1000))
+
+        self.stats.record(sum(len(command.encode('utf-8')) for command in commands),
+                          sum(len(stdout) + len(stderr) for _, stdout, stderr, _ in results),
+                          commands=len(commands))
+        return results
+
+    def _delay(self, ms: float, timeout: Optional[float]) -> Optional[str]:
+        """Sleep for ms (cut short by the timeout or the cancel scope); the error that cut it short, if any."""
+        delay = ms / 1000
+        wait = delay if timeout is None else min(delay, timeout)
+        cancelled = threading.Event()
+        with cancel_callback(cancelled.set):
+            if cancelled.wait(wait):
+                return cancel_reason()
+        if delay > wait:
+            return f"SSH command timed out after {round(timeout, 1):g} seconds"
+        return None
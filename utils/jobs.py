@@ -0,0 +1,176 @@
+"""
+Background jobs for long-running work such as a full diagnostics run.
+
+A job runs on the manager's worker pool, independent of any HTTP request, and
+publishes its progress as numbered events. Watchers (one per browser tab or
+SSE connection) read the events after the last id they have seen, so a client
+that reloads or loses its connection attaches again without rerunning
+anything; EventSource sends that id back in the Last-Event-ID header when it
+reconnects.
+
+Finished jobs stay retrievable for the manager's TTL, then are dropped.
+"""
+import datetime
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from .cancellation import CancelScope
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_WORKERS = 2
+
+# Seconds a finished job stays retrievable
+DEFAULT_JOB_TTL = 600
+
+class Job:
+    """
+    One unit of background work and the events it has published so far.
+
+    The work gets the job itself: it publishes events with publish() and can
+    check job.scope, which is cancelled by cancel().
+    """
+
+    RUNNING, DONE, FAILED, CANCELLED = 'running', 'done', 'failed', 'cancelled'
+
+    def __init__(self, kind: str, params: Optional[dict] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = dict(params or {})
+        self.state = Job.RUNNING
+        self.error = None
+        self.result = None
+        self.created_at = datetime.datetime.now().isoformat()
+        self.finished_at = None
+        self.finished_monotonic = None
+        self.scope = CancelScope()
+        self._events: List[Tuple[int, dict]] = []
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.state != Job.RUNNING
+
+    @property
+    def last_event_id(self) -> int:
+        with self._changed:
+            return self._events[-1][0] if self._events else 0
+
+    def publish(self, event: dict) -> int:
+        """Append an event for every watcher; returns its id (ids start at 1)."""
+        with self._changed:
+            event_id = len(self._events) + 1
+            self._events.append((event_id, event))
+            self._changed.notify_all()
+        return event_id
+
+    def events_after(self, last_event_id: int, timeout: Optional[float] = None) -> List[Tuple[int, dict]]:
+        """
+        Events with an id above last_event_id, waiting up to timeout seconds for
+        one to arrive. Returns [] on timeout or when the job finished without more.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: len(self._events) > last_event_id or self.finished, timeout)
+            return self._events[max(0, last_event_id):]
+
+    def cancel(self, reason: str = "Job cancelled"):
+        if not self.finished:
+            logger.info(f"⏹️ Cancelling job {self.id}: {reason}")
+            self.scope.cancel(reason)
+
+    def _finish(self, state: str, result=None, error: Optional[str] = None):
+        with self._changed:
+            self.state = state
+            self.result = result
+            self.error = error
+            self.finished_at = datetime.datetime.now().isoformat()
+            self.finished_monotonic = time.monotonic()
+            self._changed.notify_all()
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': self.params,
+            'state': self.state,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'last_event_id': self.last_event_id,
+            'result': self.result,
+            'error': self.error
+        }
+
+class JobManager:
+    """Runs jobs on a bounded worker pool and keeps them (finished ones for ttl seconds)."""
+
+    def __init__(self, max_workers: int = DEFAULT_JOB_WORKERS, ttl: float = DEFAULT_JOB_TTL):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._active: Dict[Hashable, Job] = {}  # dedupe key -> unfinished job
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, work: Callable[[Job], object], params: Optional[dict] = None,
+               dedupe_key: Optional[Hashable] = None) -> Tuple[Job, bool]:
+        """
+        Start work(job) in the background and return (job, created).
+
+        With a dedupe_key, an unfinished job submitted under the same key is
+        returned instead (created=False), so a second tab attaches to the run
+        already in progress. work's return value becomes job.result.
+        """
+        self._expire()
+        with self._lock:
+            if dedupe_key is not None:
+                existing = self._active.get(dedupe_key)
+                if existing is not None and not existing.finished:
+                    return existing, False
+
+            job = Job(kind, params)
+            self._jobs[job.id] = job
+            if dedupe_key is not None:
+                self._active[dedupe_key] = job
+
+        logger.info(f"📋 Job {job.id} ({kind}) queued")
+        self._executor.submit(self._run, job, work, dedupe_key)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._expire()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        self._expire()
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def _run(self, job: Job, work: Callable[[Job], object], dedupe_key: Optional[Hashable]):
+        try:
+            if job.scope.cancelled:
+                job._finish(Job.CANCELLED, error=job.scope.reason)
+                return
+            result = work(job)
+            job._finish(Job.CANCELLED if job.scope.cancelled else Job.DONE, result=result,
+                        error=job.scope.reason if job.scope.cancelled else None)
+            logger.info(f"✅ Job {job.id} ({job.kind}) {job.state}")
+        except Exception as e:
+            logger.exception(f"Job {job.id} ({job.kind}) failed")
+            job._finish(Job.FAILED, error=str(e))
+        finally:
+            with self._lock:
+                if dedupe_key is not None and self._active.get(dedupe_key) is job:
+                    del self._active[dedupe_key]
+
+    def _expire(self):
+        """Drop finished jobs older than the TTL."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_monotonic is not None and now - job.finished_monotonic > self.ttl]
+            for job_id in expired:
+                del self._jobs[job_id]
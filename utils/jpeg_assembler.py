@@ -0,0 +1,126 @@
+"""
+Incremental JPEG reassembly from UDP datagrams.
+
+GStreamer's udpsink sends raw JPEG frames, split across datagrams when they
+are large. JpegAssembler receives datagrams straight into one preallocated
+buffer with recv_into() and looks for the SOI (FF D8) and EOI (FF D9) markers
+only in the bytes that just arrived, remembering where it got to, so a frame
+costs one scan of its bytes and one copy out of the buffer however many
+datagrams it spans. Nothing is reallocated while frames flow.
+
+Bytes before an SOI are discarded, and a frame that grows past the buffer's
+capacity is dropped rather than grown into.
+"""
+import logging
+import socket
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+SOI = b'\xff\xd8'
+EOI = b'\xff\xd9'
+
+# Largest UDP payload; recv_into always has this much room so no datagram is truncated
+MAX_DATAGRAM = 65507
+
+# Room for one frame plus a datagram: 720p JPEGs at the quality we stream are ~100 KB
+DEFAULT_CAPACITY = 2 * 1024 * 1024
+
+class JpegAssembler:
+    """
+    Reassembles JPEG frames from a datagram stream into a fixed buffer.
+
+    Args:
+        on_frame: Called with each complete frame, as bytes (the only copy made)
+        capacity: Buffer size; frames larger than capacity - MAX_DATAGRAM are dropped
+    """
+
+    def __init__(self, on_frame: Callable[[bytes], None], capacity: int = DEFAULT_CAPACITY):
+        if capacity < 2 * MAX_DATAGRAM:
+            raise ValueError(f"capacity must be at least {2 * MAX_DATAGRAM} bytes")
+        self.on_frame = on_frame
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._end = 0        # Bytes held
+        self._scanned = 0    # Bytes already searched for the marker we are waiting for
+        self._in_frame = False  # Whether the buffer starts with the SOI of a frame in progress
+        self.frames = 0
+        self.dropped_frames = 0
+        self.discarded_bytes = 0
+
+    def recv_from(self, sock: socket.socket) -> int:
+        """
+        Receive one datagram from sock into the buffer and emit any frames it completes.
+        Returns the datagram's size; socket errors (including timeouts) propagate.
+        """
+        self._make_room(MAX_DATAGRAM)
+        received = sock.recv_into(self._view[self._end:])
+        self._end += received
+        self._scan()
+        return received
+
+    def feed(self, data) -> None:
+        """Add bytes that were received elsewhere (any bytes-like object), as recv_from() does."""
+        data = memoryview(data)
+        while len(data):
+            self._make_room(min(len(data), MAX_DATAGRAM))
+            chunk = data[:min(len(data), self.capacity - self._end)]
+            self._view[self._end:self._end + len(chunk)] = chunk
+            self._end += len(chunk)
+            self._scan()
+            data = data[len(chunk):]
+
+    def reset(self):
+        """Forget any partial frame."""
+        self.discarded_bytes += self._end
+        self._end = self._scanned = 0
+        self._in_frame = False
+
+    def _scan(self):
+        buffer = self._buffer
+        while True:
+            # A marker may straddle datagrams, so each search backs up one byte
+            begin = max(self._scanned - 1, 0)
+            if not self._in_frame:
+                start = buffer.find(SOI, begin, self._end)
+                if start == -1:
+                    # Keep a trailing FF, which may be the first half of an SOI
+                    start = self._end - 1 if self._end and buffer[self._end - 1] == 0xFF else self._end
+                    self.discarded_bytes += start
+                    self._discard(start)
+                    return
+                self.discarded_bytes += start
+                self._discard(start)
+                self._in_frame = True
+                self._scanned = len(SOI)
+                continue
+
+            eoi = buffer.find(EOI, max(begin, len(SOI)), self._end)
+            if eoi == -1:
+                self._scanned = self._end
+                return
+
+            frame_end = eoi + len(EOI)
+            self.frames += 1
+            self.on_frame(bytes(self._view[:frame_end]))
+            self._in_frame = False
+            self._discard(frame_end)
+
+    def _discard(self, count: int):
+        """Drop the first count bytes, moving what follows to the front of the buffer."""
+        if count <= 0:
+            return
+        remaining = self._end - count
+        if remaining:
+            self._view[:remaining] = self._view[count:self._end]
+        self._end = remaining
+        self._scanned = max(self._scanned - count, 0)
+
+    def _make_room(self, needed: int):
+        """Ensure needed free bytes at the end of the buffer, dropping a frame that outgrew it."""
+        if self.capacity - self._end >= needed:
+            return
+        self.dropped_frames += 1
+        logger.warning(f"⚠️ Dropping JPEG frame larger than {self.capacity - MAX_DATAGRAM} bytes")
+        self.reset()
@@ -0,0 +1,192 @@
+"""
+Run-scoped memoisation of device probes.
+
+Several diagnostics ask the device the same question: check_modem and
+check_sim both run the mmcli queries, check_memory and check_memory_extended
+both run `free -h`, and so on. check_all creates one ProbeContext per run and
+passes it to every module's run(probe=...); each distinct probe then reaches
+the device once and every other caller gets the same answer, including callers
+that ask while the first request is still in flight.
+
+prefetch() claims many probes at once and fetches them in at most one batch
+per kind (user commands, root commands, files), so declarative checks whose
+inputs are known up front cost a couple of round trips for the whole suite.
+
+Nothing outlives the context, so a new run always sees fresh data. The one
+exception to "asked once" is a probe cancelled with the check that started
+it (see utils/cancellation.py): it is dropped, and the next caller whose own
+scope is still live fetches it again.
+"""
+import fnmatch
+import logging
+import threading
+from concurrent.futures import CancelledError, Future, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Hashable, Iterable, List, Tuple
+
+from .cancellation import bind_scope, cancel_reason, current_scope, is_cancelled, wait_result
+
+from .ssh_interface import (batch_output, read_remote_files, run_ssh_batch, run_ssh_command,
+                            run_sudo_batch, run_sudo_command, submit_ssh_command)
+
+logger = logging.getLogger(__name__)
+
+# Timeout for a prefetched batch as a whole, in seconds
+PREFETCH_TIMEOUT = 60
+
+def _glob_match(path: str, pattern: str) -> bool:
+    """Whether path is one of pattern's matches, comparing component by component like a shell glob."""
+    parts = path.split('/')
+    pattern_parts = pattern.split('/')
+    return len(parts) == len(pattern_parts) and all(
+        fnmatch.fnmatchcase(part, pattern_part) for part, pattern_part in zip(parts, pattern_parts)
+    )
+
+class ProbeContext:
+    """
+    Memoises run_ssh_command, run_sudo_command and read_remote_files for one run.
+
+    Results are keyed by the command (or file pattern) only; the timeout of
+    the first caller applies. Errors are memoised like any other output, so a
+    probe that failed once is not retried within the same run.
+    """
+
+    def __init__(self):
+        self._futures: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def run_ssh_command(self, command: str, timeout: int = 60) -> str:
+        return self._value(('ssh', command), lambda: run_ssh_command(command, timeout=timeout))
+
+    def submit_ssh_command(self, command: str, timeout: int = 60) -> Future:
+        """Like submit_ssh_command, but shared with every other caller of the same command."""
+        key = ('ssh', command)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self.hits += 1
+                return future
+            self.misses += 1
+            future = self._futures[key] = submit_ssh_command(command, timeout=timeout)
+            return future
+
+    def run_sudo_command(self, command: str, timeout: int = 60) -> str:
+        return self._value(('sudo', command), lambda: run_sudo_command(command, timeout=timeout))
+
+    def read_remote_files(self, patterns: Iterable[str], max_bytes: int = 65536) -> Dict[str, bytes]:
+        """read_remote_files memoised per pattern; patterns not seen yet in this run are read together."""
+        keys = [('files', pattern, max_bytes) for pattern in patterns]
+        while True:
+            claimed, futures = self._acquire(keys)
+            if claimed:
+                self._fetch_files(claimed, max_bytes)
+            try:
+                files = {}
+                for future in futures:
+                    files.update(wait_result(future))
+                return files
+            except (CancelledError, FutureTimeout):
+                if is_cancelled():
+                    return {}
+
+    def prefetch(self, commands: Iterable[str] = (), sudo_commands: Iterable[str] = (),
+                 files: Iterable[str] = (), max_bytes: int = 65536):
+        """
+        Claim every probe not fetched yet and fetch each kind in one batch, in the background.
+
+        Returns immediately; callers asking for a claimed probe wait for its batch.
+        """
+        fetches = [
+            (self._claim([('ssh', command) for command in commands]), self._fetch_commands),
+            (self._claim([('sudo', command) for command in sudo_commands]), self._fetch_sudo_commands),
+            (self._claim([('files', pattern, max_bytes) for pattern in files]),
+             lambda claimed: self._fetch_files(claimed, max_bytes))
+        ]
+        scope = current_scope()
+        for claimed, fetch in fetches:
+            if claimed:
+                threading.Thread(target=self._fetch_in_scope, args=(scope, fetch, claimed),
+                                 name="probe-prefetch", daemon=True).start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'probes': len(self._futures), 'hits': self.hits, 'misses': self.misses}
+
+    def _claim(self, keys: List[Hashable]) -> Dict[Hashable, Future]:
+        """Create futures for the keys nobody has asked for yet; the caller must resolve them."""
+        return self._acquire(keys)[0]
+
+    def _acquire(self, keys: List[Hashable]) -> Tuple[Dict[Hashable, Future], List[Future]]:
+        """(futures claimed by this call, the future of every key), in one step."""
+        claimed, futures = {}, []
+        with self._lock:
+            for key in keys:
+                future = self._futures.get(key)
+                if future is not None:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                    future = claimed[key] = self._futures[key] = Future()
+                    # Running from the start: a waiter giving up must not cancel it for the others
+                    future.set_running_or_notify_cancel()
+                futures.append(future)
+        return claimed, futures
+
+    def _value(self, key: Hashable, compute: Callable[[], str]) -> str:
+        """The memoised output of a command probe, bounded by the caller's cancel scope."""
+        while True:
+            claimed, (future,) = self._acquire([key])
+            if claimed:
+                self._resolve(claimed, lambda: {key: compute()})
+            try:
+                return wait_result(future)
+            except (CancelledError, FutureTimeout):
+                if is_cancelled():
+                    return f"Error: {cancel_reason()}"
+                # Cancelled with the check that started it; ours is still live, so fetch it again
+
+    @staticmethod
+    def _fetch_in_scope(scope, fetch: Callable, claimed: Dict[Hashable, Future]):
+        with bind_scope(scope):
+            fetch(claimed)
+
+    def _resolve(self, claimed: Dict[Hashable, Future], compute: Callable[[], object]):
+        """Set every claimed future from compute(), which returns {key: value}."""
+        try:
+            values = compute()
+            if is_cancelled():
+                # Whatever came back was cut short; let a caller that is still live fetch it again
+                with self._lock:
+                    for key in claimed:
+                        self._futures.pop(key, None)
+                for future in claimed.values():
+                    future.set_exception(CancelledError())
+                return
+            for key, future in claimed.items():
+                future.set_result(values[key])
+        except BaseException as e:
+            for future in claimed.values():
+                if not future.done():
+                    future.set_exception(e)
+
+    def _fetch_commands(self, claimed: Dict[Hashable, Future]):
+        commands = [key[1] for key in claimed]
+        self._resolve(claimed, lambda: {
+            ('ssh', result['command']): batch_output(result) for result in run_ssh_batch(commands, timeout=PREFETCH_TIMEOUT)
+        })
+
+    def _fetch_sudo_commands(self, claimed: Dict[Hashable, Future]):
+        commands = [key[1] for key in claimed]
+        self._resolve(claimed, lambda: {
+            ('sudo', result['command']): batch_output(result) for result in run_sudo_batch(commands, timeout=PREFETCH_TIMEOUT)
+        })
+
+    def _fetch_files(self, claimed: Dict[Hashable, Future], max_bytes: int):
+        def fetch():
+            files = read_remote_files([key[1] for key in claimed], max_bytes=max_bytes)
+            return {
+                key: {path: data for path, data in files.items() if _glob_match(path, key[1])}
+                for key in claimed
+            }
+        self._resolve(claimed, fetch)
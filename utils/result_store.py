@@ -0,0 +1,113 @@
+"""
+Results of earlier diagnostic runs, reused while the device hasn't changed.
+
+A check that only reports on hardware (USB topology, I2C devices, cameras,
+SMART data) gives the same answer until something is plugged, unplugged or
+rebooted. Such modules list what their result depends on:
+
+    FINGERPRINT = ["boot_id", "usb"]
+
+Each name is a cheap device probe from FINGERPRINT_COMMANDS. Before a run the
+probes a suite needs are fetched in one batch, and a check's fingerprint is
+the hash of those values together with the device and the module's own mtime.
+An incremental run returns the stored result of a check whose fingerprint is
+unchanged, marked 'reused', instead of running it again. Modules without
+FINGERPRINT (thermals, memory, anything reporting live state) always run.
+"""
+import datetime
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from .probe_context import ProbeContext
+from .ssh_interface import device_key
+
+logger = logging.getLogger(__name__)
+
+# Fingerprint components: each is one cheap command, hashed on the device where the output is long
+FINGERPRINT_COMMANDS = {
+    'boot_id': "cat /proc/sys/kernel/random/boot_id",  # Changes on every reboot
+    'dev': "stat -c %Y /dev",  # Changes when device nodes come and go
+    'block': "lsblk -bdnro NAME,SIZE,MODEL,SERIAL | md5sum",
+    'usb': "ls /sys/bus/usb/devices | md5sum"  # Bus-port names encode the topology
+}
+
+# Results that may be reused; errors and timeouts are worth retrying
+REUSABLE_STATUSES = ('success', 'warning')
+
+# Seconds a stored result stays reusable even with an unchanged fingerprint
+DEFAULT_MAX_AGE = 3600
+
+def device_fingerprint(components: Iterable[str], probe: ProbeContext) -> Dict[str, Optional[str]]:
+    """Current value of each fingerprint component (None when it couldn't be read), in one batch."""
+    commands = {name: FINGERPRINT_COMMANDS[name] for name in components if name in FINGERPRINT_COMMANDS}
+    probe.prefetch(commands=list(commands.values()))
+
+    values = {}
+    for name, command in commands.items():
+        output = probe.run_ssh_command(command)
+        values[name] = None if output.startswith('Error:') or not output.strip() else output.strip()
+    return values
+
+def check_fingerprint(info, values: Dict[str, Optional[str]]) -> Optional[str]:
+    """Fingerprint of a registry entry's inputs, or None when its result must not be reused."""
+    if not info.fingerprint:
+        return None
+
+    parts = [device_key(), info.name, repr(info.mtime)]
+    for component in sorted(info.fingerprint):
+        value = values.get(component)
+        if value is None:
+            return None
+        parts.append(f"{component}={value}")
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+def fingerprint_checks(infos: Iterable, probe: ProbeContext) -> Dict[str, Optional[str]]:
+    """Fingerprint of every registry entry that declares one, keyed by name."""
+    infos = [info for info in infos if info and info.fingerprint]
+    if not infos:
+        return {}
+    values = device_fingerprint({component for info in infos for component in info.fingerprint}, probe)
+    return {info.name: check_fingerprint(info, values) for info in infos}
+
+class ResultStore:
+    """Thread-safe map of check name -> (fingerprint, result) from the latest run."""
+
+    def __init__(self, max_age: float = DEFAULT_MAX_AGE):
+        self.max_age = max_age
+        self._entries = {}  # name -> (fingerprint, stored_at, timestamp, result)
+        self._lock = threading.Lock()
+
+    def get(self, name: str, fingerprint: Optional[str]) -> Optional[dict]:
+        """The stored result for name, marked as reused, if its fingerprint still matches."""
+        if fingerprint is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None:
+            return None
+
+        stored_fingerprint, stored_at, timestamp, result = entry
+        if stored_fingerprint != fingerprint or time.monotonic() - stored_at > self.max_age:
+            return None
+        return {**result, 'reused': True, 'reused_from': timestamp}
+
+    def put(self, name: str, fingerprint: Optional[str], result: dict):
+        """Store a fresh result; anything that can't be reused drops the old one instead."""
+        with self._lock:
+            if fingerprint is None or result.get('status') not in REUSABLE_STATUSES:
+                self._entries.pop(name, None)
+                return
+            timestamp = datetime.datetime.now().isoformat()
+            self._entries[name] = (fingerprint, time.monotonic(), timestamp, dict(result))
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+_result_store = ResultStore()
+
+def get_result_store() -> ResultStore:
+    return _result_store
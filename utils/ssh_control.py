@@ -0,0 +1,183 @@
+"""
+Managed OpenSSH control master for the subprocess SSH paths.
+
+The sshpass/ssh fallback, the ttyd terminal tabs and the camera kill command
+each used to pay a full TCP connect, key exchange and password auth. One
+master connection per device is started on demand and health-checked with
+`ssh -O check`; those paths add control_options() to their ssh command line
+and multiplex over it. If the master dies, ssh quietly connects directly, so
+callers keep working either way.
+"""
+import atexit
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+class ControlMaster:
+    """One `ssh -M -N` process per device, owned by this app."""
+
+    HEALTH_TTL = 5        # Seconds a successful health check is trusted
+    RETRY_DELAY = 30      # Seconds before trying again after a master failed to come up
+    START_TIMEOUT = 10    # Seconds to wait for a new master's socket
+    CONNECT_TIMEOUT = 3
+
+    def __init__(self, user: str, host: str, port: int = 22, password: str = ""):
+        self.user = user
+        self.host = host
+        self.port = port
+        self.password = password
+        # Short, per-device path: unix socket paths are limited to ~100 bytes
+        digest = hashlib.sha1(f"{user}@{host}:{port}".encode()).hexdigest()[:12]
+        self.control_path = os.path.join(tempfile.gettempdir(), f"v3-ssh-{digest}.sock")
+        self._process = None
+        self._healthy_until = 0.0
+        self._retry_after = 0.0
+        self._lock = threading.Lock()
+
+    def client_options(self) -> List[str]:
+        """ssh options that route a client through this master (or directly if it is gone)."""
+        return ["-o", f"ControlPath={self.control_path}", "-o", "ControlMaster=no"]
+
+    def is_healthy(self) -> bool:
+        """Whether the master answers `ssh -O check`; a good answer is trusted for HEALTH_TTL."""
+        if time.monotonic() < self._healthy_until:
+            return True
+        if not os.path.exists(self.control_path):
+            return False
+
+        try:
+            result = subprocess.run(
+                ["ssh", "-O", "check", *self.client_options(), "-p", str(self.port), f"{self.user}@{self.host}"],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=2
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+
+        healthy = result.returncode == 0
+        self._healthy_until = time.monotonic() + self.HEALTH_TTL if healthy else 0.0
+        return healthy
+
+    def ensure(self) -> bool:
+        """Start the master unless it is already running. Returns whether it can be used."""
+        if self.is_healthy():
+            return True
+
+        with self._lock:
+            if self.is_healthy():
+                return True
+            if time.monotonic() < self._retry_after:
+                return False
+            return self._start()
+
+    def _start(self) -> bool:
+        if not (self.password and shutil.which("sshpass") and shutil.which("ssh")):
+            self._retry_after = time.monotonic() + self.RETRY_DELAY
+            return False
+
+        self._terminate()
+        try:
+            os.unlink(self.control_path)  # Left behind by a master that died
+        except FileNotFoundError:
+            pass
+
+        cmd = [
+            "sshpass", "-p", self.password,
+            "ssh", "-M", "-N",
+            "-o", f"ControlPath={self.control_path}",
+            "-o", "StrictHostKeyChecking=accept-new",
+            "-o", "ServerAliveInterval=15",
+            "-o", "ServerAliveCountMax=4",
+            "-o", f"ConnectTimeout={self.CONNECT_TIMEOUT}",
+            "-p", str(self.port),
+            f"{self.user}@{self.host}"
+        ]
+
+        logger.info(f"🔀 Starting SSH control master for {self.user}@{self.host}")
+        try:
+            self._process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not start SSH control master: {e}")
+            self._retry_after = time.monotonic() + self.RETRY_DELAY
+            return False
+
+        deadline = time.monotonic() + self.START_TIMEOUT
+        while time.monotonic() < deadline and self._process.poll() is None:
+            if self.is_healthy():
+                logger.info("✅ SSH control master ready")
+                return True
+            time.sleep(0.1)
+
+        logger.warning("⚠️ SSH control master did not come up - subprocess SSH will connect directly")
+        self._terminate()
+        self._retry_after = time.monotonic() + self.RETRY_DELAY
+        return False
+
+    def stop(self):
+        """Shut the master down, e.g. before switching devices."""
+        with self._lock:
+            if self._process and self._process.poll() is None:
+                try:
+                    subprocess.run(
+                        ["ssh", "-O", "exit", *self.client_options(), "-p", str(self.port), f"{self.user}@{self.host}"],
+                        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=2
+                    )
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+                logger.info("🔌 SSH control master stopped")
+            self._terminate()
+            self._healthy_until = 0.0
+            self._retry_after = 0.0
+
+    def _terminate(self):
+        process, self._process = self._process, None
+        if process and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+_masters = {}
+_masters_lock = threading.Lock()
+
+def get_control_master() -> ControlMaster:
+    """Control master for the currently configured device."""
+    user = os.getenv("SSH_USER", "ubuntu")
+    host = os.getenv("SSH_IP", "192.168.55.1")
+    port = int(os.getenv("SSH_PORT", "22"))
+    with _masters_lock:
+        master = _masters.get((user, host, port))
+        if master is None:
+            master = _masters[(user, host, port)] = ControlMaster(user, host, port, os.getenv("SSH_PASSWORD", ""))
+        return master
+
+def control_options(start: bool = True) -> List[str]:
+    """
+    ssh options that multiplex over the device's control master, or [] when none is usable.
+
+    Args:
+        start: Start the master if it isn't running. Pass False on paths that
+            must not wait for a handshake; they then only use a running master.
+    """
+    if os.getenv("SSH_CONTROL_MASTER", "1") == "0":
+        return []
+    master = get_control_master()
+    usable = master.ensure() if start else master.is_healthy()
+    return master.client_options() if usable else []
+
+def stop_control_masters():
+    """Stop every control master this process started."""
+    with _masters_lock:
+        masters = list(_masters.values())
+    for master in masters:
+        master.stop()
+
+atexit.register(stop_control_masters)
@@ -1,8 +1,20 @@
 import subprocess
 import logging
+import base64
+import binascii
+import codecs
 import os
-from typing import Optional, Tuple
+import shlex
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
 from dotenv import load_dotenv
+from .cancellation import cancel_callback, cancel_reason, clamp_timeout, is_cancelled
+from .command_cache import get_command_cache
+from .ssh_control import control_options
+from .ssh_metrics import get_ssh_metrics, normalize_command
+from .transport import get_transport
 
 # Configure logging first
 logging.basicConfig(
@@ -15,11 +27,21 @@ logger = logging.getLogger(__name__)
 USE_PERSISTENT = False
 _persistent_ssh_command = None
 _persistent_check_connection = None
+_persistent_submit_command = None
+_get_persistent_connection = None
+_persistent_stream_command = None
+_persistent_sudo_command = None
+_persistent_read_files = None
 
 try:
     # Import persistent SSH functions - these use lazy initialization now
     from .ssh_persistent import run_ssh_command as _persistent_ssh_command
     from .ssh_persistent import check_ssh_connection as _persistent_check_connection
+    from .ssh_persistent import submit_ssh_command as _persistent_submit_command
+    from .ssh_persistent import get_ssh_connection as _get_persistent_connection
+    from .ssh_persistent import stream_ssh_command as _persistent_stream_command
+    from .ssh_persistent import run_sudo_command as _persistent_sudo_command
+    from .ssh_persistent import read_remote_files as _persistent_read_files
     USE_PERSISTENT = True
     logger.info("Persistent SSH connection available")
 except ImportError as e:
@@ -30,6 +52,10 @@ except Exception as e:
 # Load environment variables
 load_dotenv()
 
+def device_key() -> str:
+    """Identity of the currently configured device, used to key cached results."""
+    return f"{os.getenv('SSH_USER', 'ubuntu')}@{os.getenv('SSH_IP', '192.168.55.1')}:{os.getenv('SSH_PORT', '22')}"
+
 def remove_known_host(ip: str) -> None:
     """
     Remove SSH key entry for the given IP from known_hosts.
@@ -48,7 +74,56 @@ def remove_known_host(ip: str) -> None:
     except Exception as e:
         logger.warning(f"⚠️ Unexpected error removing known host: {e}")
 
+def _connect_timeout(timeout: float) -> int:
+    # ssh only takes whole seconds
+    return max(1, int(min(timeout, 10)))
+
+def _run_process(args: List[str], timeout: float, check: bool = False, text: bool = False) -> subprocess.CompletedProcess:
+    """
+    subprocess.run() that also kills the process if the current cancel scope
+    is cancelled, so an abandoned diagnostic doesn't keep an ssh session open.
+    """
+    with subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=text) as process:
+        with cancel_callback(process.kill):
+            try:
+                stdout, stderr = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                raise
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, args, stdout, stderr)
+    return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+
+def _run_transport_raw(transport, command: str, timeout: float, template: Optional[str] = None,
+                       sudo: bool = False) -> Tuple[int, bytes, bytes]:
+    """Run a command through a non-SSH transport (see utils/transport.py), recorded like the SSH paths."""
+    started = time.monotonic()
+    run = transport.execute_sudo if sudo else transport.execute
+    exit_code, stdout, stderr = run(command, timeout)
+    get_ssh_metrics().record(
+        command, time.monotonic() - started, bytes_out=len(command.encode('utf-8')),
+        bytes_in=len(stdout) + len(stderr), exit_code=exit_code, path=transport.name, template=template
+    )
+    return exit_code, stdout, stderr
+
+def _raw_output(exit_code: int, stdout: bytes, stderr: bytes) -> str:
+    """Render raw output the way run_ssh_command reports output and errors."""
+    return batch_output({
+        'exit_code': exit_code,
+        'stdout': stdout.decode('utf-8', errors='ignore'),
+        'stderr': stderr.decode('utf-8', errors='ignore')
+    })
+
 def run_ssh_command(command: str, timeout: int = 60, retry_on_key_error: bool = True, wait_for_exit: bool = True) -> str:
+    if is_cancelled():
+        return f"Error: {cancel_reason()}"
+    timeout = clamp_timeout(timeout)
+
+    transport = get_transport()
+    if transport is not None:
+        return _raw_output(*_run_transport_raw(transport, command, timeout))
+
     # Use persistent connection if available
     if USE_PERSISTENT and _persistent_ssh_command:
         try:
@@ -70,28 +145,35 @@ def run_ssh_command(command: str, timeout: int = 60, retry_on_key_error: bool =
         return [
             "sshpass", "-p", ssh_password,
             "ssh",
+            *control_options(),  # Multiplex over the device's control master when it is up
             "-o", "StrictHostKeyChecking=accept-new",  # Accept new hosts
-            "-o", f"ConnectTimeout={min(timeout, 10)}",
+            "-o", f"ConnectTimeout={_connect_timeout(timeout)}",
             f"{ssh_user}@{ssh_host}",
             command
         ]
 
     ssh_cmd = build_ssh_command()
+    started = time.monotonic()
+    retries = 0 if retry_on_key_error else 1  # Only the retry after a host key fix passes False
+
+    def record(exit_code, output=""):
+        get_ssh_metrics().record(
+            command, time.monotonic() - started, bytes_out=len(command.encode('utf-8')),
+            bytes_in=len(output.encode('utf-8')), exit_code=exit_code, retries=retries, path="subprocess"
+        )
 
     try:
         logger.info(f"▶️ Running SSH command: {command}")
-        result = subprocess.run(
-            ssh_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=timeout,
-            check=True,
-            text=True
-        )
+        result = _run_process(ssh_cmd, timeout, check=True, text=True)
+        record(0, result.stdout + result.stderr)
         logger.info(f"✅ SSH command output: {result.stdout.strip()}")
         return result.stdout.strip()
 
     except subprocess.CalledProcessError as e:
+        record(e.returncode, (e.stdout or "") + (e.stderr or ""))
+        if is_cancelled():
+            logger.warning(f"⏹️ SSH command cancelled: {command}")
+            return f"Error: {cancel_reason()}"
         stderr_output = e.stderr.strip()
         logger.warning(f"⚠️ SSH error: {stderr_output}")
 
@@ -104,7 +186,8 @@ def run_ssh_command(command: str, timeout: int = 60, retry_on_key_error: bool =
         return f"Error: {stderr_output}"
 
     except subprocess.TimeoutExpired:
-        error_msg = f"SSH command timed out after {timeout} seconds"
+        record(-1)
+        error_msg = f"SSH command timed out after {round(timeout, 1):g} seconds"
         logger.error(error_msg)
         return f"Error: {error_msg}"
 
@@ -113,76 +196,502 @@ def run_ssh_command(command: str, timeout: int = 60, retry_on_key_error: bool =
         logger.error(error_msg, exc_info=True)
         return f"Error: {error_msg}"
 
-# Connection state cache
-_connection_cache = {
-    'connected': None,
-    'last_check': None,
-    'message': None
+def _run_ssh_command_raw(command: str, timeout: int = 60, template: Optional[str] = None) -> Tuple[int, bytes, bytes]:
+    """
+    Run a command and return (exit_code, stdout, stderr) with raw byte output.
+    exit_code is -1 when the command could not be run; the reason is then in stderr.
+    template overrides the metrics grouping key for generated scripts.
+    """
+    if is_cancelled():
+        return -1, b"", cancel_reason().encode()
+    timeout = clamp_timeout(timeout)
+
+    transport = get_transport()
+    if transport is not None:
+        return _run_transport_raw(transport, command, timeout, template=template)
+
+    if USE_PERSISTENT and _get_persistent_connection:
+        try:
+            return _get_persistent_connection().execute_command_raw(command, timeout=timeout, template=template)
+        except Exception as e:
+            logger.warning(f"Persistent SSH failed, falling back to subprocess: {e}")
+
+    started = time.monotonic()
+    exit_code, stdout, stderr = _run_subprocess_raw(command, timeout)
+    get_ssh_metrics().record(
+        command, time.monotonic() - started, bytes_out=len(command.encode('utf-8')),
+        bytes_in=len(stdout) + len(stderr), exit_code=exit_code, path="subprocess", template=template
+    )
+    return exit_code, stdout, stderr
+
+def _run_subprocess_raw(command: str, timeout: int) -> Tuple[int, bytes, bytes]:
+    ssh_user = os.getenv("SSH_USER", "ubuntu")
+    ssh_host = os.getenv("SSH_IP", "192.168.55.1")
+    ssh_password = os.getenv("SSH_PASSWORD")
+
+    if not all([ssh_user, ssh_host, ssh_password]):
+        return -1, b"", b"Missing SSH configuration. Check environment variables."
+
+    ssh_cmd = [
+        "sshpass", "-p", ssh_password,
+        "ssh",
+        *control_options(),
+        "-o", "StrictHostKeyChecking=accept-new",
+        "-o", f"ConnectTimeout={_connect_timeout(timeout)}",
+        f"{ssh_user}@{ssh_host}",
+        command
+    ]
+
+    try:
+        result = _run_process(ssh_cmd, timeout)
+        if result.returncode and is_cancelled():
+            return -1, result.stdout, result.stderr + cancel_reason().encode()
+        return result.returncode, result.stdout, result.stderr
+    except subprocess.TimeoutExpired:
+        return -1, b"", f"SSH command timed out after {round(timeout, 1):g} seconds".encode()
+    except Exception as e:
+        return -1, b"", f"Unexpected error: {str(e)}".encode()
+
+# Remote side of run_ssh_batch. Each command runs in a subshell with its output captured
+# to temp files, then a header line "<index> <exit_code> <duration_us> <stdout_len> <stderr_len>"
+# is printed followed by exactly that many bytes of stdout and stderr.
+_BATCH_PRELUDE = r"""
+d=$(mktemp -d) || exit 1
+trap 'rm -rf "$d"' EXIT
+run() {
+  local s=${EPOCHREALTIME:-$(date +%s.%6N)}
+  ( eval "$2" ) >"$d/o" 2>"$d/e" </dev/null
+  local rc=$?
+  local e=${EPOCHREALTIME:-$(date +%s.%6N)}
+  printf '%s %s %s %s %s
+' "$1" "$rc" "$(( ${e/[.,]/} - ${s/[.,]/} ))" "$(wc -c <"$d/o")" "$(wc -c <"$d/e")"
+  cat "$d/o" "$d/e"
 }
+"""
+
+def _parse_batch_output(data: bytes, count: int) -> Dict[int, dict]:
+    """Parse the length-prefixed records produced by the batch script."""
+    records = {}
+    pos = 0
+    while pos < len(data) and len(records) < count:
+        header_end = data.find(b"\n", pos)
+        if header_end == -1:
+            break
+        fields = data[pos:header_end].split()
+        if len(fields) != 5:
+            break
+        index, exit_code, duration_us, out_len, err_len = (int(f) for f in fields)
+        out_start = header_end + 1
+        err_start = out_start + out_len
+        err_end = err_start + err_len
+        if err_end > len(data):
+            break
+        records[index] = {
+            'stdout': data[out_start:err_start].decode('utf-8', errors='ignore'),
+            'stderr': data[err_start:err_end].decode('utf-8', errors='ignore'),
+            'exit_code': exit_code,
+            'duration': duration_us / 1e6
+        }
+        pos = err_end
+    return records
+
+def run_ssh_batch(commands: List[str], timeout: int = 60, cache_ttl: Optional[float] = None) -> List[dict]:
+    """
+    Run several commands in a single SSH round trip.
+
+    Returns one dict per command, in order, with 'command', 'stdout', 'stderr',
+    'exit_code' and 'duration' (seconds, measured on the device). Output is
+    length-prefixed on the wire, so it may safely contain newlines, colons or
+    any other bytes. Commands that did not report back have exit_code -1.
+
+    With cache_ttl, commands with a cached result (shared with
+    run_ssh_command_cached) are answered locally and marked 'cached', and
+    successful results are stored for cache_ttl seconds.
+    """
+    if not commands:
+        return []
+
+    cache = get_command_cache()
+    device = device_key()
+    results = [None] * len(commands)
+
+    if cache_ttl is not None:
+        for index, command in enumerate(commands):
+            hit, output = cache.get((device, command))
+            if hit:
+                results[index] = {
+                    'command': command,
+                    'stdout': output,
+                    'stderr': '',
+                    'exit_code': 0,
+                    'duration': 0.0,
+                    'cached': True
+                }
+
+    pending = [index for index, result in enumerate(results) if result is None]
+    if not pending:
+        return results
+
+    logger.info(f"▶️ Running SSH batch of {len(pending)} commands")
+    for index, result in _execute_batch(commands, pending, timeout, _run_ssh_command_raw, "batch").items():
+        results[index] = result
+        if cache_ttl is not None and result['exit_code'] == 0:
+            cache.set((device, commands[index]), result['stdout'].strip(), cache_ttl)
+    return results
+
+def run_sudo_batch(commands: List[str], timeout: int = 60) -> List[dict]:
+    """
+    run_ssh_batch for privileged commands: the whole batch runs as root in one round trip,
+    in the persistent root shell when available. Results have the same shape.
+    """
+    if not commands:
+        return []
+
+    logger.info(f"▶️ Running sudo batch of {len(commands)} commands")
+    results = _execute_batch(commands, range(len(commands)), timeout, _run_sudo_command_raw, "sudo_batch")
+    return [results[index] for index in range(len(commands))]
+
+def _execute_batch(commands: List[str], indices: Iterable[int], timeout: int,
+                   run_raw, path: str) -> Dict[int, dict]:
+    """Run commands[i] for every i in indices as one batch script through run_raw; results keyed by index."""
+    indices = list(indices)
+    script = _BATCH_PRELUDE + "".join(
+        f"run {index} {shlex.quote(commands[index])}\n" for index in indices
+    )
+
+    template = f"{path}({len(indices)}): " + "; ".join(normalize_command(commands[index]) for index in indices)
+    transport = get_transport()
+    if transport is not None:
+        exit_code, stdout, stderr, records = _run_transport_batch(
+            transport, [commands[index] for index in indices], indices, timeout, path, template
+        )
+    else:
+        exit_code, stdout, stderr = run_raw(f"bash -c {shlex.quote(script)}", timeout=timeout, template=template)
+        records = _parse_batch_output(stdout, len(indices))
+
+    # Per-command timings were measured on the device, so they show up individually too
+    metrics = get_ssh_metrics()
+    for index, record in records.items():
+        metrics.record(
+            commands[index], record['duration'], bytes_out=len(commands[index].encode('utf-8')),
+            bytes_in=len(record['stdout']) + len(record['stderr']), exit_code=record['exit_code'], path=path
+        )
+
+    failure = stderr.decode('utf-8', errors='ignore').strip() or f"Batch exited with code {exit_code}"
+    results = {}
+    for index in indices:
+        record = records.get(index) or {
+            'stdout': '',
+            'stderr': failure,
+            'exit_code': -1,
+            'duration': 0.0
+        }
+        results[index] = {'command': commands[index], **record}
+    return results
+
+def _run_transport_batch(transport, commands: List[str], indices: List[int], timeout: int,
+                         path: str, template: str) -> Tuple[int, bytes, bytes, Dict[int, dict]]:
+    """_execute_batch's round trip through a non-SSH transport, with the records already parsed."""
+    if is_cancelled():
+        return -1, b"", cancel_reason().encode(), {}
+    timeout = clamp_timeout(timeout)
+
+    started = time.monotonic()
+    results = transport.execute_batch(commands, timeout, sudo=path == "sudo_batch")
+    bytes_in = sum(len(stdout) + len(stderr) for _, stdout, stderr, _ in results)
+    get_ssh_metrics().record(
+        template, time.monotonic() - started, bytes_out=sum(len(command.encode('utf-8')) for command in commands),
+        bytes_in=bytes_in, exit_code=0, path=transport.name, template=template
+    )
+
+    records = {}
+    for index, (exit_code, stdout, stderr, duration) in zip(indices, results):
+        records[index] = {
+            'stdout': stdout.decode('utf-8', errors='ignore'),
+            'stderr': stderr.decode('utf-8', errors='ignore'),
+            'exit_code': exit_code,
+            'duration': duration
+        }
+    return 0, b"", b"", records
+
+def batch_output(result: dict) -> str:
+    """Render a run_ssh_batch entry the way run_ssh_command reports output and errors."""
+    if result['exit_code'] == 0:
+        return result['stdout'].strip()
+    error = result['stderr'].strip() or result['stdout'].strip()
+    return f"Error: {error}"
+
+def read_remote_files(patterns: Iterable[str], max_bytes: int = 65536, timeout: int = 30) -> Dict[str, bytes]:
+    """
+    Read many small remote files (sysfs, procfs) in one go instead of a `cat` per file.
+
+    Args:
+        patterns: File paths; shell-style globs such as /sys/class/thermal/thermal_zone*/temp are expanded
+        max_bytes: Per-file read limit
+        timeout: Timeout for the shell fallback, in seconds
+
+    Returns:
+        Dict of path to raw bytes for every readable match. Unreadable or missing
+        files are simply absent; an empty dict means nothing could be read.
+    """
+    patterns = list(patterns)
+
+    transport = get_transport()
+    if transport is not None:
+        return transport.read_files(patterns, max_bytes=max_bytes)
+
+    # Pipelined SFTP on the persistent connection, when the device offers it
+    if USE_PERSISTENT and _persistent_read_files:
+        files = _persistent_read_files(patterns, max_bytes=max_bytes)
+        if files is not None:
+            return files
+
+    # One shell round trip: each file comes back as "<path>\t<base64>" on its own line
+    script = (
+        "IFS=; shopt -s nullglob; for p in " + " ".join(shlex.quote(p) for p in patterns) + "; do "
+        "for f in $p; do [ -f \"$f\" ] && [ -r \"$f\" ] || continue; "
+        f"printf '%s\\t' \"$f\"; head -c {int(max_bytes)} \"$f\" | base64 -w0; echo; "
+        "done; done"
+    )
+    template = "shell read: " + " ".join(normalize_command(p) for p in patterns)
+    exit_code, stdout, stderr = _run_ssh_command_raw(f"bash -c {shlex.quote(script)}", timeout=timeout, template=template)
+    if exit_code != 0:
+        logger.error(f"Failed to read remote files: {stderr.decode('utf-8', errors='ignore').strip()}")
+        return {}
+
+    files = {}
+    for line in stdout.decode('utf-8', errors='surrogateescape').splitlines():
+        path, sep, encoded = line.rpartition('\t')
+        if not sep:
+            continue
+        try:
+            files[path] = base64.b64decode(encoded)
+        except (binascii.Error, ValueError):
+            logger.warning(f"Discarding undecodable contents of {path}")
+    return files
+
+class _SubprocessStream:
+    """Subprocess fallback for stream_ssh_command with the same attributes as CommandStream."""
+
+    def __init__(self, command: str, timeout: int = 60, max_bytes: Optional[int] = None, chunk_size: int = 4096):
+        self.command = command
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        self.exit_status = None
+        self.truncated = False
+        self.timed_out = False
+
+    def __iter__(self):
+        ssh_user = os.getenv("SSH_USER", "ubuntu")
+        ssh_host = os.getenv("SSH_IP", "192.168.55.1")
+        ssh_password = os.getenv("SSH_PASSWORD")
+
+        if not all([ssh_user, ssh_host, ssh_password]):
+            self.exit_status = -1
+            yield "Error: Missing SSH configuration. Check environment variables."
+            return
+
+        ssh_cmd = [
+            "sshpass", "-p", ssh_password,
+            "ssh",
+            *control_options(),
+            "-o", "StrictHostKeyChecking=accept-new",
+            "-o", f"ConnectTimeout={min(self.timeout, 10)}",
+            f"{ssh_user}@{ssh_host}",
+            self.command
+        ]
+
+        try:
+            process = subprocess.Popen(ssh_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        except Exception as e:
+            self.exit_status = -1
+            yield f"Error: Unexpected error: {str(e)}"
+            return
+
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        timer = threading.Timer(self.timeout, self._expire, args=(process,))
+        timer.start()
+        try:
+            while True:
+                data = process.stdout.read1(self.chunk_size)
+                if not data:
+                    break
+                if self.max_bytes is not None and self.bytes_read + len(data) >= self.max_bytes:
+                    data = data[:self.max_bytes - self.bytes_read]
+                    self.truncated = True
+                self.bytes_read += len(data)
+                text = decoder.decode(data)
+                if text:
+                    yield text
+                if self.truncated:
+                    break
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield text
+        finally:
+            timer.cancel()
+            if process.poll() is None:
+                process.kill()
+            code = process.wait()
+            if not (self.truncated or self.timed_out):
+                self.exit_status = code
+
+    def _expire(self, process):
+        self.timed_out = True
+        process.kill()
+
+def stream_ssh_command(command: str, timeout: int = 60, max_bytes: Optional[int] = None):
+    """
+    Run a command and return an iterable of decoded output chunks as they arrive.
+    Reading stops at max_bytes. After iteration the stream's exit_status,
+    truncated and timed_out attributes describe how the command ended.
+    """
+    transport = get_transport()
+    if transport is not None:
+        return transport.stream(command, timeout=clamp_timeout(timeout), max_bytes=max_bytes)
+
+    if USE_PERSISTENT and _persistent_stream_command:
+        try:
+            return _persistent_stream_command(command, timeout=timeout, max_bytes=max_bytes)
+        except Exception as e:
+            logger.warning(f"Persistent SSH stream failed, falling back to subprocess: {e}")
+
+    return _SubprocessStream(command, timeout=timeout, max_bytes=max_bytes)
+
+def run_ssh_command_cached(command: str, ttl: float = 10, timeout: int = 60) -> str:
+    """
+    run_ssh_command backed by the shared command cache.
+    Successful output is reused for ttl seconds, and concurrent callers asking
+    for the same command share a single SSH round trip. Errors are not cached.
+    """
+    return get_command_cache().get_or_compute(
+        (device_key(), command),
+        lambda: run_ssh_command(command, timeout=timeout),
+        ttl=ttl,
+        should_cache=lambda output: not output.startswith("Error:")
+    )
+
+# Worker pool for the subprocess fallback of submit_ssh_command
+_fallback_executor = None
+
+def submit_ssh_command(command: str, timeout: int = 60, wait_for_exit: bool = True) -> Future:
+    """
+    Run a command asynchronously and return a Future resolving to its output string.
+    Independent probes submitted together share the persistent connection's channel pool.
+    """
+    global _fallback_executor
+
+    # Other transports run through run_ssh_command on the fallback pool
+    if USE_PERSISTENT and _persistent_submit_command and get_transport() is None:
+        try:
+            return _persistent_submit_command(command, timeout=timeout, wait_for_exit=wait_for_exit)
+        except Exception as e:
+            logger.warning(f"Persistent SSH submit failed, falling back to subprocess: {e}")
+
+    if _fallback_executor is None:
+        _fallback_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ssh-subprocess")
+    return _fallback_executor.submit(run_ssh_command, command, timeout, True, wait_for_exit)
+
+# Connection checks are cached briefly so simultaneous pollers share one probe
+CONNECTION_CACHE_TTL = 2           # Persistent connection checks
+FALLBACK_CONNECTION_CACHE_TTL = 10  # Subprocess checks pay a full SSH handshake
+
+def channel_queue_stats() -> Dict[str, dict]:
+    """Queued and running commands per priority class on the persistent connection ({} without one)."""
+    if USE_PERSISTENT and _get_persistent_connection and get_transport() is None:
+        try:
+            return _get_persistent_connection().pool.stats()
+        except Exception as e:
+            logger.warning(f"Could not read channel queue stats: {e}")
+    return {}
 
 def check_ssh_connection() -> Tuple[bool, str]:
     """
     Test SSH connection to the device with caching.
     """
+    cache = get_command_cache()
+    key = (device_key(), "__connection__")
+
+    transport = get_transport()
+    if transport is not None:
+        return cache.get_or_compute(key, transport.check_connection, ttl=CONNECTION_CACHE_TTL)
+
     # Use persistent connection if available
     if USE_PERSISTENT and _persistent_check_connection:
         try:
-            return _persistent_check_connection()
+            return cache.get_or_compute(key, _persistent_check_connection, ttl=CONNECTION_CACHE_TTL)
         except Exception as e:
             logger.warning(f"Persistent SSH check failed, falling back to subprocess: {e}")
     
     # Fallback to subprocess method
-    import time
-    
-    # Check cache (valid for 10 seconds)
-    if (_connection_cache['last_check'] and 
-        time.time() - _connection_cache['last_check'] < 10 and
-        _connection_cache['connected'] is not None):
-        return _connection_cache['connected'], _connection_cache['message']
-    
+    return cache.get_or_compute(key, _check_ssh_connection_subprocess, ttl=FALLBACK_CONNECTION_CACHE_TTL)
+
+def _check_ssh_connection_subprocess() -> Tuple[bool, str]:
     try:
         # Quick connection test with 5 second timeout
         output = run_ssh_command("echo ok", timeout=5)
         if output.strip() == "ok":
             logger.info("✅ SSH connection verified")
-            _connection_cache.update({
-                'connected': True,
-                'message': "SSH connection successful",
-                'last_check': time.time()
-            })
             return True, "SSH connection successful"
-        
-        message = f"SSH connection failed: {output}"
-        _connection_cache.update({
-            'connected': False,
-            'message': message,
-            'last_check': time.time()
-        })
-        return False, message
+        return False, f"SSH connection failed: {output}"
     except Exception as e:
-        message = f"Device not connected (SSH timeout)"
-        _connection_cache.update({
-            'connected': False,
-            'message': message,
-            'last_check': time.time()
-        })
-        return False, message
+        return False, f"Device not connected (SSH timeout)"
 
 def run_sudo_command(command: str, timeout: int = 60) -> str:
     """
     Run a command with sudo, automatically providing the password.
+
+    On the persistent connection the whole command runs in a long-lived root
+    shell that authenticated once, instead of paying a sudo PAM round per call.
     """
+    transport = get_transport()
+    if transport is not None:
+        if is_cancelled():
+            return f"Error: {cancel_reason()}"
+        return _raw_output(*_run_transport_raw(transport, command, clamp_timeout(timeout), sudo=True))
+
     sudo_password = os.getenv("SUDO_PASSWORD", os.getenv("SSH_PASSWORD", ""))
     
     if not sudo_password:
         logger.warning("No sudo password configured")
         return "Error: No sudo password configured"
+
+    if USE_PERSISTENT and _persistent_sudo_command:
+        result = _persistent_sudo_command(command, sudo_password, timeout=timeout)
+        if result is not None:
+            return result
     
     # Use echo to pipe password to sudo -S (read from stdin)
     sudo_cmd = f"echo '{sudo_password}' | sudo -S {command}"
     
     return run_ssh_command(sudo_cmd, timeout=timeout)
 
+def _run_sudo_command_raw(command: str, timeout: int = 60, template: Optional[str] = None) -> Tuple[int, bytes, bytes]:
+    """run_sudo_command returning (exit_code, stdout, stderr) with raw byte output, like _run_ssh_command_raw."""
+    transport = get_transport()
+    if transport is not None:
+        if is_cancelled():
+            return -1, b"", cancel_reason().encode()
+        return _run_transport_raw(transport, command, clamp_timeout(timeout), template=template, sudo=True)
+
+    sudo_password = os.getenv("SUDO_PASSWORD", os.getenv("SSH_PASSWORD", ""))
+
+    if not sudo_password:
+        logger.warning("No sudo password configured")
+        return -1, b"", b"No sudo password configured"
+
+    if USE_PERSISTENT and _get_persistent_connection:
+        try:
+            result = _get_persistent_connection().execute_sudo_raw(command, sudo_password, timeout=timeout, template=template)
+            if result is not None:
+                return result
+        except Exception as e:
+            logger.warning(f"Persistent root shell failed, falling back to sudo -S: {e}")
+
+    return _run_ssh_command_raw(f"echo {shlex.quote(sudo_password)} | sudo -S -p '' {command}", timeout=timeout, template=template)
+
 def execute_diagnostic_command(command: str, timeout: int = 60) -> dict:
     """
     Execute a diagnostic command and return structured output.
@@ -0,0 +1,181 @@
+"""
+Per-command SSH instrumentation.
+
+Every command that reaches the device is recorded under a normalised template
+(quoted arguments and numbers replaced), so `smartctl -H /dev/sda` and
+`smartctl -H /dev/sdb` share one entry. Each template keeps fixed-bucket
+histograms of wall time and channel-open time plus byte, exit code and retry
+counters.
+"""
+import re
+import threading
+from collections import Counter
+from typing import Optional, Sequence
+
+# Upper bounds in milliseconds; anything slower lands in the overflow bucket
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+MAX_TEMPLATE_LENGTH = 160
+
+_QUOTED = re.compile(r"'[^']*'|\"(?:[^\"\\]|\\.)*\"")
+_DISK = re.compile(r"/dev/(?:sd[a-z]+\d*|nvme\d+n\d+(?:p\d+)?|mmcblk\d+(?:p\d+)?)\b")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+
+def normalize_command(command: str) -> str:
+    """Reduce a command to a template so runs with different arguments are grouped together."""
+    template = _QUOTED.sub("'?'", command)
+    template = _DISK.sub("/dev/DISK", template)
+    template = _NUMBER.sub("N", template)
+    template = _SPACES.sub(" ", template).strip()
+    if len(template) > MAX_TEMPLATE_LENGTH:
+        template = template[:MAX_TEMPLATE_LENGTH - 3] + "..."
+    return template
+
+class Histogram:
+    """Fixed-bucket histogram; counts[i] holds values <= buckets[i], the last slot the overflow."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (the max for the overflow bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        buckets = {f"le_{bound}": n for bound, n in zip(self.buckets, self.counts)}
+        buckets["overflow"] = self.counts[-1]
+        return {
+            'count': self.count,
+            'sum': round(self.total, 3),
+            'mean': round(self.total / self.count, 3) if self.count else None,
+            'max': round(self.max, 3),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': buckets
+        }
+
+class CommandStats:
+    """Everything recorded for one command template."""
+
+    def __init__(self):
+        self.wall_ms = Histogram()
+        self.channel_open_ms = Histogram()
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.retries = 0
+        self.exit_codes = Counter()
+        self.paths = Counter()
+
+    def to_dict(self) -> dict:
+        return {
+            'calls': self.wall_ms.count,
+            'wall_ms': self.wall_ms.to_dict(),
+            'channel_open_ms': self.channel_open_ms.to_dict(),
+            'bytes_out': self.bytes_out,
+            'bytes_in': self.bytes_in,
+            'retries': self.retries,
+            'exit_codes': {str(code): n for code, n in self.exit_codes.items()},
+            'paths': dict(self.paths)
+        }
+
+class CommandTrace:
+    """Details an execution path fills in while running a command, for SSHMetrics.record."""
+
+    def __init__(self, path: str = "exec"):
+        self.path = path
+        self.channel_open_s = None
+        self.retries = 0
+
+class SSHMetrics:
+    """Thread-safe registry of CommandStats keyed by command template."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, command: str, wall_s: float, channel_open_s: Optional[float] = None,
+               bytes_out: int = 0, bytes_in: int = 0, exit_code: Optional[int] = None,
+               retries: int = 0, path: str = "exec", template: Optional[str] = None):
+        """
+        Record one command execution.
+
+        Args:
+            command: Command as sent; normalised unless template is given
+            wall_s: Total time the caller waited, in seconds
+            channel_open_s: Time spent getting a channel (None if no channel was needed)
+            bytes_out: Bytes sent to the device
+            bytes_in: Bytes of stdout and stderr received
+            exit_code: Remote exit status, -1 if the command never ran
+            retries: Extra attempts made (reconnects, fallbacks)
+            path: How the command ran: shell, exec, sudo_shell, sftp, stream, subprocess...
+            template: Explicit grouping key, e.g. for batches whose script would normalise badly
+        """
+        key = template or normalize_command(command)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = CommandStats()
+            stats.wall_ms.observe(wall_s * 1000)
+            if channel_open_s is not None:
+                stats.channel_open_ms.observe(channel_open_s * 1000)
+            stats.bytes_out += bytes_out
+            stats.bytes_in += bytes_in
+            stats.retries += retries
+            stats.exit_codes[exit_code] += 1
+            stats.paths[path] += 1
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """All templates, slowest in total first, plus overall totals. reset clears them atomically."""
+        with self._lock:
+            commands = {key: stats.to_dict() for key, stats in self._stats.items()}
+            if reset:
+                self._stats.clear()
+
+        ordered = dict(sorted(commands.items(), key=lambda item: item[1]['wall_ms']['sum'], reverse=True))
+        return {
+            'totals': {
+                'templates': len(ordered),
+                'calls': sum(c['calls'] for c in ordered.values()),
+                'wall_ms': round(sum(c['wall_ms']['sum'] for c in ordered.values()), 3),
+                'bytes_out': sum(c['bytes_out'] for c in ordered.values()),
+                'bytes_in': sum(c['bytes_in'] for c in ordered.values()),
+                'retries': sum(c['retries'] for c in ordered.values())
+            },
+            'buckets_ms': list(LATENCY_BUCKETS_MS),
+            'commands': ordered
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+# Global metrics instance shared by every SSH path
+_ssh_metrics = SSHMetrics()
+
+def get_ssh_metrics() -> SSHMetrics:
+    """Get the global SSH metrics registry."""
+    return _ssh_metrics
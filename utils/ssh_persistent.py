@@ -2,12 +2,27 @@
 Persistent SSH connection manager using paramiko for better performance and reliability.
 """
 import paramiko
+import codecs
+import fnmatch
 import logging
 import os
+import posixpath
+import select
+import shlex
+import socket
 import time
 import threading
-from typing import Optional, Tuple
+import uuid
+from collections import deque
+from concurrent.futures import CancelledError, Future, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
+from .cancellation import (bind_scope, cancel_callback, cancel_reason, clamp_timeout, current_scope,
+                           is_cancelled, wait_result)
+from .command_priority import (BACKGROUND, DIAGNOSTICS, INTERACTIVE, PRIORITIES, PRIORITY_NAMES,
+                               command_priority, current_priority)
+from .ssh_metrics import CommandTrace, get_ssh_metrics, normalize_command
+from paramiko.sftp import CMD_CLOSE, CMD_DATA, CMD_HANDLE, CMD_OPEN, CMD_READ, SFTP_FLAG_READ, int64
 
 # Configure logging
 logging.basicConfig(
@@ -19,6 +34,670 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+class ChannelPool:
+    """
+    Bounded pool of in-flight exec channels on a single SSH transport.
+
+    Commands are queued by priority class (see utils/command_priority.py) and
+    the highest class with an eligible command is served first. Each class has
+    its own concurrency limit, and diagnostics and background work together
+    never take the last channel, so an interactive command only ever waits for
+    other interactive ones. Within a class, commands are queued per owner (the
+    submitting thread by default) and dispatched round-robin, so one caller
+    issuing a burst of slow probes cannot starve the others. Each call runs
+    under the cancel scope and priority it was submitted with.
+    """
+
+    def __init__(self, execute, max_channels: int = 4, class_limits: Optional[Dict[int, int]] = None):
+        self._execute = execute
+        self.max_channels = max(1, max_channels)
+        # Channels diagnostics and background work may hold together; the rest stay free for interactive
+        self.shared_channels = max(1, self.max_channels - 1)
+        self.class_limits = {INTERACTIVE: self.max_channels, DIAGNOSTICS: self.shared_channels, BACKGROUND: 1}
+        self.class_limits.update(class_limits or {})
+        self._queues = {priority: {} for priority in PRIORITIES}       # owner -> deque of pending jobs
+        self._order = {priority: deque() for priority in PRIORITIES}   # owners with pending jobs, round-robin
+        self._running = {priority: 0 for priority in PRIORITIES}
+        self._cond = threading.Condition()
+        self._workers = []
+        self._worker_idents = set()
+
+    def submit(self, *args, owner=None, priority=None, **kwargs) -> Future:
+        """Queue a call to the execute function and return a Future for its result."""
+        return self.submit_call(self._execute, *args, owner=owner, priority=priority, **kwargs)
+
+    def submit_call(self, fn, *args, owner=None, priority=None, **kwargs) -> Future:
+        """
+        Queue an arbitrary call that needs a channel slot and return a Future for its result.
+        priority defaults to the submitting thread's (current_priority()).
+        """
+        future = Future()
+
+        # A worker submitting more work would deadlock a saturated pool - run inline
+        if threading.get_ident() in self._worker_idents:
+            self._run(future, fn, args, kwargs)
+            return future
+
+        if owner is None:
+            owner = threading.get_ident()
+        if priority is None:
+            priority = current_priority()
+
+        with self._cond:
+            self._ensure_workers()
+            queues = self._queues[priority]
+            queue = queues.get(owner)
+            if queue is None:
+                queue = queues[owner] = deque()
+                self._order[priority].append(owner)
+            queue.append((future, fn, args, kwargs, current_scope()))
+            self._cond.notify_all()
+        return future
+
+    def pending(self) -> int:
+        """Number of queued commands not yet running."""
+        with self._cond:
+            return sum(len(queue) for queues in self._queues.values() for queue in queues.values())
+
+    def stats(self) -> Dict[str, dict]:
+        """Queued and running commands per priority class."""
+        with self._cond:
+            return {
+                PRIORITY_NAMES[priority]: {
+                    'pending': sum(len(queue) for queue in self._queues[priority].values()),
+                    'running': self._running[priority],
+                    'limit': self.class_limits[priority]
+                }
+                for priority in PRIORITIES
+            }
+
+    def _ensure_workers(self):
+        # Called with self._cond held; workers are started lazily on first use
+        while len(self._workers) < self.max_channels:
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"ssh-channel-{len(self._workers)}",
+                daemon=True
+            )
+            self._workers.append(worker)
+            worker.start()
+
+    def _can_start(self, priority: int) -> bool:
+        # Called with self._cond held
+        if self._running[priority] >= self.class_limits[priority]:
+            return False
+        if priority == INTERACTIVE:
+            return True
+        shared = sum(self._running[p] for p in PRIORITIES if p != INTERACTIVE)
+        return shared < self.shared_channels
+
+    def _next_job(self):
+        # Called with self._cond held; returns (priority, job) or None if nothing may start
+        for priority in PRIORITIES:
+            order = self._order[priority]
+            if not order or not self._can_start(priority):
+                continue
+            owner = order.popleft()
+            queue = self._queues[priority][owner]
+            job = queue.popleft()
+            if queue:
+                order.append(owner)
+            else:
+                del self._queues[priority][owner]
+            self._running[priority] += 1
+            return priority, job
+        return None
+
+    def _worker_loop(self):
+        self._worker_idents.add(threading.get_ident())
+        while True:
+            with self._cond:
+                next_job = self._next_job()
+                while next_job is None:
+                    self._cond.wait()
+                    next_job = self._next_job()
+            priority, (future, fn, args, kwargs, scope) = next_job
+            try:
+                with bind_scope(scope), command_priority(priority):
+                    self._run(future, fn, args, kwargs)
+            finally:
+                with self._cond:
+                    self._running[priority] -= 1
+                    # A class at its limit may now have room
+                    self._cond.notify_all()
+
+    def _run(self, future, fn, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+class ShellDesyncError(Exception):
+    """Raised when a shell session loses track of its command framing."""
+
+class ShellTimeout(ShellDesyncError):
+    """Raised when a framed command does not complete within its timeout."""
+
+class ShellSession:
+    """
+    Long-lived remote bash process that runs commands framed by unique sentinels.
+
+    Each command runs in a subshell via eval, so `cd`, `exit` or a syntax error
+    cannot break the session. After it finishes, an end marker carrying the exit
+    status is printed on stdout and a matching marker on stderr, letting both
+    streams be split per command without closing the channel.
+    """
+
+    def __init__(self, transport, timeout: int = 10, shell_command: str = "exec bash --noprofile --norc"):
+        self.channel = transport.open_session(timeout=timeout)
+        self.channel.exec_command(shell_command)
+        self.alive = True
+        self._stdout = bytearray()
+        self._stderr = bytearray()
+
+    def run(self, command: str, timeout: int) -> Tuple[int, bytes, bytes]:
+        """
+        Run a command in the session and return (exit_status, stdout, stderr) as raw bytes.
+        Raises ShellDesyncError if the session can no longer be trusted.
+        """
+        if not self.alive:
+            raise ShellDesyncError("Shell session is closed")
+
+        marker = f"__V3_END_{uuid.uuid4().hex}__"
+        framed = (
+            f"( eval {shlex.quote(command)} ) </dev/null; "
+            f"printf '\\n{marker} %d\\n' $?; "
+            f"printf '\\n{marker}\\n' >&2\n"
+        )
+
+        try:
+            self.channel.sendall(framed.encode('utf-8'))
+            return self._read_frame(marker.encode(), timeout)
+        except ShellDesyncError:
+            self.close()
+            raise
+        except Exception as e:
+            self.close()
+            raise ShellDesyncError(str(e))
+
+    def _read_frame(self, marker: bytes, timeout: int) -> Tuple[int, bytes, bytes]:
+        out_marker = b"\n" + marker + b" "
+        err_marker = b"\n" + marker + b"\n"
+        deadline = time.monotonic() + timeout
+        stdout_frame = stderr_frame = None
+        exit_status = None
+
+        while stdout_frame is None or stderr_frame is None:
+            if self.channel.recv_ready():
+                self._stdout.extend(self.channel.recv(65536))
+            if self.channel.recv_stderr_ready():
+                self._stderr.extend(self.channel.recv_stderr(65536))
+
+            if stdout_frame is None:
+                idx = self._stdout.find(out_marker)
+                end = self._stdout.find(b"\n", idx + len(out_marker)) if idx != -1 else -1
+                if end != -1:
+                    try:
+                        exit_status = int(self._stdout[idx + len(out_marker):end])
+                    except ValueError:
+                        raise ShellDesyncError("Malformed end marker")
+                    stdout_frame = bytes(self._stdout[:idx])
+                    del self._stdout[:end + 1]
+
+            if stderr_frame is None:
+                idx = self._stderr.find(err_marker)
+                if idx != -1:
+                    stderr_frame = bytes(self._stderr[:idx])
+                    del self._stderr[:idx + len(err_marker)]
+
+            if stdout_frame is not None and stderr_frame is not None:
+                break
+
+            if self.channel.closed or self.channel.exit_status_ready():
+                raise ShellDesyncError("Remote shell exited")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ShellTimeout(f"Command timed out after {round(timeout, 1):g} seconds")
+            if not (self.channel.recv_ready() or self.channel.recv_stderr_ready()):
+                select.select([self.channel], [], [], min(remaining, 0.5))
+
+        if self._stdout or self._stderr:
+            # Output after the end marker belongs to no command (e.g. a stray background job)
+            logger.warning("⚠️ Discarding unframed shell output")
+            self._stdout.clear()
+            self._stderr.clear()
+
+        return exit_status, stdout_frame, stderr_frame
+
+    def close(self):
+        self.alive = False
+        try:
+            self.channel.close()
+        except:
+            pass
+
+class RootShellSession(ShellSession):
+    """
+    ShellSession running as root. sudo authenticates once when the session opens,
+    then every privileged command is multiplexed onto the same bash process.
+    """
+
+    # The password line is always consumed by `read` and handed to `sudo -v`, which
+    # ignores it when no password is needed, so it never reaches a shell as a command.
+    # The root shell then runs with -n on the credentials just cached for this session
+    # (not exec'd, so sudo sees the same parent as `sudo -v`).
+    SHELL_COMMAND = ("IFS= read -r p; printf '%s\\n' \"$p\" | sudo -S -p '' -v; status=$?; unset p; "
+                     "[ $status -eq 0 ] && sudo -n bash --noprofile --norc")
+
+    def __init__(self, transport, password: str, timeout: int = 10):
+        super().__init__(transport, timeout=timeout, shell_command=self.SHELL_COMMAND)
+        self.channel.sendall(f"{password}\n".encode('utf-8'))
+
+        exit_status, stdout, _ = self.run("id -u", timeout)
+        if exit_status != 0 or stdout.split()[-1:] != [b"0"]:
+            self.close()
+            raise ShellDesyncError("sudo did not grant a root shell")
+
+class HostKeyManager(paramiko.MissingHostKeyPolicy):
+    """
+    In-process host key store keyed by device identity ("host" or "[host]:port").
+
+    Keys are learned on first connect and kept across reconnects, so a flaky
+    USB link no longer pays for rewriting ~/.ssh/known_hosts on every reconnect.
+    Keys are only dropped on an explicit device switch (forget), or when a
+    changed key shows that a different unit is now behind the same address.
+    """
+
+    def __init__(self):
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_name(host: str, port: int) -> str:
+        """Name paramiko uses when looking up the key for host:port."""
+        return host if port == 22 else f"[{host}]:{port}"
+
+    def prepare(self, client: paramiko.SSHClient, host: str, port: int):
+        """Install this policy on a client and preload the remembered key for the device."""
+        client.set_missing_host_key_policy(self)
+        name = self.key_name(host, port)
+        with self._lock:
+            key = self._keys.get(name)
+        if key is not None:
+            client.get_host_keys().add(name, key.get_name(), key)
+
+    def missing_host_key(self, client, hostname, key):
+        with self._lock:
+            self._keys[hostname] = key
+        logger.info(f"🔑 Learned {key.get_name()} host key for {hostname}")
+
+    def forget(self, host: Optional[str] = None, port: int = 22):
+        """Drop the remembered key for one device, or for all devices."""
+        with self._lock:
+            if host is None:
+                self._keys.clear()
+            else:
+                self._keys.pop(self.key_name(host, port), None)
+
+class CircuitBreaker:
+    """
+    Fast-fail guard around connection attempts.
+
+    closed    - connection attempts go ahead normally
+    open      - every caller fails immediately while a single background probe
+                checks, with exponential backoff, whether the device is back
+    half_open - the probe reached the device; the next connection attempt is
+                the trial that closes the breaker again (or re-opens it)
+
+    It opens after failure_threshold consecutive failed connection attempts
+    (SSH_BREAKER_THRESHOLD), so a single dropped handshake is simply retried.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, probe, failure_threshold: int = 3, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = self.CLOSED
+        self.failures = 0
+        self.delay = base_delay
+        self._trial_in_progress = False
+        self._probe_thread = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a connection attempt may proceed. Never blocks."""
+        if self.state == self.CLOSED:
+            return True
+        with self._lock:
+            if self.state == self.HALF_OPEN and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return True
+            return self.state == self.CLOSED
+
+    def reset(self):
+        """Forget past failures so the next connection attempt goes ahead (manual reset)."""
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.delay = self.base_delay
+            self._trial_in_progress = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("🟢 Circuit closed - device reachable again")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.delay = self.base_delay
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_progress = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"🔴 Circuit open - failing fast, probing device every {self.delay:.0f}s+")
+                self.state = self.OPEN
+                if not (self._probe_thread and self._probe_thread.is_alive()):
+                    self._probe_thread = threading.Thread(target=self._probe_loop, name="ssh-breaker-probe", daemon=True)
+                    self._probe_thread.start()
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(self.delay)
+            with self._lock:
+                if self.state != self.OPEN:
+                    return
+            try:
+                reachable = self.probe()
+            except Exception:
+                reachable = False
+            with self._lock:
+                if reachable:
+                    self.state = self.HALF_OPEN
+                    logger.info("🟡 Circuit half-open - device answered the probe")
+                    return
+                self.delay = min(self.delay * 2, self.max_delay)
+
+class LivenessMonitor:
+    """
+    Background thread that maintains the device connection state.
+
+    A link is considered alive while the transport is active and a command
+    succeeded recently. Only when the link has been idle is it confirmed by
+    running the shell builtin `:` as background work on the channel pool - one
+    round trip through the shell session, with no extra channel, subject to the
+    pool's limits and the circuit breaker. When disconnected it reconnects in the background, so endpoints polling
+    the state never block on the device.
+    """
+
+    def __init__(self, conn, interval: float = 5, idle_threshold: float = 10):
+        self.conn = conn
+        self.interval = interval
+        self.idle_threshold = idle_threshold
+        self.connected = False
+        self.message = "Connection not checked yet"
+        self.updated_at = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name="ssh-liveness", daemon=True)
+            self._thread.start()
+        logger.info(f"💓 Liveness monitor started (every {self.interval}s)")
+
+    def snapshot(self) -> Tuple[bool, str, Optional[float]]:
+        """Return (connected, message, age_in_seconds) without touching the device."""
+        if self.updated_at is None:
+            return False, self.message, None
+        connected, message = self.connected, self.message
+        if connected and not self.conn.transport_active():
+            connected, message = False, "Connection lost"
+        return connected, message, time.monotonic() - self.updated_at
+
+    def _set(self, connected: bool, message: str):
+        if connected != self.connected:
+            logger.info(f"💓 Device {'connected' if connected else 'disconnected'}: {message}")
+        self.connected, self.message = connected, message
+        self.updated_at = time.monotonic()
+
+    def _loop(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"❌ Liveness check failed: {e}")
+            time.sleep(self.interval)
+
+    def check(self):
+        """Refresh the state, probing the device only if the link has been idle."""
+        conn = self.conn
+        if conn.connected and conn.transport_active():
+            last_activity = conn.last_activity or 0
+            if time.time() - last_activity < self.idle_threshold:
+                self._set(True, "Connection active")
+                return
+            with command_priority(BACKGROUND):
+                future = conn.submit(":", timeout=conn.connection_timeout)
+            try:
+                success, output = future.result(timeout=conn.connection_timeout + self.interval)
+            except FutureTimeout:
+                # Still queued behind other work, which will show whether the link is up
+                future.cancel()
+                return
+            except Exception as e:
+                success, output = False, str(e)
+            if success:
+                conn.last_activity = time.time()
+                self._set(True, "Connection active")
+            else:
+                conn.connected = False
+                self._set(False, f"Connection lost: {output}")
+        elif conn.connect():
+            self._set(True, "Connection established")
+        else:
+            self._set(False, conn.connect_error())
+
+class CommandStream:
+    """
+    Iterates over decoded output chunks of a running command as they arrive.
+
+    stdout and stderr are interleaved in arrival order. Reading stops and the
+    channel is closed once max_bytes of output have been received, so a runaway
+    command cannot grow server memory. After iteration, exit_status holds the
+    exit code (None if the stream was cut short) and truncated/timed_out tell why.
+    """
+
+    def __init__(self, channel=None, timeout: int = 60, max_bytes: Optional[int] = None,
+                 chunk_size: int = 4096, error: Optional[str] = None,
+                 on_finish: Optional[Callable[['CommandStream'], None]] = None):
+        self.channel = channel
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.error = error
+        self.bytes_read = 0
+        self.exit_status = None
+        self.truncated = False
+        self.timed_out = False
+        self.on_finish = on_finish
+
+    def __iter__(self) -> Iterator[str]:
+        if self.channel is None:
+            self.exit_status = -1
+            try:
+                yield f"Error: {self.error}"
+            finally:
+                self._finish()
+            return
+
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        deadline = time.monotonic() + self.timeout
+        try:
+            while True:
+                if self.channel.recv_ready():
+                    data = self.channel.recv(self.chunk_size)
+                elif self.channel.recv_stderr_ready():
+                    data = self.channel.recv_stderr(self.chunk_size)
+                elif self.channel.exit_status_ready() or self.channel.closed:
+                    break
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out = True
+                        break
+                    select.select([self.channel], [], [], min(remaining, 0.5))
+                    continue
+
+                if self.max_bytes is not None and self.bytes_read + len(data) >= self.max_bytes:
+                    data = data[:self.max_bytes - self.bytes_read]
+                    self.truncated = True
+                self.bytes_read += len(data)
+
+                text = decoder.decode(data)
+                if text:
+                    yield text
+                if self.truncated:
+                    break
+
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield text
+
+            if not (self.truncated or self.timed_out):
+                self.exit_status = self.channel.recv_exit_status()
+        finally:
+            self.close()
+
+    def _finish(self):
+        on_finish, self.on_finish = self.on_finish, None
+        if on_finish:
+            on_finish(self)
+
+    def close(self):
+        """Close the channel; call this when abandoning a stream without iterating it to the end."""
+        if self.channel is not None:
+            try:
+                self.channel.close()
+            except:
+                pass
+        self._finish()
+
+class SFTPBulkReader:
+    """
+    Reads many small remote files (sysfs, procfs) over one SFTP session.
+
+    Requests are pipelined: every OPEN goes out back to back, then every READ,
+    and the CLOSEs are sent without waiting, so fetching N files costs two round
+    trips instead of 3N. paramiko only exposes this async request machinery
+    privately (it is what SFTPFile.prefetch is built on), so it is driven
+    directly here. requirements.txt pins paramiko to releases covered by
+    tests/test_sftp_bulk_reader.py. Glob expansions are remembered in
+    glob_cache for a while, since sysfs directory layouts rarely change while
+    a device is connected.
+    """
+
+    CHUNK_SIZE = 32768
+    GLOB_CACHE_TTL = 30
+
+    def __init__(self, sftp: paramiko.SFTPClient, max_bytes: int = 65536, glob_cache: Optional[dict] = None):
+        self.sftp = sftp
+        self.max_bytes = max_bytes
+        self.glob_cache = glob_cache if glob_cache is not None else {}
+        self._responses = {}
+
+    def read(self, patterns: Iterable[str]) -> Dict[str, bytes]:
+        """Expand the glob patterns and return {path: contents} for every readable file."""
+        paths = []
+        for pattern in patterns:
+            for path in self.expand(pattern):
+                if path not in paths:
+                    paths.append(path)
+        if not paths:
+            return {}
+
+        handles = {}
+        opened = self._collect([self._send(CMD_OPEN, path, SFTP_FLAG_READ, paramiko.SFTPAttributes()) for path in paths])
+        for path, (t, msg) in zip(paths, opened):
+            if t == CMD_HANDLE:
+                handles[path] = msg.get_binary()
+
+        # Kernel files fill a read up to the requested size, so a short read
+        # means EOF; only files larger than a chunk need another round
+        data = {path: bytearray() for path in handles}
+        pending = list(handles)
+        while pending:
+            nums = [self._send(CMD_READ, handles[path], int64(len(data[path])), self.CHUNK_SIZE) for path in pending]
+            next_round = []
+            for path, (t, msg) in zip(pending, self._collect(nums)):
+                if t != CMD_DATA:
+                    continue  # EOF or read error
+                chunk = msg.get_string()
+                data[path].extend(chunk)
+                if len(chunk) == self.CHUNK_SIZE and len(data[path]) < self.max_bytes:
+                    next_round.append(path)
+            pending = next_round
+
+        # Nobody waits for the close replies; SFTPClient drops them once this reader is gone
+        for handle in handles.values():
+            self.sftp._async_request(type(None), CMD_CLOSE, handle)
+
+        return {path: bytes(data[path][:self.max_bytes]) for path in handles}
+
+    def expand(self, pattern: str) -> List[str]:
+        """Shell-style glob expansion (no dotfiles unless asked for) using directory listings."""
+        if not any(c in pattern for c in '*?['):
+            return [pattern]
+
+        cached = self.glob_cache.get(pattern)
+        if cached and time.monotonic() - cached[0] < self.GLOB_CACHE_TTL:
+            return cached[1]
+
+        paths = ['/' if pattern.startswith('/') else '.']
+        for part in [p for p in pattern.split('/') if p]:
+            if not any(c in part for c in '*?['):
+                paths = [posixpath.join(base, part) for base in paths]
+                continue
+
+            matched = []
+            for base in paths:
+                try:
+                    names = sorted(self.sftp.listdir(base))
+                except IOError:
+                    continue
+                matched.extend(
+                    posixpath.join(base, name) for name in names
+                    if fnmatch.fnmatchcase(name, part) and (part.startswith('.') or not name.startswith('.'))
+                )
+            paths = matched
+
+        self.glob_cache[pattern] = (time.monotonic(), paths)
+        return paths
+
+    def _send(self, t: int, *args) -> int:
+        return self.sftp._async_request(self, t, *args)
+
+    def _async_response(self, t, msg, num):
+        # Called by SFTPClient._read_response for requests sent with self as the file object
+        self._responses[num] = (t, msg)
+
+    def _collect(self, nums: List[int]) -> list:
+        while any(num not in self._responses for num in nums):
+            self.sftp._read_response()
+        return [self._responses.pop(num) for num in nums]
+
 class PersistentSSHConnection:
     """Manages a persistent SSH connection with automatic reconnection."""
     
@@ -39,12 +718,45 @@ class PersistentSSHConnection:
         self.keepalive_interval = 15  # Send keepalive every 15 seconds
         self.max_retries = 3         # Maximum reconnection attempts
         self.retry_delay = 2         # Delay between reconnection attempts
+        # Channel budget - keep the total under sshd's MaxSessions (10 by default):
+        # SSH_MAX_CHANNELS pooled commands + SSH_STREAM_CHANNELS streams + the shell
+        # session, root shell and SFTP session (one each); 4 + 2 + 3 = 9 by default
+        self.max_channels = int(os.getenv("SSH_MAX_CHANNELS", "4"))  # Concurrent pooled command channels
+        self.max_stream_channels = int(os.getenv("SSH_STREAM_CHANNELS", "2"))  # Concurrent streamed commands
+        self.use_shell_session = os.getenv("SSH_SHELL_SESSION", "1") != "0"  # Reuse one remote bash for commands
+
+        self._shell = None
+        self._shell_lock = threading.Lock()
+        self._root_shell = None
+        self._root_shell_lock = threading.Lock()
+        self._root_shell_failed = False  # sudo refused once on this connection - don't retry until reconnect
+        self._sftp = None
+        self._sftp_lock = threading.Lock()
+        self._sftp_globs = {}            # Glob expansions for the current SFTP session
+        self._sftp_unavailable = False   # Device has no SFTP subsystem - use the shell until reconnect
+        self._stream_slots = threading.BoundedSemaphore(max(1, self.max_stream_channels))
+        self.host_keys = HostKeyManager()
+        self.liveness = LivenessMonitor(self, interval=float(os.getenv("SSH_LIVENESS_INTERVAL", "5")))
+        self.breaker = CircuitBreaker(
+            self._probe_port,
+            failure_threshold=int(os.getenv("SSH_BREAKER_THRESHOLD", "3")),
+            max_delay=float(os.getenv("SSH_BREAKER_MAX_DELAY", "30"))
+        )
+
+        # All commands are scheduled through the pool so concurrent callers share the transport fairly
+        self.pool = ChannelPool(self._execute, max_channels=self.max_channels, class_limits={
+            DIAGNOSTICS: int(os.getenv("SSH_DIAGNOSTIC_CHANNELS", max(1, self.max_channels - 1))),
+            BACKGROUND: int(os.getenv("SSH_BACKGROUND_CHANNELS", "1"))
+        })
         
         # Don't connect immediately - wait until first use
         logger.info("SSH connection manager initialized (not connected yet)")
         
     def connect(self) -> bool:
-        """Establish SSH connection."""
+        """Establish SSH connection. Fails immediately while the circuit breaker is open."""
+        if not (self.connected and self.client) and not self.breaker.allow():
+            return False
+
         with self.lock:
             if self.connected and self.client:
                 # Test if connection is still alive
@@ -61,21 +773,16 @@ class PersistentSSHConnection:
             try:
                 logger.info(f"🔗 Connecting to {self.ssh_user}@{self.ssh_host}:{self.ssh_port}")
                 
-                self.client = paramiko.SSHClient()
-                self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-                
-                # Connect with timeout and better settings
-                self.client.connect(
-                    hostname=self.ssh_host,
-                    port=self.ssh_port,
-                    username=self.ssh_user,
-                    password=self.ssh_password,
-                    timeout=self.connection_timeout,
-                    allow_agent=False,
-                    look_for_keys=False,
-                    banner_timeout=10,
-                    auth_timeout=10
-                )
+                try:
+                    self._open_client()
+                except paramiko.BadHostKeyException:
+                    # A different unit now answers on the same address - treat it as a device switch
+                    logger.warning(f"⚠️ Host key for {self.ssh_host} changed - assuming a new device")
+                    self.client.close()
+                    self.host_keys.forget(self.ssh_host, self.ssh_port)
+                    from .command_cache import get_command_cache
+                    get_command_cache().invalidate()
+                    self._open_client()
                 
                 # Set keepalive and other transport settings
                 transport = self.client.get_transport()
@@ -87,24 +794,62 @@ class PersistentSSHConnection:
                 
                 self.connected = True
                 self.last_activity = time.time()
+                self._root_shell_failed = False
+                self._sftp_unavailable = False
+                self.breaker.record_success()
                 logger.info("✅ SSH connection established successfully")
                 return True
                 
             except paramiko.AuthenticationException:
+                # The device is there - don't trip the breaker over credentials
                 logger.error("❌ SSH authentication failed")
                 self.connected = False
+                self.breaker.record_success()
                 return False
             except paramiko.SSHException as e:
                 logger.error(f"❌ SSH connection error: {e}")
                 self.connected = False
+                self.breaker.record_failure()
                 return False
             except Exception as e:
                 logger.error(f"❌ Unexpected error during connection: {e}")
                 self.connected = False
+                self.breaker.record_failure()
                 return False
+
+    def _probe_port(self) -> bool:
+        """Cheap reachability probe for the circuit breaker: TCP connect to the SSH port."""
+        with socket.create_connection((self.ssh_host, self.ssh_port), timeout=self.connection_timeout):
+            return True
+
+    def connect_error(self) -> str:
+        """Reason to report when connect() returned False."""
+        if self.breaker.state != CircuitBreaker.CLOSED:
+            return "Device not reachable (waiting for it to come back)"
+        return "Failed to establish SSH connection"
+
+    def _open_client(self):
+        """Create a client and connect it, verifying against the remembered host key."""
+        self.client = paramiko.SSHClient()
+        self.host_keys.prepare(self.client, self.ssh_host, self.ssh_port)
+        
+        # Connect with timeout and better settings
+        self.client.connect(
+            hostname=self.ssh_host,
+            port=self.ssh_port,
+            username=self.ssh_user,
+            password=self.ssh_password,
+            timeout=self.connection_timeout,
+            allow_agent=False,
+            look_for_keys=False,
+            banner_timeout=10,
+            auth_timeout=10
+        )
     
     def disconnect(self, silent=False):
-        """Close SSH connection and clear host keys for clean reconnection."""
+        """Close SSH connection. Host keys are kept; use forget_host_keys when switching devices."""
+        self._close_shell()
+        self._close_sftp()
         if self.client:
             try:
                 self.client.close()
@@ -113,7 +858,14 @@ class PersistentSSHConnection:
             self.client = None
         self.connected = False
         
-        # Clear SSH host keys to avoid conflicts when switching devices
+        if not silent:
+            logger.info("🔌 SSH connection closed")
+
+    def forget_host_keys(self, silent=False):
+        """Clear remembered and known_hosts keys for the device, e.g. before switching units."""
+        self.host_keys.forget(self.ssh_host, self.ssh_port)
+
+        # The subprocess SSH paths (fallback, terminals) still rely on ~/.ssh/known_hosts
         try:
             import subprocess
             subprocess.run(
@@ -127,10 +879,28 @@ class PersistentSSHConnection:
         except Exception as e:
             if not silent:
                 logger.warning(f"⚠️ Could not clear host keys: {e}")
-        
-        if not silent:
-            logger.info("🔌 SSH connection closed")
     
+    def submit(self, command: str, timeout: Optional[int] = None, wait_for_exit: bool = True, owner=None) -> Future:
+        """
+        Queue a command on the channel pool without waiting for it.
+        Returns a Future resolving to the (success, output) tuple of execute_command.
+
+        Args:
+            command: Command to execute
+            timeout: Command timeout in seconds
+            wait_for_exit: Whether to wait for command exit status (set False for pkill commands)
+            owner: Fairness key - commands from the same owner are served round-robin with other owners
+        """
+        return self.pool.submit(command, timeout=timeout, wait_for_exit=wait_for_exit, owner=owner)
+
+    @staticmethod
+    def _wait(future: Future, cancelled: Callable[[str], object]):
+        """Result of a pool call, or cancelled(reason) if the caller's cancel scope ended first."""
+        try:
+            return wait_result(future)
+        except (CancelledError, FutureTimeout):
+            return cancelled(cancel_reason())
+
     def execute_command(self, command: str, timeout: Optional[int] = None, wait_for_exit: bool = True) -> Tuple[bool, str]:
         """
         Execute command over persistent SSH connection.
@@ -141,51 +911,190 @@ class PersistentSSHConnection:
             timeout: Command timeout in seconds
             wait_for_exit: Whether to wait for command exit status (set False for pkill commands)
         """
+        return self._wait(self.submit(command, timeout=timeout, wait_for_exit=wait_for_exit),
+                          lambda reason: (False, reason))
+
+    def execute_command_raw(self, command: str, timeout: Optional[int] = None,
+                            template: Optional[str] = None) -> Tuple[int, bytes, bytes]:
+        """
+        Execute command and return (exit_status, stdout, stderr) with the output left as raw bytes.
+        exit_status is -1 when the command could not be run; the reason is then in stderr.
+        template overrides the metrics grouping key (e.g. for generated batch scripts).
+        """
+        return self._wait(self.pool.submit_call(self._execute_raw, command, timeout=timeout, template=template),
+                          lambda reason: (-1, b"", reason.encode()))
+
+    def execute_command_stream(self, command: str, timeout: Optional[int] = None,
+                               max_bytes: Optional[int] = None) -> CommandStream:
+        """
+        Execute command on its own channel and return a CommandStream that yields
+        decoded output chunks as they arrive instead of buffering the whole output.
+        At most SSH_STREAM_CHANNELS streams hold a channel at once; the slot is
+        released when the stream is exhausted or closed.
+
+        Args:
+            command: Command to execute
+            timeout: Overall time limit for reading the output, in seconds
+            max_bytes: Stop reading (and close the channel) after this many bytes
+        """
+        if timeout is None:
+            timeout = self.command_timeout
+
+        started = time.monotonic()
+        trace = CommandTrace("stream")
+
+        def record(stream: CommandStream):
+            get_ssh_metrics().record(
+                command, time.monotonic() - started, channel_open_s=trace.channel_open_s,
+                bytes_out=len(command.encode('utf-8')), bytes_in=stream.bytes_read,
+                exit_code=stream.exit_status, path=trace.path
+            )
+
+        if not self.connect():
+            return CommandStream(error=self.connect_error(), on_finish=record)
+
+        # Streams run outside the channel pool, so they are bounded here instead
+        if not self._stream_slots.acquire(timeout=clamp_timeout(timeout)):
+            logger.warning(f"⚠️ All {self.max_stream_channels} stream channels busy, not running: {command}")
+            return CommandStream(error="Too many commands streaming, try again shortly", on_finish=record)
+
+        def release(stream: CommandStream):
+            self._stream_slots.release()
+            record(stream)
+
+        try:
+            logger.info(f"▶️ Executing (stream): {command}")
+            channel = self._open_channel(trace)
+            channel.exec_command(command)
+            self.last_activity = time.time()
+            return CommandStream(channel, timeout=timeout, max_bytes=max_bytes, on_finish=release)
+        except paramiko.SSHException as e:
+            logger.error(f"❌ SSH command error: {e}")
+            self.connected = False  # Mark as disconnected for reconnection
+            return CommandStream(error=f"SSH error: {str(e)}", on_finish=release)
+        except Exception as e:
+            logger.error(f"❌ Unexpected error: {e}")
+            return CommandStream(error=f"Error: {str(e)}", on_finish=release)
+
+    def _execute(self, command: str, timeout: Optional[int] = None, wait_for_exit: bool = True) -> Tuple[bool, str]:
+        """Run a command and decode its output. Called from channel pool workers."""
         if timeout is None:
             timeout = self.command_timeout
+        timeout = clamp_timeout(timeout)
+
+        if not wait_for_exit:
+            return self._execute_detached(command, timeout)
+
+        return self._decode_result(*self._execute_raw(command, timeout))
+
+    @staticmethod
+    def _decode_result(exit_status: int, stdout: bytes, stderr: bytes) -> Tuple[bool, str]:
+        output = stdout.decode('utf-8', errors='ignore').strip()
+        error = stderr.decode('utf-8', errors='ignore').strip()
+
+        if exit_status == 0:
+            logger.info(f"✅ Command completed successfully")
+            return True, output
+        elif exit_status == -1:
+            return False, error
+        else:
+            logger.warning(f"⚠️ Command failed with exit code {exit_status}")
+            return False, error if error else output
 
+    def _execute_raw(self, command: str, timeout: Optional[int] = None,
+                     template: Optional[str] = None) -> Tuple[int, bytes, bytes]:
+        """Run a command in the shell session, or on its own exec channel, returning raw output."""
+        if timeout is None:
+            timeout = self.command_timeout
+        timeout = clamp_timeout(timeout)
+
+        started = time.monotonic()
+        trace = CommandTrace()
+        exit_status, output, error = self._run_raw(command, timeout, trace)
+        get_ssh_metrics().record(
+            command, time.monotonic() - started, channel_open_s=trace.channel_open_s,
+            bytes_out=len(command.encode('utf-8')), bytes_in=len(output) + len(error),
+            exit_code=exit_status, retries=trace.retries, path=trace.path, template=template
+        )
+        return exit_status, output, error
+
+    def _run_raw(self, command: str, timeout: int, trace: CommandTrace) -> Tuple[int, bytes, bytes]:
         # Ensure we're connected
         if not self.connect():
-            return False, "Failed to establish SSH connection"
+            trace.path = "unavailable"
+            return -1, b"", self.connect_error().encode()
+
+        if is_cancelled():
+            return -1, b"", cancel_reason().encode()
 
+        if self.use_shell_session and not self._is_background_command(command):
+            result = self._execute_in_shell(command, timeout, trace)
+            if result is not None:
+                return result
+            if is_cancelled():
+                return -1, b"", cancel_reason().encode()
+
+        channel = None
         try:
             logger.info(f"▶️ Executing: {command}")
+            trace.path = "exec"
 
-            # Execute command
-            # Note: get_pty=False allows background processes (&) to persist after SSH session closes
-            stdin, stdout, stderr = self.client.exec_command(
-                command,
-                timeout=timeout,
-                get_pty=False
-            )
+            # Note: no pty, so background processes (&) persist after the channel closes
+            channel = self._open_channel(trace)
+            with cancel_callback(channel.close):
+                channel.settimeout(timeout)
+                channel.exec_command(command)
 
-            # Set channel timeout
-            stdout.channel.settimeout(timeout)
-            stderr.channel.settimeout(timeout)
+                # Read output
+                output = channel.makefile('rb').read()
+                error = channel.makefile_stderr('rb').read()
+                exit_status = channel.recv_exit_status()
+            if exit_status == -1 and is_cancelled():
+                return -1, output, error + cancel_reason().encode()
 
-            # Read output
-            output = stdout.read().decode('utf-8', errors='ignore').strip()
-            error = stderr.read().decode('utf-8', errors='ignore').strip()
+            self.last_activity = time.time()
+            return exit_status, output, error
 
-            # Get exit status (unless wait_for_exit is False for fire-and-forget commands)
-            if wait_for_exit:
-                exit_status = stdout.channel.recv_exit_status()
-            else:
-                # For fire-and-forget commands like pkill, don't wait - just close channel
-                stdout.channel.close()
-                exit_status = 0
-                logger.info(f"✅ Command sent (fire-and-forget)")
+        except socket.timeout:
+            # Don't leave the command holding a channel on the device
+            channel.close()
+            logger.error(f"❌ Command timed out after {round(timeout, 1):g} seconds")
+            return -1, b"", f"Command timed out after {round(timeout, 1):g} seconds".encode()
+        except paramiko.SSHException as e:
+            if is_cancelled():
+                # We closed the channel ourselves; the connection is fine
+                return -1, b"", cancel_reason().encode()
+            logger.error(f"❌ SSH command error: {e}")
+            self.connected = False  # Mark as disconnected for reconnection
+            return -1, b"", f"SSH error: {str(e)}".encode()
+        except Exception as e:
+            logger.error(f"❌ Unexpected error: {e}")
+            return -1, b"", f"Error: {str(e)}".encode()
+
+    def _execute_detached(self, command: str, timeout: int) -> Tuple[bool, str]:
+        """Send a fire-and-forget command (e.g. pkill) without waiting for its exit status."""
+        if not self.connect():
+            return False, self.connect_error()
+
+        started = time.monotonic()
+        trace = CommandTrace("detached")
+        try:
+            logger.info(f"▶️ Executing: {command}")
+            channel = self._open_channel(trace)
+            channel.settimeout(timeout)
+            channel.exec_command(command)
+            output = channel.makefile('rb').read()
 
+            # Don't wait for the exit status - just close the channel
+            channel.close()
             self.last_activity = time.time()
+            get_ssh_metrics().record(
+                command, time.monotonic() - started, channel_open_s=trace.channel_open_s,
+                bytes_out=len(command.encode('utf-8')), bytes_in=len(output), path=trace.path
+            )
+            logger.info(f"✅ Command sent (fire-and-forget)")
+            return True, output.decode('utf-8', errors='ignore').strip()
 
-            if exit_status == 0:
-                if wait_for_exit:
-                    logger.info(f"✅ Command completed successfully")
-                return True, output
-            else:
-                logger.warning(f"⚠️ Command failed with exit code {exit_status}")
-                return False, error if error else output
-                
         except paramiko.SSHException as e:
             logger.error(f"❌ SSH command error: {e}")
             self.connected = False  # Mark as disconnected for reconnection
@@ -194,8 +1103,233 @@ class PersistentSSHConnection:
             logger.error(f"❌ Unexpected error: {e}")
             return False, f"Error: {str(e)}"
     
+    def _open_channel(self, trace: CommandTrace) -> paramiko.Channel:
+        """Open a session channel, recording how long the open took."""
+        channel_started = time.monotonic()
+        channel = self.client.get_transport().open_session(timeout=self.connection_timeout)
+        trace.channel_open_s = time.monotonic() - channel_started
+        return channel
+
+    @staticmethod
+    def _is_background_command(command: str) -> bool:
+        """Commands that leave a job running must not share the long-lived shell's output pipes."""
+        stripped = command.rstrip()
+        return stripped.endswith('&') and not stripped.endswith('&&')
+
+    def _execute_in_shell(self, command: str, timeout: int, trace: CommandTrace) -> Optional[Tuple[int, bytes, bytes]]:
+        """
+        Run a command in the persistent shell session.
+        Returns None when the session is busy or desynced so the caller falls back to exec_command.
+        """
+        if not self._shell_lock.acquire(blocking=False):
+            return None  # Another command holds the session - use a dedicated channel instead
+
+        try:
+            trace.path = "shell"
+            channel_started = time.monotonic()
+            if self._shell is None or not self._shell.alive:
+                self._shell = ShellSession(self.client.get_transport(), timeout=self.connection_timeout)
+                logger.info("🐚 Persistent shell session started")
+            trace.channel_open_s = time.monotonic() - channel_started
+
+            logger.info(f"▶️ Executing (shell): {command}")
+            with cancel_callback(self._shell.close):
+                result = self._shell.run(command, timeout)
+        except ShellTimeout as e:
+            logger.error(f"❌ {e}")
+            self._shell = None
+            return -1, b"", str(e).encode()
+        except ShellDesyncError as e:
+            logger.warning(f"⚠️ Shell session desynced, falling back to exec channel: {e}")
+            self._shell = None
+            trace.retries += 1
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ Could not use shell session, falling back to exec channel: {e}")
+            self._close_shell()
+            trace.retries += 1
+            return None
+        finally:
+            self._shell_lock.release()
+
+        self.last_activity = time.time()
+        return result
+
+    def execute_sudo(self, command: str, password: str, timeout: Optional[int] = None) -> Optional[Tuple[bool, str]]:
+        """
+        Run a command in the persistent root shell.
+        Returns None when no root shell can be had, so the caller can fall back to sudo -S.
+        """
+        return self._wait(self.pool.submit_call(self._execute_sudo, command, password, timeout),
+                          lambda reason: (False, reason))
+
+    def execute_sudo_raw(self, command: str, password: str, timeout: Optional[int] = None,
+                         template: Optional[str] = None) -> Optional[Tuple[int, bytes, bytes]]:
+        """Like execute_sudo, but returns (exit_status, stdout, stderr) as raw bytes."""
+        return self._wait(self.pool.submit_call(self._execute_sudo_raw, command, password, timeout, template),
+                          lambda reason: (-1, b"", reason.encode()))
+
+    def _execute_sudo(self, command: str, password: str, timeout: Optional[int] = None) -> Optional[Tuple[bool, str]]:
+        result = self._execute_sudo_raw(command, password, timeout)
+        return self._decode_result(*result) if result is not None else None
+
+    def _execute_sudo_raw(self, command: str, password: str, timeout: Optional[int] = None,
+                          template: Optional[str] = None) -> Optional[Tuple[int, bytes, bytes]]:
+        if timeout is None:
+            timeout = self.command_timeout
+        timeout = clamp_timeout(timeout)
+
+        started = time.monotonic()
+        trace = CommandTrace("sudo_shell")
+        result = self._run_sudo(command, password, timeout, trace)
+        if result is not None:
+            exit_status, output, error = result
+            get_ssh_metrics().record(
+                command, time.monotonic() - started, channel_open_s=trace.channel_open_s,
+                bytes_out=len(command.encode('utf-8')), bytes_in=len(output) + len(error),
+                exit_code=exit_status, path=trace.path, template=template
+            )
+            self.last_activity = time.time()
+        return result
+
+    def _run_sudo(self, command: str, password: str, timeout: int, trace: CommandTrace) -> Optional[Tuple[int, bytes, bytes]]:
+        if is_cancelled():
+            return -1, b"", cancel_reason().encode()
+        if not self.connect():
+            return -1, b"", self.connect_error().encode()
+        if self._root_shell_failed:
+            return None
+
+        # Unlike the user shell there is no cheap alternative here, so wait for the session -
+        # unless this is an interactive command, which shouldn't queue behind a long scan
+        if current_priority() == INTERACTIVE:
+            if not self._root_shell_lock.acquire(blocking=False):
+                return None
+        elif not self._root_shell_lock.acquire(timeout=timeout):
+            return None
+
+        try:
+            channel_started = time.monotonic()
+            if self._root_shell is None or not self._root_shell.alive:
+                try:
+                    self._root_shell = RootShellSession(self.client.get_transport(), password, timeout=self.connection_timeout)
+                    logger.info("🔐 Persistent root shell started")
+                except Exception as e:
+                    if is_cancelled():
+                        return -1, b"", cancel_reason().encode()
+                    logger.warning(f"⚠️ Could not open root shell, falling back to sudo -S: {e}")
+                    self._root_shell = None
+                    self._root_shell_failed = True
+                    return None
+            trace.channel_open_s = time.monotonic() - channel_started
+
+            logger.info(f"▶️ Executing (sudo shell): {command}")
+            with cancel_callback(self._root_shell.close):
+                return self._root_shell.run(command, timeout)
+        except ShellTimeout as e:
+            logger.error(f"❌ {e}")
+            self._root_shell = None
+            return -1, b"", str(e).encode()
+        except ShellDesyncError as e:
+            self._root_shell = None
+            if is_cancelled():
+                return -1, b"", cancel_reason().encode()
+            logger.warning(f"⚠️ Root shell desynced, falling back to sudo -S: {e}")
+            return None
+        finally:
+            self._root_shell_lock.release()
+
+    def read_remote_files(self, patterns: Iterable[str], max_bytes: int = 65536) -> Optional[Dict[str, bytes]]:
+        """
+        Fetch many small files (glob patterns allowed) over one SFTP session.
+        Returns {path: bytes} for every readable match, or None when SFTP can't
+        be used so the caller can fall back to the shell.
+        """
+        return self._wait(self.pool.submit_call(self._read_remote_files, list(patterns), max_bytes),
+                          lambda reason: {})
+
+    def _read_remote_files(self, patterns: List[str], max_bytes: int) -> Optional[Dict[str, bytes]]:
+        started = time.monotonic()
+        trace = CommandTrace("sftp")
+        files = self._run_sftp_read(patterns, max_bytes, trace)
+        if files is not None:
+            get_ssh_metrics().record(
+                "", time.monotonic() - started, channel_open_s=trace.channel_open_s,
+                bytes_in=sum(len(data) for data in files.values()), exit_code=0, path=trace.path,
+                template="sftp: " + " ".join(normalize_command(p) for p in patterns)
+            )
+            self.last_activity = time.time()
+        return files
+
+    def _run_sftp_read(self, patterns: List[str], max_bytes: int, trace: CommandTrace) -> Optional[Dict[str, bytes]]:
+        if is_cancelled():
+            return {}
+        if not self.connect():
+            return None
+
+        with self._sftp_lock:
+            if self._sftp_unavailable:
+                return None
+
+            channel_started = time.monotonic()
+            if self._sftp is None:
+                try:
+                    self._sftp = self.client.open_sftp()
+                    logger.info("📂 SFTP session opened")
+                except Exception as e:
+                    logger.warning(f"⚠️ SFTP not available, reading files through the shell: {e}")
+                    self._sftp_unavailable = True
+                    return None
+            trace.channel_open_s = time.monotonic() - channel_started
+
+            try:
+                logger.info(f"▶️ Reading (sftp): {' '.join(patterns)}")
+                files = SFTPBulkReader(self._sftp, max_bytes=max_bytes, glob_cache=self._sftp_globs).read(patterns)
+            except Exception as e:
+                logger.warning(f"⚠️ SFTP read failed: {e}")
+                self._close_sftp()
+                return None
+
+        return files
+
+    def _close_sftp(self):
+        sftp, self._sftp = self._sftp, None
+        self._sftp_globs = {}
+        if sftp:
+            try:
+                sftp.close()
+            except:
+                pass
+
+    def _close_shell(self):
+        # Deliberately lock-free: closing the channel makes any in-flight read desync and bail out
+        shell, self._shell = self._shell, None
+        root_shell, self._root_shell = self._root_shell, None
+        for session in (shell, root_shell):
+            if session:
+                session.close()
+
+    def transport_active(self) -> bool:
+        """Whether the underlying transport is up, without any network traffic."""
+        try:
+            transport = self.client.get_transport() if self.client else None
+            return bool(transport and transport.is_active())
+        except:
+            return False
+
     def check_connection(self) -> Tuple[bool, str]:
-        """Quick connection check - establishes connection if needed."""
+        """
+        Connection state from the liveness monitor, read without probing the device.
+        Falls back to an active probe until the monitor has produced its first sample.
+        """
+        self.liveness.start()
+        connected, message, age = self.liveness.snapshot()
+        if age is not None and age < self.liveness.interval * 3:
+            return connected, message
+        return self._probe_connection()
+
+    def _probe_connection(self) -> Tuple[bool, str]:
+        """Active connection check - establishes connection if needed."""
         # If we think we're connected, verify it's still active
         if self.connected and self.client:
             try:
@@ -207,7 +1341,10 @@ class PersistentSSHConnection:
                         return True, "Connection active"
             except:
                 pass
-            
+
+            if is_cancelled():
+                return False, cancel_reason()
+
             # Connection was lost
             self.connected = False
         
@@ -216,7 +1353,7 @@ class PersistentSSHConnection:
         if self.connect():
             return True, "Connection established"
         else:
-            return False, "Failed to connect to device"
+            return False, self.connect_error()
     
     def __del__(self):
         """Clean up connection on deletion."""
@@ -258,6 +1395,59 @@ def run_ssh_command(command: str, timeout: int = 60, wait_for_exit: bool = True)
         logger.error(f"Failed to execute SSH command: {e}")
         return f"Error: {str(e)}"
 
+def run_sudo_command(command: str, password: str, timeout: int = 60) -> Optional[str]:
+    """
+    Run a command in the persistent root shell, formatted like run_ssh_command.
+    Returns None when the root shell is unavailable so the caller can use sudo -S instead.
+    """
+    try:
+        result = get_ssh_connection().execute_sudo(command, password, timeout=timeout)
+    except Exception as e:
+        logger.error(f"Failed to execute sudo command: {e}")
+        return None
+
+    if result is None:
+        return None
+    success, output = result
+    return output if success else f"Error: {output}"
+
+def read_remote_files(patterns: Iterable[str], max_bytes: int = 65536) -> Optional[Dict[str, bytes]]:
+    """Read many small files over SFTP. Returns None when SFTP is unavailable."""
+    try:
+        return get_ssh_connection().read_remote_files(patterns, max_bytes=max_bytes)
+    except Exception as e:
+        logger.error(f"Failed to read remote files: {e}")
+        return None
+
+def submit_ssh_command(command: str, timeout: int = 60, wait_for_exit: bool = True) -> Future:
+    """
+    Queue a command on the persistent connection's channel pool.
+    Returns a Future resolving to the same string run_ssh_command would return,
+    so independent probes can run in parallel over the one transport.
+    """
+    result = Future()
+
+    def _done(future):
+        try:
+            success, output = future.result()
+            result.set_result(output if success else f"Error: {output}")
+        except Exception as e:
+            logger.error(f"Failed to execute SSH command: {e}")
+            result.set_result(f"Error: {str(e)}")
+
+    try:
+        conn = get_ssh_connection()
+        conn.submit(command, timeout=timeout, wait_for_exit=wait_for_exit).add_done_callback(_done)
+    except Exception as e:
+        logger.error(f"Failed to submit SSH command: {e}")
+        result.set_result(f"Error: {str(e)}")
+    return result
+
+def stream_ssh_command(command: str, timeout: int = 60, max_bytes: Optional[int] = None) -> CommandStream:
+    """Run a command on the persistent connection and stream its output (see CommandStream)."""
+    conn = get_ssh_connection()
+    return conn.execute_command_stream(command, timeout=timeout, max_bytes=max_bytes)
+
 def check_ssh_connection() -> Tuple[bool, str]:
     """Check if SSH connection is working."""
     try:
@@ -272,6 +1462,16 @@ def reset_ssh_connection() -> Tuple[bool, str]:
     try:
         conn = get_ssh_connection()
         conn.disconnect(silent=False)
+        conn.forget_host_keys()
+        conn.breaker.reset()
+
+        # Subprocess paths multiplex over a control master that still talks to the old device
+        from .ssh_control import stop_control_masters
+        stop_control_masters()
+
+        # Results cached for the previous device must not leak to the next one
+        from .command_cache import get_command_cache
+        get_command_cache().invalidate()
         return True, "SSH connection reset and host keys cleared"
     except Exception as e:
         logger.error(f"Failed to reset SSH connection: {e}")
@@ -0,0 +1,170 @@
+"""
+Pluggable transport for commands sent to the device.
+
+By default every command goes over SSH (the persistent paramiko connection,
+falling back to the ssh binary), and get_transport() returns None. Setting
+SSH_TRANSPORT selects another backend instead, which ssh_interface hands every
+command, batch, file read and connection check to:
+
+    SSH_TRANSPORT=fake    - utils/fake_device.py, a simulated V3 device with
+                            canned outputs and configurable latency
+
+A transport only has to run one command at a time; ssh_interface still does
+the caching, metrics and output formatting, so diagnostics behave the same
+against any backend. Each transport counts its own round trips and bytes
+(TransportStats), which is what benchmarks/bench_diagnostics.py reports.
+"""
+import codecs
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRANSPORT = "ssh"
+
+class TransportStats:
+    """Thread-safe round trip and byte counters for one transport."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.round_trips = 0
+        self.commands = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+    def record(self, bytes_out: int, bytes_in: int, commands: int = 1):
+        with self._lock:
+            self.round_trips += 1
+            self.commands += commands
+            self.bytes_out += bytes_out
+            self.bytes_in += bytes_in
+
+    def snapshot(self, reset: bool = False) -> dict:
+        with self._lock:
+            snapshot = {
+                'round_trips': self.round_trips,
+                'commands': self.commands,
+                'bytes_out': self.bytes_out,
+                'bytes_in': self.bytes_in
+            }
+            if reset:
+                self._reset()
+            return snapshot
+
+class Transport(ABC):
+    """
+    A way of running commands on the device. Subclasses implement execute(),
+    execute_sudo(), read_files() and check_connection(), and cannot be
+    instantiated without them; batches and streams default to plain executes.
+    """
+
+    name = "transport"
+
+    def __init__(self):
+        self.stats = TransportStats()
+
+    @abstractmethod
+    def execute(self, command: str, timeout: float) -> Tuple[int, bytes, bytes]:
+        """Run a command; (exit_code, stdout, stderr), exit_code -1 when it could not be run."""
+
+    @abstractmethod
+    def execute_sudo(self, command: str, timeout: float) -> Tuple[int, bytes, bytes]:
+        """execute() as root."""
+
+    def execute_batch(self, commands: List[str], timeout: float,
+                      sudo: bool = False) -> List[Tuple[int, bytes, bytes, float]]:
+        """
+        Run several commands, ideally in one round trip; one
+        (exit_code, stdout, stderr, duration) per command, in order.
+        """
+        run = self.execute_sudo if sudo else self.execute
+        return [(*run(command, timeout), 0.0) for command in commands]
+
+    @abstractmethod
+    def read_files(self, patterns: Iterable[str], max_bytes: int = 65536) -> Dict[str, bytes]:
+        """Contents of every readable file matching the (glob) patterns, like read_remote_files."""
+
+    @abstractmethod
+    def check_connection(self) -> Tuple[bool, str]:
+        """(connected, message)."""
+
+    def stream(self, command: str, timeout: float, max_bytes: Optional[int] = None):
+        """An iterable of output chunks with stream_ssh_command's attributes."""
+        return BufferedStream(lambda: self.execute(command, timeout), max_bytes=max_bytes)
+
+class BufferedStream:
+    """
+    stream_ssh_command's interface over a command that returns all its output
+    at once: chunks are yielded after the command has finished.
+    """
+
+    def __init__(self, run, max_bytes: Optional[int] = None, chunk_size: int = 4096):
+        self._run = run
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        self.exit_status = None
+        self.truncated = False
+        self.timed_out = False
+
+    def __iter__(self):
+        exit_code, stdout, stderr = self._run()
+        data = stdout + stderr
+        if self.max_bytes is not None and len(data) > self.max_bytes:
+            data = data[:self.max_bytes]
+            self.truncated = True
+
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        for start in range(0, len(data), self.chunk_size):
+            chunk = data[start:start + self.chunk_size]
+            self.bytes_read += len(chunk)
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+
+        if exit_code == -1 and b"timed out" in stderr:
+            self.timed_out = True
+        elif not self.truncated:
+            self.exit_status = exit_code
+
+_transport: Optional[Transport] = None
+_configured = False
+_lock = threading.Lock()
+
+def _create_transport(kind: str) -> Optional[Transport]:
+    if kind == "fake":
+        from .fake_device import FakeDeviceTransport
+        return FakeDeviceTransport.from_env()
+    if kind != DEFAULT_TRANSPORT:
+        logger.warning(f"⚠️ Unknown SSH_TRANSPORT '{kind}', using SSH")
+    return None
+
+def get_transport() -> Optional[Transport]:
+    """The configured non-SSH transport, or None when commands go over SSH."""
+    global _transport, _configured
+    if _configured:
+        return _transport
+    with _lock:
+        if not _configured:
+            kind = os.getenv("SSH_TRANSPORT", DEFAULT_TRANSPORT).strip().lower()
+            _transport = _create_transport(kind)
+            if _transport is not None:
+                logger.info(f"🔌 Using {_transport.name} transport instead of SSH")
+            _configured = True
+    return _transport
+
+def set_transport(transport: Optional[Transport]):
+    """Route commands through transport from now on (None restores SSH), e.g. in a benchmark."""
+    global _transport, _configured
+    with _lock:
+        _transport = transport
+        _configured = True
@@ -0,0 +1,138 @@
+"""
+One thread serving every camera's UDP socket.
+
+Instead of a receive thread per camera, each polling its socket with a short
+timeout, UDPReactor waits on all registered sockets at once through
+`selectors` (epoll on Linux) and calls a socket's handler when it becomes
+readable. Handlers drain their socket in batches (see DRAIN_BATCH) and return,
+so one busy camera can't starve the others: whatever is left makes the socket
+readable again on the next wakeup.
+
+Sockets are registered and unregistered from any thread. The change is handed
+to the reactor thread, which is woken through a socketpair, so the selector
+is only ever touched by that thread; unregister() returns once the reactor has
+let go of the socket, after which the caller may close it.
+"""
+import logging
+import selectors
+import socket
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Datagrams a handler should read per wakeup before yielding to other sockets
+DRAIN_BATCH = 64
+
+class UDPReactor:
+    """A selector loop on a daemon thread, started with the first registered socket."""
+
+    def __init__(self, name: str = "udp-reactor"):
+        self.name = name
+        self._selector = selectors.DefaultSelector()
+        self._waker_r, self._waker_w = socket.socketpair()
+        self._waker_r.setblocking(False)
+        self._waker_w.setblocking(False)
+        self._selector.register(self._waker_r, selectors.EVENT_READ)
+        self._pending = deque()  # (operation, sock, handler, done) for the reactor thread
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None  # The loop runs while it is this thread
+
+    def register(self, sock: socket.socket, handler: Callable[[], None]):
+        """Call handler() on the reactor thread whenever sock is readable. sock is made non-blocking."""
+        sock.setblocking(False)
+        self._submit('register', sock, handler)
+
+    def unregister(self, sock: socket.socket, timeout: float = 2.0):
+        """Stop watching sock; returns once the reactor no longer uses it (or after timeout)."""
+        done = self._submit('unregister', sock, None)
+        if done is not None and not done.wait(timeout):
+            logger.warning(f"⚠️ {self.name} did not release socket within {timeout}s")
+
+    def stop(self):
+        """Stop the reactor thread; registered sockets are left open for their owners to close."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._wake()
+            if thread is not threading.current_thread():
+                thread.join(timeout=2)
+
+    @property
+    def watched(self) -> int:
+        """Number of registered sockets."""
+        return len(self._selector.get_map()) - 1
+
+    def _submit(self, operation: str, sock: socket.socket, handler) -> Optional[threading.Event]:
+        if threading.current_thread() is self._thread:
+            self._apply(operation, sock, handler)
+            return None
+
+        done = threading.Event()
+        with self._lock:
+            self._pending.append((operation, sock, handler, done))
+            if self._thread is None:
+                if operation == 'unregister':
+                    # Nothing is running the loop, so apply it here
+                    self._pending.pop()
+                    self._apply(operation, sock, handler)
+                    return None
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+        self._wake()
+        return done
+
+    def _wake(self):
+        try:
+            self._waker_w.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass  # Already woken, or shutting down
+
+    def _apply(self, operation: str, sock: socket.socket, handler):
+        try:
+            if operation == 'register':
+                self._selector.register(sock, selectors.EVENT_READ, handler)
+            else:
+                self._selector.unregister(sock)
+        except (KeyError, ValueError, OSError) as e:
+            logger.warning(f"⚠️ {self.name} could not {operation} socket: {e}")
+
+    def _apply_pending(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                operation, sock, handler, done = self._pending.popleft()
+            self._apply(operation, sock, handler)
+            done.set()
+
+    def _loop(self):
+        logger.info(f"Started {self.name}")
+        try:
+            while self._thread is threading.current_thread():
+                self._apply_pending()
+                for key, _ in self._selector.select():
+                    if key.fileobj is self._waker_r:
+                        try:
+                            while self._waker_r.recv(4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                        continue
+                    if key.fd not in self._selector.get_map():
+                        continue  # Unregistered by a handler earlier in this batch
+                    try:
+                        key.data()
+                    except Exception as e:
+                        logger.error(f"{self.name} handler error: {e}")
+        finally:
+            # Let anyone waiting in unregister() go, unless a new loop has taken over
+            with self._lock:
+                pending = []
+                if self._thread is None:
+                    pending, self._pending = list(self._pending), deque()
+            for operation, sock, handler, done in pending:
+                self._apply(operation, sock, handler)
+                done.set()
+            logger.info(f"Stopped {self.name}")